@@ -4,6 +4,10 @@ from core.agents.response import AgentResponse
 from core.config import get_config
 from core.db.models import ProjectState
 from core.llm.base import BaseLLMClient, LLMError
+from core.llm.cache import get_response_cache
+from core.llm.hedge import HedgedClient
+from core.llm.replay import ReplayClient, get_replay_store
+from core.llm.router import RoutedClient
 from core.log import get_logger
 from core.proc.process_manager import ProcessManager
 from core.state.state_manager import StateManager
@@ -157,7 +161,10 @@ class BaseAgent:
         The client initializes the UI stream handler and stores the
         request/response to the current state's log. The agent name
         can be overridden in case the agent needs to use a different
-        model configuration.
+        model configuration. If the agent has a hedge policy configured,
+        slow requests are raced against the secondary model. If it has
+        routes configured, small requests go to the smaller models (callers
+        can pass `expected_output_tokens` to help pick one).
 
         :param name: Name of the agent for configuration (default: class name).
         :return: LLM client for the agent.
@@ -169,18 +176,67 @@ class BaseAgent:
         config = get_config()
 
         llm_config = config.llm_for_agent(name)
-        client_class = BaseLLMClient.for_provider(llm_config.provider)
         stream_handler = self.stream_handler if stream_output else None
-        llm_client = client_class(llm_config, stream_handler=stream_handler, error_handler=self.error_handler)
+        replay_store = get_replay_store(config.llm_replay)
+        routed = False
+        hedged = False
+        if replay_store:
+            llm_client = ReplayClient(
+                llm_config,
+                store=replay_store,
+                simulate_latency=config.llm_replay.simulate_latency,
+                stream_handler=stream_handler,
+                error_handler=self.error_handler,
+            )
+        else:
+            client_class = BaseLLMClient.for_provider(llm_config.provider)
+            llm_client = client_class(
+                llm_config,
+                stream_handler=stream_handler,
+                error_handler=self.error_handler,
+                cache=get_response_cache(config.llm_cache),
+            )
 
-        async def client(convo, **kwargs) -> Any:
+            hedge_config = config.hedge_llm_for_agent(name)
+            if hedge_config:
+                # The secondary model is best-effort: if it fails, the primary's error is reported
+                secondary_class = BaseLLMClient.for_provider(hedge_config.provider)
+                secondary_client = secondary_class(hedge_config, cache=get_response_cache(config.llm_cache))
+                llm_client = HedgedClient(llm_client, secondary_client, config.agent_config(name).hedge)
+                hedged = True
+
+            routes = []
+            for route, route_config in config.routed_llms_for_agent(name):
+                route_class = BaseLLMClient.for_provider(route_config.provider)
+                route_client = route_class(
+                    route_config,
+                    stream_handler=stream_handler,
+                    error_handler=self.error_handler,
+                    cache=get_response_cache(config.llm_cache),
+                )
+                routes.append((route, route_client))
+            if routes:
+                llm_client = RoutedClient(llm_client, routes)
+                routed = True
+
+        async def client(convo, expected_output_tokens: Optional[int] = None, **kwargs) -> Any:
             """
             Agent-specific LLM client.
 
             For details on optional arguments to pass to the LLM client,
             see `pythagora.llm.openai_client.OpenAIClient()`.
             """
-            response, request_log = await llm_client(convo, **kwargs)
+            if routed:
+                response, request_log = await llm_client(convo, expected_output_tokens=expected_output_tokens, **kwargs)
+                # Requests to smaller models that were escalated still cost tokens
+                for escalated_log in request_log.escalated:
+                    await self.state_manager.log_llm_request(escalated_log, agent=self)
+            else:
+                response, request_log = await llm_client(convo, **kwargs)
+            if hedged:
+                # So do hedged requests that lost the race
+                for hedged_log in request_log.hedged:
+                    await self.state_manager.log_llm_request(hedged_log, agent=self)
             await self.state_manager.log_llm_request(request_log, agent=self)
             return response
 
@@ -1,4 +1,7 @@
+import json
 from enum import Enum
+from hashlib import sha256
+from typing import Awaitable, Callable
 
 from pydantic import BaseModel, Field
 
@@ -13,6 +16,12 @@ from core.telemetry import telemetry
 
 log = get_logger(__name__)
 
+# Tokens of history (hunting cycles, pair programming questions) after which
+# older turns are replaced with a summary
+COMPACT_HISTORY_THRESHOLD = 8000
+# Number of most recent turns always kept verbatim
+KEEP_RECENT_TURNS = 2
+
 
 class HuntConclusionType(str, Enum):
     ADD_LOGS = magic_words.ADD_LOGS
@@ -77,7 +86,7 @@ class BugHunter(BaseAgent):
 
     async def check_logs(self, logs_message: str = None):
         llm = self.get_llm(CHECK_LOGS_AGENT_NAME, stream_output=True)
-        convo = self.generate_iteration_convo_so_far()
+        convo = await self.generate_iteration_convo_so_far()
         human_readable_instructions = await llm(convo, temperature=0.5)
 
         convo = (
@@ -189,7 +198,7 @@ class BugHunter(BaseAgent):
 
     async def start_pair_programming(self):
         llm = self.get_llm(stream_output=True)
-        convo = self.generate_iteration_convo_so_far(True)
+        convo = await self.generate_iteration_convo_so_far(True)
         if len(convo.messages) > 1:
             convo.remove_last_x_messages(1)
         convo = convo.template("problem_explanation")
@@ -216,6 +225,11 @@ class BugHunter(BaseAgent):
             }
         )
 
+        # TODO: remove when Leon checks
+        convo.remove_last_x_messages(2)
+        # Questions asked and answered during pair programming
+        turns = []
+
         while True:
             self.next_state.current_iteration["initial_explanation"] = initial_explanation
             next_step = await self.ask_question(
@@ -246,42 +260,32 @@ class BugHunter(BaseAgent):
                 },
             )
 
-            # TODO: remove when Leon checks
-            convo.remove_last_x_messages(2)
-
-            if len(convo.messages) > 10:
-                convo.trim(1, 2)
-
             # TODO: in the future improve with a separate conversation that parses the user info and goes into an appropriate if statement
             if next_step.button == "done":
                 self.next_state.complete_iteration()
                 break
             elif next_step.button == "question":
                 user_response = await self.ask_question("Oh, cool, what would you like to know?")
-                convo = convo.template("ask_a_question", question=user_response.text)
-                await self.ui.start_important_stream()
-                llm_answer = await llm(convo, temperature=0.5)
-                await self.send_message(llm_answer)
+                await self.answer_pair_programming_question(
+                    llm, convo, turns, "ask_a_question", question=user_response.text
+                )
             elif next_step.button == "tell_me_more":
-                convo.template("tell_me_more")
-                await self.ui.start_important_stream()
-                response = await llm(convo, temperature=0.5)
-                await self.send_message(response)
+                await self.answer_pair_programming_question(llm, convo, turns, "tell_me_more")
             elif next_step.button == "other":
                 # this is the same as "question" - we want to keep an option for users to click to understand if we're missing something with other options
                 user_response = await self.ask_question("Let me know what you think ...")
-                convo = convo.template("ask_a_question", question=user_response.text)
-                await self.ui.start_important_stream()
-                llm_answer = await llm(convo, temperature=0.5)
-                await self.send_message(llm_answer)
+                await self.answer_pair_programming_question(
+                    llm, convo, turns, "ask_a_question", question=user_response.text
+                )
             elif next_step.button == "solution_hint":
                 human_hint_label = "Amazing! How do you think we can solve this bug?"
+                hint_convo = await self.pair_programming_convo_so_far(convo, turns)
                 while True:
                     human_hint = await self.ask_question(human_hint_label)
-                    convo = convo.template("instructions_from_human_hint", human_hint=human_hint.text)
+                    hint_convo = hint_convo.template("instructions_from_human_hint", human_hint=human_hint.text)
                     await self.ui.start_important_stream()
                     llm = self.get_llm(CHECK_LOGS_AGENT_NAME, stream_output=True)
-                    human_readable_instructions = await llm(convo, temperature=0.5)
+                    human_readable_instructions = await llm(hint_convo, temperature=0.5)
                     human_approval = await self.ask_question(
                         "Can I implement this solution?", buttons={"yes": "Yes", "no": "No"}, buttons_only=True
                     )
@@ -295,16 +299,31 @@ class BugHunter(BaseAgent):
                     else:
                         human_hint_label = "Oh, my bad, what did I misunderstand?"
                 break
-            elif next_step.button == "tell_me_more":
-                convo.template("tell_me_more")
-                await self.ui.start_important_stream()
-                response = await llm(convo, temperature=0.5)
-                await self.send_message(response)
-                continue
 
         return AgentResponse.done(self)
 
-    def generate_iteration_convo_so_far(self, omit_last_cycle=False):
+    async def answer_pair_programming_question(
+        self, llm, convo: AgentConvo, turns: list[dict], template_name: str, **kwargs
+    ):
+        """
+        Answer the user's question, with the questions and answers so far as context.
+
+        The question and the answer are added to `turns`.
+
+        :param llm: LLM client to use.
+        :param convo: Conversation to build on (not modified).
+        :param turns: Questions asked so far, with their answers.
+        :param template_name: Template asking the question.
+        :param kwargs: Template context.
+        """
+        question_convo = await self.pair_programming_convo_so_far(convo, turns)
+        question_convo = question_convo.template(template_name, **kwargs)
+        await self.ui.start_important_stream()
+        answer = await llm(question_convo, temperature=0.5)
+        await self.send_message(answer)
+        turns.append({"template": template_name, "context": kwargs, "answer": answer})
+
+    async def generate_iteration_convo_so_far(self, omit_last_cycle=False):
         convo = AgentConvo(self).template(
             "iteration",
             current_task=self.current_state.current_task,
@@ -319,8 +338,9 @@ class BugHunter(BaseAgent):
             0 : (-1 if omit_last_cycle else None)
         ]
 
+        cycles_convo = convo.fork()
         for hunting_cycle in hunting_cycles:
-            convo = convo.assistant(hunting_cycle["human_readable_instructions"]).template(
+            cycles_convo = cycles_convo.assistant(hunting_cycle["human_readable_instructions"]).template(
                 "log_data",
                 backend_logs=hunting_cycle.get("backend_logs"),
                 frontend_logs=hunting_cycle.get("frontend_logs"),
@@ -328,8 +348,110 @@ class BugHunter(BaseAgent):
                 user_feedback=hunting_cycle.get("user_feedback"),
             )
 
+        # Each cycle is two messages: the instructions and the log data
+        return await self.compact_history(
+            convo,
+            cycles_convo,
+            hunting_cycles,
+            "hunting_cycles_summary",
+            lambda cycles: self.summarize_history(
+                "bug_hunting_summary",
+                "summarize_hunting_cycles",
+                hunting_cycles=cycles,
+            ),
+        )
+
+    async def pair_programming_convo_so_far(self, convo: AgentConvo, turns: list[dict]) -> AgentConvo:
+        """
+        Add the pair programming questions and answers so far to the conversation.
+
+        :param convo: Conversation to build on (not modified).
+        :param turns: Questions asked so far (template name and context) with their answers.
+        :return: Conversation with the questions and answers, compacted if needed.
+        """
+        turns_convo = convo.fork()
+        for turn in turns:
+            turns_convo = turns_convo.template(turn["template"], **turn["context"]).assistant(turn["answer"])
+
+        # Each turn is two messages: the question and the answer
+        return await self.compact_history(
+            convo.fork(),
+            turns_convo,
+            turns,
+            "pair_programming_summary",
+            lambda older_turns: self.summarize_history(
+                "pair_programming_summary",
+                "summarize_pair_programming",
+                turns=older_turns,
+            ),
+        )
+
+    async def compact_history(
+        self,
+        convo: AgentConvo,
+        history_convo: AgentConvo,
+        turns: list[dict],
+        summary_template: str,
+        summarize: Callable[[list[dict]], Awaitable[str]],
+    ) -> AgentConvo:
+        """
+        Replace the older turns in the conversation with a summary once they get too long.
+
+        `history_convo` is `convo` with each of the turns appended as two
+        messages and one prompt log entry. If the turns take more than
+        `COMPACT_HISTORY_THRESHOLD` tokens, all but the `KEEP_RECENT_TURNS`
+        most recent ones are replaced with a summary.
+
+        :param convo: Conversation without the turns (modified if compacted).
+        :param history_convo: Conversation with all the turns.
+        :param turns: Turns appended in `history_convo`.
+        :param summary_template: Template rendering the summary into the conversation.
+        :param summarize: Async function summarizing the older turns.
+        :return: Conversation with the turns, compacted if needed.
+        """
+        history_tokens = history_convo.token_count - convo.token_count
+        if history_tokens <= COMPACT_HISTORY_THRESHOLD or len(turns) <= KEEP_RECENT_TURNS:
+            return history_convo
+
+        num_older = len(turns) - KEEP_RECENT_TURNS
+        log.debug(f"History takes {history_tokens} tokens, summarizing the oldest {num_older} turns")
+        summary = await summarize(turns[:num_older])
+        recent_messages = history_convo.messages[len(convo.messages) + 2 * num_older :]
+        recent_prompt_log = history_convo.prompt_log[len(convo.prompt_log) + num_older :]
+        convo.template(summary_template, summary=summary)
+        convo.messages += recent_messages
+        convo.prompt_log += recent_prompt_log
         return convo
 
+    async def summarize_history(self, summary_field: str, template_name: str, **kwargs) -> str:
+        """
+        Summarize the older turns so they can replace the full history in the prompt.
+
+        The summary is stored in the iteration, keyed by the contents of the
+        summarized turns, so it's only generated once for the same turns.
+
+        :param summary_field: Iteration field to store the summary in.
+        :param template_name: Template asking for the summary.
+        :param kwargs: Template context with the turns to summarize.
+        :return: Summary of the turns.
+        """
+        key = sha256(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        for iteration in (self.next_state.current_iteration, self.current_state.current_iteration):
+            cached = (iteration or {}).get(summary_field)
+            if cached and cached["key"] == key:
+                return cached["summary"]
+
+        llm = self.get_llm()
+        convo = AgentConvo(self).template(template_name, **kwargs)
+        summary: str = await llm(convo, temperature=0)
+
+        self.next_state.current_iteration[summary_field] = {
+            "key": key,
+            "summary": summary,
+        }
+        self.next_state.flag_iterations_as_modified()
+        return summary
+
     def set_data_for_next_hunting_cycle(self, human_readable_instructions, new_status):
         self.next_state.current_iteration["description"] = human_readable_instructions
         self.next_state.current_iteration["bug_hunting_cycles"] += [
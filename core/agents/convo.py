@@ -1,14 +1,16 @@
 import json
 import sys
-from copy import deepcopy
-from typing import TYPE_CHECKING, Optional
+from copy import copy
+from time import monotonic
+from typing import TYPE_CHECKING, Hashable, Optional
 
 import jsonref
 from pydantic import BaseModel
 
 from core.config import get_config
 from core.llm.convo import Convo
-from core.llm.prompt import JinjaFileTemplate
+from core.llm.prompt import JinjaFileTemplate, PartialCache, get_bytecode_cache
+from core.llm.request_log import PromptLogEntry
 from core.log import get_logger
 
 if TYPE_CHECKING:
@@ -17,17 +19,47 @@ if TYPE_CHECKING:
 log = get_logger(__name__)
 
 
+def _files_fingerprint(context) -> Hashable:
+    """
+    Fingerprint of the project files as seen by the file listing partials.
+
+    File content IDs are content hashes, so they change whenever the content does.
+    """
+    state = context.get("state")
+    if state is None:
+        return None
+    return (
+        tuple((file.path, file.content.id, file.meta.get("description")) for file in state.files),
+        tuple(state.relevant_files or ()),
+        tuple(sorted(state.modified_files or {})),
+    )
+
+
+# Rendered JSON schemas of response models, see `AgentConvo.require_schema()`
+_schema_texts: dict[type[BaseModel], str] = {}
+
+# Partials that only depend on the project files, and are rendered in most prompts
+CACHED_PARTIALS = (
+    "partials/files_list.prompt",
+    "partials/files_list_relevant.prompt",
+    "partials/files_descriptions.prompt",
+)
+
+
 class AgentConvo(Convo):
     prompt_loader: Optional[JinjaFileTemplate] = None
+    partial_cache: Optional[PartialCache] = None
 
     def __init__(self, agent: "BaseAgent"):
         self.agent_instance = agent
-        self.prompt_log = []  # Initialize prompt_log as empty list
+        # Templates rendered into the conversation, with their context;
+        # a tuple, so forks can share it
+        self.prompt_log: tuple[PromptLogEntry, ...] = ()
 
         super().__init__()
         try:
             system_message = self.render("system")
-            self.system(system_message)
+            self.system(system_message).cache_prefix()
         except ValueError as err:
             log.warning(f"Agent {agent.__class__.__name__} has no system prompt: {err}")
 
@@ -37,7 +69,18 @@ class AgentConvo(Convo):
             return
 
         config = get_config()
-        cls.prompt_loader = JinjaFileTemplate(config.prompt.paths)
+        cls.partial_cache = PartialCache()
+        for name in CACHED_PARTIALS:
+            cls.partial_cache.register(name, _files_fingerprint)
+        cls.prompt_loader = JinjaFileTemplate(config.prompt.paths, get_bytecode_cache(), cls.partial_cache)
+
+    @classmethod
+    def warm_up_templates(cls):
+        """Compile all the prompt templates, so agents don't stall on their first prompt."""
+        cls._init_templates()
+        start = monotonic()
+        compiled = cls.prompt_loader.warm_up()
+        log.debug(f"Compiled {compiled} prompt templates in {monotonic() - start:.2f}s")
 
     def _get_default_template_vars(self) -> dict:
         if sys.platform == "win32":
@@ -52,16 +95,6 @@ class AgentConvo(Convo):
             "os": os,
         }
 
-    @staticmethod
-    def _serialize_prompt_context(context: dict) -> dict:
-        """
-        Convert data to JSON serializable format
-
-        This is done by replacing non-serializable values with
-        their string representations. This is useful for logging.
-        """
-        return json.loads(json.dumps(context, default=lambda o: str(o)))
-
     def render(self, name: str, **kwargs) -> str:
         self._init_templates()
 
@@ -75,19 +108,18 @@ class AgentConvo(Convo):
     def template(self, template_name: str, **kwargs) -> "AgentConvo":
         message = self.render(template_name, **kwargs)
         self.user(message)
-        self.prompt_log.append(
-            {
-                "template": f"{self.agent_instance.agent_type}/{template_name}",
-                "context": self._serialize_prompt_context(kwargs),
-            }
-        )
+        if all(msg.role == "system" for msg in self.messages[:-1]):
+            # The first prompt carries the big, mostly stable context (project details,
+            # file listings) that the rest of the conversation builds on
+            self.cache_prefix()
+        # Serialized only if the request gets logged, see `PromptLogEntry`
+        self.prompt_log += (PromptLogEntry(f"{self.agent_instance.agent_type}/{template_name}", kwargs),)
         return self
 
     def fork(self) -> "AgentConvo":
-        child = AgentConvo(self.agent_instance)
-        child.messages = deepcopy(self.messages)
-        child.prompt_log = deepcopy(self.prompt_log)
-        return child
+        # Messages and prompt log entries are never modified, only replaced,
+        # so a shallow copy is enough and shares them with the original
+        return copy(self)
 
     def trim(self, trim_index: int, trim_count: int) -> "AgentConvo":
         """
@@ -98,22 +130,37 @@ class AgentConvo(Convo):
         self.messages = self.messages[:trim_index] + self.messages[trim_index + trim_count :]
         return self
 
+    @staticmethod
+    def _schema_text(model: type[BaseModel]) -> str:
+        """
+        Render the JSON schema of the model for the schema prompt (cached per model).
+
+        :param model: Response model.
+        :return: JSON schema, with all the refs we can dereferenced.
+        """
+        if model not in _schema_texts:
+
+            def remove_defs(d):
+                if isinstance(d, dict):
+                    return {k: remove_defs(v) for k, v in d.items() if k != "$defs"}
+                elif isinstance(d, list):
+                    return [remove_defs(v) for v in d]
+                else:
+                    return d
+
+            # We want to make the schema as simple as possible to avoid confusing the LLM,
+            # so we remove (dereference) all the refs we can and show the "final" schema version.
+            _schema_texts[model] = json.dumps(remove_defs(jsonref.loads(json.dumps(model.model_json_schema()))))
+        return _schema_texts[model]
+
     def require_schema(self, model: BaseModel) -> "AgentConvo":
-        def remove_defs(d):
-            if isinstance(d, dict):
-                return {k: remove_defs(v) for k, v in d.items() if k != "$defs"}
-            elif isinstance(d, list):
-                return [remove_defs(v) for v in d]
-            else:
-                return d
-
-        # We want to make the schema as simple as possible to avoid confusing the LLM,
-        # so we remove (dereference) all the refs we can and show the "final" schema version.
-        schema_txt = json.dumps(remove_defs(jsonref.loads(json.dumps(model.model_json_schema()))))
+        schema_txt = self._schema_text(model)
         self.user(
             f"IMPORTANT: Your response MUST conform to this JSON schema:\n```\n{schema_txt}\n```."
             f"YOU MUST NEVER add any additional fields to your response, and NEVER add additional preamble like 'Here is your JSON'."
         )
+        # Providers with native structured output get the schema with the request instead
+        self.mark_schema_hint()
         return self
 
     def remove_last_x_messages(self, x: int) -> "AgentConvo":
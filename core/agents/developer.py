@@ -1,3 +1,4 @@
+import asyncio
 import json
 from enum import Enum
 from typing import Annotated, Literal, Union
@@ -60,6 +61,20 @@ class TaskSteps(BaseModel):
     steps: list[Step]
 
 
+def describe_step(step: Step) -> str:
+    """
+    Describe the step in a single line, for showing it to the user.
+
+    :param step: Task step.
+    :return: Short step description.
+    """
+    if isinstance(step, SaveFileStep):
+        return f"Save `{step.save_file.path}`"
+    if isinstance(step, CommandStep):
+        return f"Run `{step.command.command}`"
+    return f"Human intervention: {step.human_intervention_description}"
+
+
 class Developer(RelevantFilesMixin, BaseAgent):
     agent_type = "developer"
     display_name = "Developer"
@@ -87,6 +102,35 @@ class Developer(RelevantFilesMixin, BaseAgent):
 
         return await self.breakdown_current_task()
 
+    async def parse_task_steps(self, llm, convo: AgentConvo) -> TaskSteps:
+        """
+        Parse the task instructions into steps.
+
+        Each step is shown to the user as soon as it's streamed, instead
+        of waiting for the whole list to be parsed.
+
+        :param llm: LLM client to use.
+        :param convo: Conversation asking for the task steps.
+        :return: Parsed task steps.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        shown = []
+
+        async def show_steps():
+            while (step := await queue.get()) is not None:
+                # Steps are streamed again if the response has to be retried
+                if step not in shown:
+                    shown.append(step)
+                    await self.send_message(f"- {describe_step(step)}")
+
+        show_task = asyncio.create_task(show_steps())
+        try:
+            parser = JSONParser(TaskSteps, on_item=lambda _field, step: queue.put_nowait(step))
+            return await llm(convo, parser=parser, temperature=0)
+        finally:
+            queue.put_nowait(None)
+            await show_task
+
     async def breakdown_current_iteration(self) -> AgentResponse:
         """
         Breaks down current iteration or task review into steps.
@@ -147,7 +191,7 @@ class Developer(RelevantFilesMixin, BaseAgent):
             .template("parse_task")
             .require_schema(TaskSteps)
         )
-        response: TaskSteps = await llm(convo, parser=JSONParser(TaskSteps), temperature=0)
+        response = await self.parse_task_steps(llm, convo)
 
         self.set_next_steps(response, source)
 
@@ -223,7 +267,7 @@ class Developer(RelevantFilesMixin, BaseAgent):
         llm = self.get_llm(PARSE_TASK_AGENT_NAME)
         await self.send_message("Breaking down the task into steps ...")
         convo.assistant(response).template("parse_task").require_schema(TaskSteps)
-        response: TaskSteps = await llm(convo, parser=JSONParser(TaskSteps), temperature=0)
+        response = await self.parse_task_steps(llm, convo)
 
         # There might be state leftovers from previous tasks that we need to clean here
         self.next_state.modified_files = {}
@@ -7,6 +7,7 @@ from core.agents.base import BaseAgent
 from core.agents.convo import AgentConvo
 from core.agents.response import AgentResponse
 from core.llm.parser import JSONParser
+from core.llm.router import SHORT_RESPONSE_TOKENS
 from core.log import get_logger
 from core.proc.exec_log import ExecLog
 from core.proc.process_manager import ProcessManager
@@ -158,7 +159,14 @@ class Executor(BaseAgent):
             )
             .require_schema(CommandResult)
         )
-        return await llm(convo, parser=JSONParser(spec=CommandResult), temperature=0)
+        # A successful run rarely needs more than a short confirmation
+        expected_output_tokens = SHORT_RESPONSE_TOKENS if status_code == 0 else None
+        return await llm(
+            convo,
+            parser=JSONParser(spec=CommandResult),
+            temperature=0,
+            expected_output_tokens=expected_output_tokens,
+        )
 
     def complete(self):
         """
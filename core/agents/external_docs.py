@@ -9,6 +9,7 @@ from core.agents.convo import AgentConvo
 from core.agents.response import AgentResponse
 from core.config import EXTERNAL_DOCUMENTATION_API
 from core.llm.parser import JSONParser
+from core.llm.router import SHORT_RESPONSE_TOKENS
 from core.log import get_logger
 from core.telemetry import telemetry
 
@@ -99,7 +100,9 @@ class ExternalDocumentation(BaseAgent):
             .require_schema(SelectedDocsets)
         )
         await self.send_message("Determining if external documentation is needed for the next task...")
-        llm_response: SelectedDocsets = await llm(convo, parser=JSONParser(spec=SelectedDocsets))
+        llm_response: SelectedDocsets = await llm(
+            convo, parser=JSONParser(spec=SelectedDocsets), expected_output_tokens=SHORT_RESPONSE_TOKENS
+        )
         available_docsets = dict(available_docsets)
         return {k: available_docsets[k] for k in llm_response.docsets if k in available_docsets}
 
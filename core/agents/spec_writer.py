@@ -5,6 +5,7 @@ from core.config import SPEC_WRITER_AGENT_NAME
 from core.db.models import Complexity
 from core.db.models.project_state import IterationStatus
 from core.llm.parser import StringParser
+from core.llm.router import SHORT_RESPONSE_TOKENS
 from core.log import get_logger
 from core.telemetry import telemetry
 from core.templates.example_project import (
@@ -122,7 +123,9 @@ class SpecWriter(BaseAgent):
         await self.send_message("Checking the complexity of the prompt ...")
         llm = self.get_llm(SPEC_WRITER_AGENT_NAME)
         convo = AgentConvo(self).template("prompt_complexity", prompt=prompt)
-        llm_response: str = await llm(convo, temperature=0, parser=StringParser())
+        llm_response: str = await llm(
+            convo, temperature=0, parser=StringParser(), expected_output_tokens=SHORT_RESPONSE_TOKENS
+        )
         return llm_response.lower()
 
     async def prepare_example_project(self, example_name: str):
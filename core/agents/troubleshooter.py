@@ -11,6 +11,7 @@ from core.config import TROUBLESHOOTER_GET_RUN_COMMAND
 from core.db.models.file import File
 from core.db.models.project_state import IterationStatus, TaskStatus
 from core.llm.parser import JSONParser, OptionalCodeBlockParser
+from core.llm.router import SHORT_RESPONSE_TOKENS
 from core.log import get_logger
 from core.telemetry import telemetry
 
@@ -169,7 +170,12 @@ class Troubleshooter(IterationPromptMixin, RelevantFilesMixin, BaseAgent):
         convo = self._get_task_convo().template("get_run_command")
 
         # Although the prompt is explicit about not using "```", LLM may still return it
-        llm_response: str = await llm(convo, temperature=0, parser=OptionalCodeBlockParser())
+        llm_response: str = await llm(
+            convo,
+            temperature=0,
+            parser=OptionalCodeBlockParser(),
+            expected_output_tokens=SHORT_RESPONSE_TOKENS,
+        )
         if len(llm_response) < 5:
             llm_response = ""
         self.next_state.run_command = llm_response
@@ -96,6 +96,7 @@ def parse_arguments() -> Namespace:
         --email: User's email address, if provided
         --extension-version: Version of the VSCode extension, if used
         --no-check: Disable initial LLM API check
+        --replay: Serve LLM responses recorded in the given database URL or JSONL file
     :return: Parsed arguments object.
     """
     version = get_version()
@@ -136,6 +137,11 @@ def parse_arguments() -> Namespace:
     parser.add_argument("--email", help="User's email address", required=False)
     parser.add_argument("--extension-version", help="Version of the VSCode extension", required=False)
     parser.add_argument("--no-check", help="Disable initial LLM API check", action="store_true")
+    parser.add_argument(
+        "--replay",
+        help="Serve LLM responses recorded in the given database URL or JSONL file",
+        required=False,
+    )
     return parser.parse_args()
 
 
@@ -179,6 +185,9 @@ def load_config(args: Namespace) -> Optional[Config]:
                 config.llm[provider] = ProviderConfig()
             config.llm[provider].api_key = key
 
+    if args.replay:
+        config.llm_replay.source = args.replay
+
     try:
         Config.model_validate(config)
     except ValueError as err:
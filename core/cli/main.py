@@ -3,12 +3,15 @@ import sys
 from argparse import Namespace
 from asyncio import run
 
+from core.agents.convo import AgentConvo
 from core.agents.orchestrator import Orchestrator
 from core.cli.helpers import delete_project, init, list_projects, list_projects_json, load_project, show_config
 from core.config import LLMProvider, get_config
 from core.db.session import SessionManager
 from core.db.v0importer import LegacyDatabaseImporter
 from core.llm.base import APIError, BaseLLMClient
+from core.llm.client_pool import client_pool
+from core.llm.retry import configure_retry_budget
 from core.log import get_logger
 from core.state.state_manager import StateManager
 from core.telemetry import telemetry
@@ -117,6 +120,26 @@ async def llm_api_check(ui: UIBase) -> bool:
     return success
 
 
+async def warm_up_local_llms():
+    """
+    Load the local models used by the agents, so the first step doesn't have to.
+
+    See `LMStudioClient.warm_up()`.
+    """
+    config = get_config()
+
+    llm_configs = {}
+    for agent_name in config.agent:
+        agent_llms = [config.llm_for_agent(agent_name)]
+        agent_llms += [llm_config for _, llm_config in config.routed_llms_for_agent(agent_name)]
+        for llm_config in agent_llms:
+            if llm_config.provider == LLMProvider.LM_STUDIO:
+                llm_configs[(llm_config.base_url, llm_config.model)] = llm_config
+
+    clients = [BaseLLMClient.for_provider(llm_config.provider)(llm_config) for llm_config in llm_configs.values()]
+    await asyncio.gather(*(client.warm_up() for client in clients))
+
+
 async def start_new_project(sm: StateManager, ui: UIBase) -> bool:
     """
     Start a new project.
@@ -160,7 +183,7 @@ async def run_pythagora_session(sm: StateManager, ui: UIBase, args: Namespace):
     :return: True if the application ran successfully, False otherwise.
     """
 
-    if not args.no_check:
+    if not args.no_check and not get_config().llm_replay.source:
         if not await llm_api_check(ui):
             await ui.send_message(
                 "Pythagora cannot start because the LLM API is not reachable.",
@@ -168,6 +191,12 @@ async def run_pythagora_session(sm: StateManager, ui: UIBase, args: Namespace):
             )
             return False
 
+    if get_config().prompt.warm_up:
+        AgentConvo.warm_up_templates()
+
+    if not get_config().llm_replay.source:
+        await warm_up_local_llms()
+
     if args.project or args.branch or args.step:
         telemetry.set("is_continuation", True)
         success = await load_project(sm, args.project, args.branch, args.step)
@@ -223,7 +252,11 @@ async def async_main(
         return False
 
     telemetry.start()
-    success = await run_pythagora_session(sm, ui, args)
+    configure_retry_budget(get_config().llm_retry)
+    try:
+        success = await run_pythagora_session(sm, ui, args)
+    finally:
+        await client_pool.close()
     await telemetry.send()
     await ui.stop()
 
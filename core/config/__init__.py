@@ -15,7 +15,7 @@ from core.config.magic_words import *
 __all__ = [
     'UIAdapter', 'LocalIPCConfig', 'UIConfig', 'VirtualConfig',
     'FileSystemType', 'LogConfig', 'LLMProvider', 'LLMConfig',
-    'ProviderConfig', 'DBConfig', 'FSConfig', 'AgentConfig', 'Config',
+    'ProviderConfig', 'DBConfig', 'FSConfig', 'AgentConfig', 'LLMHedgeConfig', 'LLMRouteConfig', 'LLMCacheConfig', 'LLMReplayConfig', 'LLMRetryConfig', 'Config',
     'ConfigLoader', 'get_config',
     
     # Agent Names
@@ -93,6 +93,18 @@ class LLMConfig(BaseModel):
     temperature: float = Field(default=0.7, description="Temperature for sampling")
     connect_timeout: float = Field(default=60.0, description="Timeout for establishing connection")
     read_timeout: float = Field(default=20.0, description="Timeout for reading response")
+    max_connections: int = Field(default=20, description="Maximum number of concurrent connections", ge=1)
+    max_concurrent_requests: Optional[int] = Field(
+        default=10, description="Maximum number of in-flight requests per model (None for no limit)", ge=1
+    )
+    requests_per_minute: Optional[int] = Field(default=None, description="Request rate limit per model", ge=1)
+    tokens_per_minute: Optional[int] = Field(default=None, description="Token rate limit per model", ge=1)
+    max_context_tokens: Optional[int] = Field(
+        default=None, description="Prompt token budget (default: the model's context window)", ge=1
+    )
+    structured_output: bool = Field(
+        default=True, description="Use the provider's native structured output for schema-bound requests"
+    )
     extra: Optional[dict] = Field(None, description="Extra provider-specific configuration")
 
     @property
@@ -108,6 +120,15 @@ class ProviderConfig(BaseModel):
     api_key: Optional[str] = Field(None, description="API key")
     connect_timeout: float = Field(60.0, description="Connection timeout")
     read_timeout: float = Field(20.0, description="Read timeout")
+    max_connections: int = Field(20, description="Maximum number of concurrent connections", ge=1)
+    max_concurrent_requests: Optional[int] = Field(
+        10, description="Maximum number of in-flight requests per model (None for no limit)", ge=1
+    )
+    requests_per_minute: Optional[int] = Field(None, description="Request rate limit per model", ge=1)
+    tokens_per_minute: Optional[int] = Field(None, description="Token rate limit per model", ge=1)
+    structured_output: bool = Field(
+        True, description="Use the provider's native structured output for schema-bound requests"
+    )
     extra: Optional[dict[str, Any]] = Field(None, description="Extra provider config")
 
 
@@ -153,11 +174,72 @@ class FSConfig(BaseModel):
     )
 
 
+class LLMHedgeConfig(BaseModel):
+    """
+    Hedging policy for an agent's LLM requests.
+
+    If the primary model hasn't produced the first token within the given
+    percentile of its recent time-to-first-token (or fails outright), the
+    same request is sent to the secondary provider/model, and whichever
+    finishes first wins.
+    """
+    provider: LLMProvider = Field(description="Secondary LLM provider")
+    model: str = Field(description="Secondary model")
+    temperature: Optional[float] = Field(None, description="Temperature for the secondary model (default: same as primary)")
+    percentile: float = Field(
+        95.0,
+        description="Primary time-to-first-token percentile after which the request is hedged",
+        gt=0,
+        le=100,
+    )
+    min_samples: int = Field(
+        20,
+        description="Number of time-to-first-token samples needed before the percentile is used",
+        ge=1,
+    )
+    default_delay: float = Field(
+        15.0,
+        description="Hedging delay (in seconds) until enough samples are collected",
+        ge=0,
+    )
+
+
+class LLMRouteConfig(BaseModel):
+    """
+    Smaller (faster, cheaper) model for an agent's small requests.
+
+    Requests whose prompt and expected response fit within the route's
+    limits are sent to its model instead of the agent's. If the response
+    can't be parsed, the request is escalated to the next larger model.
+    """
+    provider: LLMProvider = Field(description="LLM provider of the smaller model")
+    model: str = Field(description="Smaller model")
+    temperature: Optional[float] = Field(None, description="Temperature for the smaller model (default: same as agent)")
+    max_prompt_tokens: int = Field(description="Largest prompt (in tokens) to route to the model", ge=1)
+    max_output_tokens: Optional[int] = Field(
+        None,
+        description="Largest expected response (in tokens) to route to the model; "
+        "if set, only requests that declare their expected response size are routed",
+        ge=1,
+    )
+    max_parse_retries: int = Field(
+        0, description="Parse retries on the smaller model before escalating to a larger one", ge=0
+    )
+
+
 class AgentConfig(BaseModel):
     """Agent configuration"""
     provider: LLMProvider = Field(LLMProvider.OPENAI, description="LLM provider to use")
     model: str = Field("gpt-4", description="Model to use")
     temperature: float = Field(0.7, description="Temperature to use for sampling")
+    max_context_tokens: Optional[int] = Field(
+        None, description="Prompt token budget (default: the model's context window)", ge=1
+    )
+    hedge: Optional[LLMHedgeConfig] = Field(None, description="Hedge slow requests to a secondary provider/model")
+    routes: list[LLMRouteConfig] = Field(
+        default_factory=list,
+        description="Smaller models for small requests, from smallest to largest (the agent's model handles the rest)",
+    )
 
 class PromptConfig(BaseModel):
     """Prompt configuration."""
@@ -165,6 +247,66 @@ class PromptConfig(BaseModel):
         default=["core/prompts"],
         description="List of paths to search for prompt templates"
     )
+    bytecode_cache: bool = Field(
+        True, description="Cache compiled templates on disk, so they're compiled once for all processes"
+    )
+    cache_dir: Optional[str] = Field(
+        None, description="Directory for the compiled template cache (default: a per-user temporary directory)"
+    )
+    warm_up: bool = Field(False, description="Compile all prompt templates at startup instead of on first use")
+
+class LLMCacheConfig(BaseModel):
+    """
+    Configuration for the LLM response cache.
+
+    Only deterministic (temperature=0) requests are cached.
+    """
+    enabled: bool = Field(False, description="Cache responses to deterministic LLM requests")
+    backend: Literal["sqlite", "memory"] = Field("sqlite", description="Cache storage backend")
+    path: str = Field(".gpt-pilot/llm_cache.db", description="Path to the on-disk cache database")
+    max_entries: int = Field(10000, description="Maximum number of cached responses", ge=1)
+    max_size: int = Field(100_000_000, description="Maximum total size of cached responses (in bytes)", ge=0)
+    max_age: Optional[float] = Field(
+        7 * 24 * 3600,
+        description="Maximum age of a cached response (in seconds, None for no limit)",
+        gt=0,
+    )
+
+
+class LLMReplayConfig(BaseModel):
+    """
+    Configuration for replaying recorded LLM responses.
+
+    When a source is set, all LLM requests are served from the recorded
+    responses instead of being sent to the provider.
+    """
+    source: Optional[str] = Field(
+        None,
+        description="Database URL or path to a JSONL export of the llm_requests table",
+    )
+    simulate_latency: bool = Field(False, description="Sleep for the recorded request duration")
+
+
+class LLMRetryConfig(BaseModel):
+    """Configuration for retrying failed LLM requests."""
+    base_delay: float = Field(0.5, description="Base delay for exponential backoff (in seconds)", ge=0)
+    max_delay: float = Field(60.0, description="Maximum delay between retries (in seconds)", ge=0)
+    session_retry_budget: Optional[int] = Field(
+        200,
+        description="Maximum number of automatic retries per session (None for no limit)",
+        ge=0,
+    )
+    breaker_failure_threshold: int = Field(
+        5,
+        description="Number of consecutive failures after which requests to a provider fail fast",
+        ge=1,
+    )
+    breaker_reset_timeout: float = Field(
+        30.0,
+        description="How long requests to a failing provider fail fast (in seconds)",
+        ge=0,
+    )
+
 
 class Config(BaseModel):
     """Main configuration."""
@@ -192,6 +334,9 @@ class Config(BaseModel):
     ui: UIConfig = Field(default_factory=lambda: PlainConfig(), description="UI configuration")
     fs: FSConfig = Field(default_factory=FSConfig)
     prompt: PromptConfig = Field(default_factory=PromptConfig, description="Prompt configuration")
+    llm_cache: LLMCacheConfig = Field(default_factory=LLMCacheConfig, description="LLM response cache configuration")
+    llm_replay: LLMReplayConfig = Field(default_factory=LLMReplayConfig, description="LLM replay configuration")
+    llm_retry: LLMRetryConfig = Field(default_factory=LLMRetryConfig, description="LLM retry configuration")
 
 
     def all_llms(self) -> list[LLMConfig]:
@@ -212,27 +357,75 @@ class Config(BaseModel):
             temperature=0.7,
             connect_timeout=provider_config.connect_timeout,
             read_timeout=provider_config.read_timeout,
+            max_connections=provider_config.max_connections,
+            max_concurrent_requests=provider_config.max_concurrent_requests,
+            requests_per_minute=provider_config.requests_per_minute,
+            tokens_per_minute=provider_config.tokens_per_minute,
+            structured_output=provider_config.structured_output,
             extra=provider_config.extra
         )
 
-    def llm_for_agent(self, agent_name: str) -> LLMConfig:
-        """Get LLM configuration for an agent."""
+    def agent_config(self, agent_name: str) -> AgentConfig:
+        """Get configuration for an agent, falling back to the default."""
         agent_config = self.agent.get(agent_name.lower())
         if not agent_config:
             agent_config = self.agent["default"]
-            
-        provider_config = self.llm.get(agent_config.provider)
+        return agent_config
+
+    def llm_for_agent(self, agent_name: str) -> LLMConfig:
+        """Get LLM configuration for an agent."""
+        agent_config = self.agent_config(agent_name)
+        return self._llm_config(
+            agent_config.provider,
+            agent_config.model,
+            agent_config.temperature,
+            agent_config.max_context_tokens,
+        )
+
+    def hedge_llm_for_agent(self, agent_name: str) -> Optional[LLMConfig]:
+        """Get the secondary LLM configuration for an agent, if it hedges requests."""
+        agent_config = self.agent_config(agent_name)
+        hedge = agent_config.hedge
+        if hedge is None:
+            return None
+
+        temperature = agent_config.temperature if hedge.temperature is None else hedge.temperature
+        return self._llm_config(hedge.provider, hedge.model, temperature)
+
+    def routed_llms_for_agent(self, agent_name: str) -> list[tuple[LLMRouteConfig, LLMConfig]]:
+        """Get the smaller models an agent routes small requests to, with their LLM configuration."""
+        agent_config = self.agent_config(agent_name)
+        routes = []
+        for route in agent_config.routes:
+            temperature = agent_config.temperature if route.temperature is None else route.temperature
+            routes.append((route, self._llm_config(route.provider, route.model, temperature)))
+        return routes
+
+    def _llm_config(
+        self,
+        provider: LLMProvider,
+        model: str,
+        temperature: float,
+        max_context_tokens: Optional[int] = None,
+    ) -> LLMConfig:
+        provider_config = self.llm.get(provider)
         if not provider_config:
-            raise ValueError(f"No configuration found for provider {agent_config.provider}")
-            
+            raise ValueError(f"No configuration found for provider {provider}")
+
         return LLMConfig(
-            provider=agent_config.provider,
-            model=agent_config.model,
+            provider=provider,
+            model=model,
             base_url=provider_config.base_url,
             api_key=provider_config.api_key,
-            temperature=agent_config.temperature,
+            temperature=temperature,
             connect_timeout=provider_config.connect_timeout,
             read_timeout=provider_config.read_timeout,
+            max_connections=provider_config.max_connections,
+            max_concurrent_requests=provider_config.max_concurrent_requests,
+            requests_per_minute=provider_config.requests_per_minute,
+            tokens_per_minute=provider_config.tokens_per_minute,
+            max_context_tokens=max_context_tokens,
+            structured_output=provider_config.structured_output,
             extra=provider_config.extra
         )
 
@@ -3,6 +3,7 @@ from uuid import UUID
 
 from sqlalchemy import ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm.attributes import set_committed_value
 
 from core.db.models import Base
 
@@ -11,21 +12,40 @@ if TYPE_CHECKING:
 
 
 class File(Base):
+    """
+    A version of a file, introduced in a project state.
+
+    Each project state only stores the files that were added, changed or
+    deleted in it; the files of a state are the latest version of each
+    path in the state and the ones before it. A deleted file is stored as
+    a version without content.
+    """
+
     __tablename__ = "files"
     __table_args__ = (UniqueConstraint("project_state_id", "path"),)
 
     # ID and parent FKs
     id: Mapped[int] = mapped_column(primary_key=True)
     project_state_id: Mapped[UUID] = mapped_column(ForeignKey("project_states.id", ondelete="CASCADE"))
-    content_id: Mapped[str] = mapped_column(ForeignKey("file_contents.id", ondelete="RESTRICT"))
+    content_id: Mapped[Optional[str]] = mapped_column(ForeignKey("file_contents.id", ondelete="RESTRICT"))
 
     # Attributes
     path: Mapped[str] = mapped_column()
     meta: Mapped[dict] = mapped_column(default=dict, server_default="{}")
 
     # Relationships
-    project_state: Mapped[Optional["ProjectState"]] = relationship(back_populates="files", lazy="raise")
-    content: Mapped["FileContent"] = relationship(back_populates="files", lazy="selectin")
+    project_state: Mapped[Optional["ProjectState"]] = relationship(back_populates="changed_files", lazy="raise")
+    content: Mapped[Optional["FileContent"]] = relationship(back_populates="files", lazy="selectin")
+
+    @property
+    def version(self) -> tuple[Optional[str], dict]:
+        """
+        The content ID and metadata of the file, to compare file versions.
+
+        Works for files whose content was assigned but not flushed yet.
+        """
+        content = self.__dict__.get("content")
+        return (content.id if content is not None else self.content_id), self.meta or {}
 
     def clone(self) -> "File":
         """
@@ -35,9 +55,13 @@ class File(Base):
 
         :return: The cloned file object.
         """
-        return File(
+        clone = File(
             project_state=None,
             content_id=self.content_id,
             path=self.path,
-            meta=self.meta,
+            meta=dict(self.meta or {}),
         )
+        if "content" in self.__dict__:
+            # Share the loaded content, so it doesn't need to be loaded again for the new state
+            set_committed_value(clone, "content", self.content)
+        return clone
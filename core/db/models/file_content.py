@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import delete, distinct, select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -20,7 +20,9 @@ class FileContent(Base):
     content: Mapped[str] = mapped_column()
 
     # Relationships
-    files: Mapped[list["File"]] = relationship(back_populates="content", lazy="raise")
+    # View-only, so the files referencing the content (in every project state) aren't
+    # collected in memory and kept reachable from the session through it
+    files: Mapped[list["File"]] = relationship(back_populates="content", lazy="raise", viewonly=True)
 
     @classmethod
     async def store(cls, session: AsyncSession, hash: str, content: str) -> "FileContent":
@@ -55,4 +57,6 @@ class FileContent(Base):
         """
         from core.db.models import File
 
-        await session.execute(delete(FileContent).where(~FileContent.id.in_(select(distinct(File.content_id)))))
+        # Deleted files have no content; a NULL would make NOT IN match nothing
+        referenced = select(File.content_id).distinct().where(File.content_id.is_not(None))
+        await session.execute(delete(FileContent).where(~FileContent.id.in_(referenced)))
@@ -37,6 +37,17 @@ class LLMRequest(Base):
     duration: Mapped[float] = mapped_column()
     status: Mapped[str] = mapped_column()
     error: Mapped[Optional[str]] = mapped_column()
+    # Earlier requests whose response couldn't be parsed (see `LLMRequestLog.parse_failures`)
+    parse_failures: Mapped[Optional[list[dict]]] = mapped_column()
+
+    # Timings (in seconds)
+    connect_time: Mapped[Optional[float]] = mapped_column()
+    time_to_first_token: Mapped[Optional[float]] = mapped_column()
+    tokens_per_second: Mapped[Optional[float]] = mapped_column()
+    queue_time: Mapped[Optional[float]] = mapped_column()
+    parse_time: Mapped[Optional[float]] = mapped_column()
+    retry_time: Mapped[Optional[float]] = mapped_column()
+    stream_handler_time: Mapped[Optional[float]] = mapped_column()
 
     # Relationships
     branch: Mapped["Branch"] = relationship(back_populates="llm_requests", lazy="raise")
@@ -70,13 +81,21 @@ class LLMRequest(Base):
             model=request_log.model,
             temperature=request_log.temperature,
             messages=request_log.messages,
-            prompts=request_log.prompts,
+            prompts=request_log.serialized_prompts(),
             response=request_log.response,
             prompt_tokens=request_log.prompt_tokens,
             completion_tokens=request_log.completion_tokens,
             duration=request_log.duration,
             status=request_log.status,
             error=request_log.error,
+            parse_failures=request_log.parse_failures,
+            connect_time=request_log.connect_time,
+            time_to_first_token=request_log.time_to_first_token,
+            tokens_per_second=request_log.tokens_per_second,
+            queue_time=request_log.queue_time,
+            parse_time=request_log.parse_time,
+            retry_time=request_log.retry_time,
+            stream_handler_time=request_log.stream_handler_time,
         )
         session.add(obj)
         return obj
@@ -1,12 +1,13 @@
-from copy import deepcopy
 from datetime import datetime
-from typing import TYPE_CHECKING, Optional
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Optional
 from uuid import UUID, uuid4
+from weakref import WeakSet
 
-from sqlalchemy import ForeignKey, UniqueConstraint, delete, inspect
+from sqlalchemy import ForeignKey, UniqueConstraint, delete, event, false, inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm import Mapped, Session, aliased, mapped_column, object_session, relationship
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
 from sqlalchemy.sql import func
 
 from core.db.models import Base
@@ -17,6 +18,27 @@ if TYPE_CHECKING:
 
 log = get_logger(__name__)
 
+# Every this many steps, a state stores all of its files instead of just the
+# changed ones, so assembling the files never goes further back than that
+FILES_SNAPSHOT_INTERVAL = 50
+
+
+def copy_json(value: Any) -> Any:
+    """
+    Deep copy a JSON-compatible value (as stored in the JSON columns).
+
+    Faster than `copy.deepcopy()`, since it only needs to handle dicts
+    and lists; everything else (strings, numbers, ...) is immutable and shared.
+
+    :param value: Value to copy.
+    :return: Copy of the value.
+    """
+    if isinstance(value, dict):
+        return {k: copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_json(v) for v in value]
+    return value
+
 
 class TaskStatus:
     """Status of a task."""
@@ -72,6 +94,9 @@ class ProjectState(Base):
     docs: Mapped[Optional[list[dict]]] = mapped_column(default=None)
     run_command: Mapped[Optional[str]] = mapped_column()
     action: Mapped[Optional[str]] = mapped_column()
+    # Whether the state stores all of its files, not just the changed ones (every
+    # `FILES_SNAPSHOT_INTERVAL` steps, and states saved before file changes were introduced)
+    files_snapshot: Mapped[bool] = mapped_column(default=False, server_default=false())
 
     # Relationships
     branch: Mapped["Branch"] = relationship(back_populates="states", lazy="selectin")
@@ -82,17 +107,47 @@ class ProjectState(Base):
         lazy="raise",
         cascade="delete",
     )
-    next_state: Mapped[Optional["ProjectState"]] = relationship(back_populates="prev_state", lazy="raise")
-    files: Mapped[list["File"]] = relationship(
+    # Not cascaded, so that adding a state to the session doesn't add all the states
+    # after it (the next state is added explicitly by `create_next_state()`)
+    next_state: Mapped[Optional["ProjectState"]] = relationship(back_populates="prev_state", lazy="raise", cascade="")
+    # Files added, changed or deleted in this state; see `files` for all the files in the state
+    changed_files: Mapped[list["File"]] = relationship(
         back_populates="project_state",
-        lazy="selectin",
+        lazy="raise",
         cascade="all,delete-orphan",
+        passive_deletes=True,
     )
     specification: Mapped["Specification"] = relationship(back_populates="project_states", lazy="selectin")
     llm_requests: Mapped[list["LLMRequest"]] = relationship(back_populates="project_state", cascade="all", lazy="raise")
     user_inputs: Mapped[list["UserInput"]] = relationship(back_populates="project_state", cascade="all", lazy="raise")
     exec_logs: Mapped[list["ExecLog"]] = relationship(back_populates="project_state", cascade="all", lazy="raise")
 
+    @property
+    def files(self) -> list["File"]:
+        """
+        Get all the files in the project state.
+
+        The state only stores the files changed in it, so the full list is
+        assembled from the previous states when first needed. Like with
+        lazy-loaded relationships, async code must load it first, using
+        `await state.awaitable_attrs.files`.
+
+        Changes to the files of a new state are stored (as its changed
+        files) when the session is committed. Files of a state loaded from
+        the database are read-only.
+
+        :return: List of files.
+        """
+        if "_files" not in self.__dict__:
+            self._files = self._load_files()
+        return self._files
+
+    @files.setter
+    def files(self, files: list["File"]):
+        if "_files" not in self.__dict__ and not inspect(self).has_identity:
+            self._track_file_changes({})
+        self._files = list(files)
+
     @property
     def unfinished_steps(self) -> list[dict]:
         """
@@ -230,30 +285,39 @@ class ProjectState(Base):
             raise ValueError(f"Next state already exists for state with id={self.id}.")
 
         new_state = ProjectState(
-            branch=self.branch,
+            branch_id=self.branch_id,
             prev_state=self,
             step_index=self.step_index + 1,
-            specification=self.specification,
-            epics=deepcopy(self.epics),
-            tasks=deepcopy(self.tasks),
-            steps=deepcopy(self.steps),
-            iterations=deepcopy(self.iterations),
-            files=[],
-            relevant_files=deepcopy(self.relevant_files),
-            modified_files=deepcopy(self.modified_files),
-            docs=deepcopy(self.docs),
+            specification_id=self.specification_id,
+            epics=copy_json(self.epics),
+            tasks=copy_json(self.tasks),
+            steps=copy_json(self.steps),
+            iterations=copy_json(self.iterations),
+            relevant_files=copy_json(self.relevant_files),
+            modified_files=copy_json(self.modified_files),
+            docs=copy_json(self.docs),
             run_command=self.run_command,
         )
+        # Going through the relationships would also add the new state to the in-memory
+        # `Branch.states` and `Specification.project_states` lists, which cascade to every
+        # state (and its files) created in this process, making each commit slower than
+        # the last. The IDs are set above, so just attach the already loaded objects.
+        set_committed_value(new_state, "branch", self.branch)
+        set_committed_value(new_state, "specification", self.specification)
 
         session: AsyncSession = inspect(self).async_session
         session.add(new_state)
 
-        # NOTE: we only need the await here because of the tests, in live, the
-        # load_project() and commit() methods on StateManager make sure that
-        # the the files are eagerly loaded.
-        for file in await self.awaitable_attrs.files:
-            clone = file.clone()
-            new_state.files.append(clone)
+        # The new state starts with (in-memory) clones of the files, and only
+        # the ones that change are stored to the database when it's committed.
+        files = await self.awaitable_attrs.files
+        new_state._files = [file.clone() for file in files]
+        if new_state.step_index % FILES_SNAPSHOT_INTERVAL == 0:
+            # Store all the files, as if they were all new
+            new_state.files_snapshot = True
+            new_state._track_file_changes({})
+        else:
+            new_state._track_file_changes({file.path: file.version for file in files})
 
         return new_state
 
@@ -382,7 +446,7 @@ class ProjectState(Base):
             file.content = content
         else:
             original_content = ""
-            file = File(path=path, content=content)
+            file = File(path=path, content=content, meta={})
             self.files.append(file)
 
         if path not in self.modified_files and not external:
@@ -394,6 +458,119 @@ class ProjectState(Base):
 
         return file
 
+    def _load_files(self) -> list["File"]:
+        """
+        Assemble the files in the state from the files changed in it and the previous states.
+
+        Each path gets its latest version, going back to the latest
+        state that stores all of its files. Files deleted in their
+        latest version are left out.
+
+        :return: List of files.
+        """
+        from core.db.models import File
+
+        if not inspect(self).has_identity:
+            # A new state has no files yet
+            self._track_file_changes({})
+            return []
+
+        snapshot = aliased(ProjectState)
+        first_step = (
+            select(func.coalesce(func.max(snapshot.step_index), 1))
+            .where(
+                snapshot.branch_id == self.branch_id,
+                snapshot.step_index <= self.step_index,
+                snapshot.files_snapshot,
+            )
+            .scalar_subquery()
+        )
+        versions = (
+            select(
+                File.id,
+                func.row_number()
+                .over(partition_by=File.path, order_by=ProjectState.step_index.desc())
+                .label("latest"),
+            )
+            .join(ProjectState, File.project_state_id == ProjectState.id)
+            .where(
+                ProjectState.branch_id == self.branch_id,
+                ProjectState.step_index <= self.step_index,
+                ProjectState.step_index >= first_step,
+            )
+            .subquery()
+        )
+        result = object_session(self).execute(
+            select(File)
+            .join(versions, File.id == versions.c.id)
+            .where(versions.c.latest == 1, File.content_id.is_not(None))
+            .order_by(File.path)
+        )
+        return list(result.scalars().all())
+
+    def _track_file_changes(self, base_files: dict[str, tuple]):
+        """
+        Start tracking the changes to the files of a new state.
+
+        :param base_files: Versions of the files the state starts with, by path.
+        """
+        self._base_files = base_files
+        _states_with_file_changes.add(self)
+
+    def _store_file_changes(self, session: Session):
+        """
+        Store the files that differ from the previous state as changed files.
+
+        Deleted files are stored as files without content. Changes that
+        were stored before and have since been undone are removed again.
+
+        :param session: The (sync) session the state is in.
+        """
+        from core.db.models import File
+
+        if "_base_files" not in self.__dict__ or "_files" not in self.__dict__:
+            return
+        if "next_state" in self.__dict__:
+            # Read-only from now on
+            _states_with_file_changes.discard(self)
+            return
+
+        files = {file.path: file for file in self._files}
+        changes = self.__dict__.setdefault("_changed_files", {})
+
+        for path in set(files) | set(self._base_files) | set(changes):
+            file = files.get(path)
+            version = file.version if file else None
+            change = changes.get(path)
+
+            if version == self._base_files.get(path):
+                if change is not None:
+                    if inspect(change).persistent:
+                        session.delete(change)
+                    else:
+                        session.expunge(change)
+                    del changes[path]
+                continue
+
+            if change is None:
+                if self.id is None:
+                    self.id = uuid4()
+                change = changes[path] = File(path=path, project_state_id=self.id)
+                session.add(change)
+
+            content_id, meta = version or (None, {})
+            if change.version == (content_id, meta):
+                continue
+
+            content = file.__dict__.get("content") if file else None
+            if content is not None:
+                change.content = content
+            else:
+                # Deleted file, or content that isn't loaded
+                set_committed_value(change, "content", None)
+                change.content_id = content_id
+            change.meta = copy_json(meta)
+
     async def delete_after(self):
         """
         Delete all states in the branch after this one.
@@ -443,3 +620,16 @@ class ProjectState(Base):
         """
         li = self.unfinished_steps
         return [step for step in li if step.get("type") == step_type] if li else []
+
+
+# New states whose file changes are tracked in memory (see `ProjectState._track_file_changes()`)
+_states_with_file_changes: WeakSet[ProjectState] = WeakSet()
+
+
+@event.listens_for(Session, "before_commit")
+def _store_project_state_file_changes(session: Session):
+    """Store the file changes of the project states in the session before committing it."""
+    states = {obj for obj in chain(session.new, session.dirty) if isinstance(obj, ProjectState)}
+    states.update(state for state in list(_states_with_file_changes) if object_session(state) is session)
+    for state in states:
+        state._store_file_changes(session)
@@ -2,10 +2,11 @@ import datetime
 import zoneinfo
 from typing import Optional
 
-from anthropic import AsyncAnthropic, RateLimitError
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, RateLimitError
 from httpx import Timeout
 
 from core.config import LLMProvider
+from core.llm.client_pool import client_pool
 from core.llm.convo import Convo
 from core.log import get_logger
 
@@ -16,13 +17,20 @@ log = get_logger(__name__)
 # Maximum number of tokens supported by Anthropic Claude 3
 MAX_TOKENS = 4096
 MAX_TOKENS_SONNET = 8192
+# Maximum number of prompt cache breakpoints Anthropic allows per request
+MAX_CACHE_BREAKPOINTS = 4
 
 
 class AnthropicClient(BaseLLMClient):
     provider = LLMProvider.ANTHROPIC
+    native_schema = True
 
     def _init_client(self):
-        self.client = AsyncAnthropic(
+        self.client = client_pool.sdk_client(
+            AsyncAnthropic,
+            DefaultAsyncHttpxClient,
+            max_connections=self.config.max_connections,
+            http2=True,
             api_key=self.config.api_key,
             base_url=self.config.base_url,
             timeout=Timeout(
@@ -31,33 +39,50 @@ class AnthropicClient(BaseLLMClient):
                 read=self.config.read_timeout,
             ),
         )
-        self.stream_handler = self.stream_handler
 
-    def _adapt_messages(self, convo: Convo) -> list[dict[str, str]]:
+    def _adapt_messages(self, convo: Convo) -> list[dict]:
         """
         Adapt the conversation messages to the format expected by the Anthropic Claude model.
 
         Claude only recognizes "user" and "assistant" roles, and requires them to be switched
         for each message (ie. no consecutive messages from the same role).
 
+        Messages marked as cache breakpoints (see `Convo.cache_prefix()`) are sent as
+        separate content blocks with `cache_control`, so Anthropic caches the prompt
+        prefix up to them. Only the last `MAX_CACHE_BREAKPOINTS` are used.
+
         :param convo: Conversation to adapt.
         :return: Adapted conversation messages.
         """
-        messages = []
-        for msg in convo.messages:
+        breakpoints = [i for i, msg in enumerate(convo.messages) if msg.cache_breakpoint]
+        breakpoints = set(breakpoints[-MAX_CACHE_BREAKPOINTS:])
+
+        # List of (role, [(text, cache_breakpoint), ...])
+        merged = []
+        for i, msg in enumerate(convo.messages):
             if msg["role"] == "function":
                 raise ValueError("Anthropic Claude doesn't support function calling")
 
             role = "user" if msg["role"] in ["user", "system"] else "assistant"
-            if messages and messages[-1]["role"] == role:
-                messages[-1]["content"] += "\n\n" + msg["content"]
+            segment = (msg["content"], i in breakpoints)
+            if merged and merged[-1][0] == role:
+                merged[-1][1].append(segment)
             else:
-                messages.append(
-                    {
-                        "role": role,
-                        "content": msg["content"],
-                    }
-                )
+                merged.append((role, [segment]))
+
+        messages = []
+        for role, segments in merged:
+            if not any(cache for _, cache in segments):
+                messages.append({"role": role, "content": "\n\n".join(text for text, _ in segments)})
+                continue
+
+            blocks = []
+            for text, cache in segments:
+                block = {"type": "text", "text": text}
+                if cache:
+                    block["cache_control"] = {"type": "ephemeral"}
+                blocks.append(block)
+            messages.append({"role": role, "content": blocks})
         return messages
 
     async def _make_request(
@@ -87,12 +112,27 @@ class AnthropicClient(BaseLLMClient):
         if json_mode:
             completion_kwargs["response_format"] = {"type": "json_object"}
 
+        response_model = self._response_model()
+        if response_model is not None:
+            # Claude has no JSON schema response format, but forcing it to use
+            # a tool makes it respond with the tool input matching the schema
+            completion_kwargs["tools"] = [
+                {
+                    "name": response_model.__name__,
+                    "description": "Respond with the requested data.",
+                    "input_schema": response_model.model_json_schema(),
+                }
+            ]
+            completion_kwargs["tool_choice"] = {"type": "tool", "name": response_model.__name__}
+
         response = []
         async with self.client.messages.stream(**completion_kwargs) as stream:
-            async for content in stream.text_stream:
+            self._mark_connected()
+            self._update_rate_limits(getattr(stream, "response", None))
+            chunks = self._tool_input_stream(stream) if response_model is not None else stream.text_stream
+            async for content in chunks:
                 response.append(content)
-                if self.stream_handler:
-                    await self.stream_handler(content)
+                await self._stream_chunk(content)
 
             # TODO: get tokens from the final message
             final_message = await stream.get_final_message()
@@ -101,10 +141,30 @@ class AnthropicClient(BaseLLMClient):
         response_str = "".join(response)
 
         # Tell the stream handler we're done
-        if self.stream_handler:
-            await self.stream_handler(None)
+        await self._stream_chunk(None)
 
-        return response_str, final_message.usage.input_tokens, final_message.usage.output_tokens
+        usage = final_message.usage
+        cache_read_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write_tokens = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self._record_cache_usage(cache_read_tokens, cache_write_tokens)
+
+        # Anthropic doesn't include cached tokens in `input_tokens`
+        prompt_tokens = usage.input_tokens
+        if isinstance(cache_read_tokens, int) and isinstance(cache_write_tokens, int):
+            prompt_tokens += cache_read_tokens + cache_write_tokens
+        return response_str, prompt_tokens, usage.output_tokens
+
+    @staticmethod
+    async def _tool_input_stream(stream):
+        """
+        Stream the (JSON) input of a forced tool call.
+
+        :param stream: Anthropic message stream.
+        :return: Async iterator over the tool input chunks.
+        """
+        async for event in stream:
+            if event.type == "input_json" and event.partial_json:
+                yield event.partial_json
 
     def rate_limit_sleep(self, err: RateLimitError) -> Optional[datetime.timedelta]:
         """
@@ -1,7 +1,8 @@
 from httpx import Timeout
-from openai import AsyncAzureOpenAI
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 
 from core.config import LLMProvider
+from core.llm.client_pool import client_pool
 from core.llm.openai_client import OpenAIClient
 from core.log import get_logger
 
@@ -16,7 +17,11 @@ class AzureClient(OpenAIClient):
         azure_deployment = self.config.extra.get("azure_deployment")
         api_version = self.config.extra.get("api_version")
 
-        self.client = AsyncAzureOpenAI(
+        self.client = client_pool.sdk_client(
+            AsyncAzureOpenAI,
+            DefaultAsyncHttpxClient,
+            max_connections=self.config.max_connections,
+            http2=True,
             api_key=self.config.api_key,
             azure_endpoint=self.config.base_url,
             azure_deployment=azure_deployment,
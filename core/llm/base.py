@@ -3,21 +3,57 @@
 import asyncio
 import datetime
 import json
+from contextvars import ContextVar
+from dataclasses import dataclass
 from enum import Enum
-from time import time
+from functools import partial
+from time import monotonic, time
 from typing import Any, Callable, Optional, Tuple
 
+from pydantic import BaseModel
+
+import anthropic
+import groq
 import httpx
-from openai import APIConnectionError, APIError
+import openai
 
-from core.config import LLMConfig, LLMProvider
+from core.config import LLMConfig, LLMProvider, get_config
+from core.llm.cache import ResponseCache, cache_key, normalize_messages
 from core.llm.convo import Convo
-from core.llm.request_log import RequestLog, LLMRequestLog, LLMRequestStatus, LLMError
+from core.llm.parser import CodeBlockParser, IncrementalJSONParser, JSONParser, StreamValidationError
+from core.llm.rate_limiter import estimate_tokens, get_rate_limiter
+from core.llm.request_log import LLMRequestLog, LLMRequestStatus
+from core.llm.retry import RetryPolicy, get_circuit_breaker, retry_after, retry_budget
+from core.llm.single_flight import get_single_flight, publish_chunk
+from core.llm.stream_buffer import StreamBuffer
+from core.llm.tokens import prompt_budget
 from core.log import get_logger
 
-logger = get_logger(__name__)
+log = get_logger(__name__)
+
+# Incremental parser validating the response currently being streamed (per asyncio task)
+_stream_parser: ContextVar[Optional[IncrementalJSONParser]] = ContextVar("stream_parser", default=None)
+# Model the response must conform to, for providers with native structured output (per asyncio task)
+_response_model: ContextVar[Optional[type[BaseModel]]] = ContextVar("response_model", default=None)
+# Log of the request currently being made (per asyncio task)
+_request_log: ContextVar[Optional[LLMRequestLog]] = ContextVar("request_log", default=None)
+
+
+@dataclass
+class _AttemptTiming:
+    """Timestamps (monotonic) of a single attempt at sending the request."""
+    started: float
+    connected: Optional[float] = None
+    first_token: Optional[float] = None
+    last_token: Optional[float] = None
+
 
-__all__ = ['BaseLLMClient', 'APIError', 'LLMError']
+# Buffer delivering the chunks of the attempt in progress to the stream handler (per asyncio task)
+_stream_buffer: ContextVar[Optional[StreamBuffer]] = ContextVar("stream_buffer", default=None)
+# Timing of the attempt currently in progress (per asyncio task)
+_attempt_timing: ContextVar[Optional[_AttemptTiming]] = ContextVar("attempt_timing", default=None)
+
+__all__ = ['BaseLLMClient', 'APIError', 'LLMError', 'ParseError']
 
 class LLMError(str, Enum):
     """LLM error types."""
@@ -31,12 +67,51 @@ class APIError(Exception):
         self.message = message
 
 
+class ParseError(APIError):
+    """The LLM responses couldn't be parsed within the allowed number of retries."""
+    def __init__(self, message: str, request_log: LLMRequestLog):
+        super().__init__(message)
+        self.request_log = request_log
+
+
 class BaseLLMClient:
     """Base class for LLM clients."""
 
-    def __init__(self, config: LLMConfig, error_handler=None):
+    # Whether the provider takes the response schema directly, so it doesn't
+    # need to be pasted into the prompt (see `AgentConvo.require_schema()`)
+    native_schema: bool = False
+
+    def __init__(
+        self,
+        config: LLMConfig,
+        error_handler: Optional[Callable] = None,
+        stream_handler: Optional[Callable] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        """
+        Initialize the LLM client.
+
+        Args:
+            config: LLM configuration
+            error_handler: Optional function to handle errors
+            stream_handler: Optional function to handle streaming responses
+            cache: Optional cache for deterministic (temperature=0) responses
+        """
         self.config = config
         self.error_handler = error_handler
+        self.stream_handler = stream_handler
+        self.cache = cache
+        self.rate_limiter = get_rate_limiter(config)
+        self.single_flight = get_single_flight()
+
+        retry_config = get_config().llm_retry
+        self.retry_policy = RetryPolicy(retry_config.base_delay, retry_config.max_delay)
+        self.circuit_breaker = get_circuit_breaker(config.provider.value, retry_config)
+        self._init_client()
+
+    def _init_client(self):
+        """Set up the provider-specific API client."""
+        pass
 
     async def __call__(
         self,
@@ -44,64 +119,478 @@ class BaseLLMClient:
         temperature: Optional[float] = None,
         json_mode: bool = False,
         parser: Optional[Callable] = None,
-        max_retries: int = 3
-    ) -> tuple[str, RequestLog]:
+        max_retries: int = 3,
+        max_parse_retries: Optional[int] = None,
+    ) -> tuple[Any, LLMRequestLog]:
         """
         Send a conversation to the LLM and get a response.
 
+        Deterministic requests (effective temperature of 0) are served
+        from the response cache, if one is configured, and identical ones
+        already in flight (from any client) are shared instead of being
+        sent again. Other requests are trimmed to the model's prompt token
+        budget and wait for the shared per-model rate limiter before being
+        sent.
+
+        Transient errors are retried with exponential backoff (honouring
+        any delay the provider asks for), and parse errors are retried by
+        showing the model its invalid response. Once `max_retries` is
+        exhausted, the error handler decides whether to keep trying.
+
+        With a strict `JSONParser`, the response is validated while it's
+        streamed, and the request is aborted as soon as the response can't
+        possibly match the expected format. If the parser has a pydantic
+        model and the provider supports structured output, the model is
+        passed to the provider directly, and the schema pasted into the
+        prompt is only kept as a fallback for providers that don't.
+
         Args:
             convo: The conversation to send
             temperature: Override the default temperature
             json_mode: Whether to request JSON output
             parser: Optional function to parse the response
             max_retries: Maximum number of retries on error
+            max_parse_retries: Maximum number of retries on parse error, after
+                which `ParseError` is raised (default: no separate limit)
 
         Returns:
-            Tuple of (response text, request log)
+            Tuple of (response, request log)
         """
-        retries = 0
+        temperature = self.config.temperature if temperature is None else temperature
+        prompts = list(getattr(convo, "prompt_log", []))
+        response_model = None
+        if self.config.structured_output and isinstance(parser, JSONParser) and parser.spec is not None:
+            response_model = parser.spec
+            if self.native_schema:
+                convo = convo.without_schema_hints()
+        convo = self._fit_context(convo)
+        request_log = LLMRequestLog(
+            provider=self.config.provider,
+            model=self.config.model,
+            temperature=temperature,
+            messages=normalize_messages(convo),
+            prompts=prompts,
+        )
+
+        key = None
+        if self.cache is not None and temperature == 0:
+            key = cache_key(self.config.provider, self.config.model, temperature, json_mode, convo)
+            cached_response = self.cache.get(key)
+            if cached_response is not None:
+                try:
+                    response = parser(cached_response) if parser else cached_response
+                except Exception as err:  # noqa
+                    response = self._repair_response(parser, cached_response, request_log)
+                    if response is None:
+                        log.warning(f"Discarding cached LLM response that failed to parse: {err}")
+                        cached_response = None
+                if cached_response is not None:
+                    log.debug(f"Serving {self.config.provider.value} {self.config.model} response from cache")
+                    request_log.response = cached_response
+                    request_log.cached = True
+                    return response, request_log
+
+        # The first attempt, plus `max_retries` retries
+        remaining_attempts = max_retries + 1
+        attempt = 0
+        last_error_msg = None
+        rate_limited = False
+        start = time()
+        estimated_tokens = estimate_tokens(convo)
         while True:
+            if remaining_attempts == 0:
+                # We've run out of automatic retries, ask the user (if we can) whether to keep trying
+                request_log.status = LLMRequestStatus.ERROR
+                if last_error_msg is None:
+                    last_error_msg = "Error connecting to the LLM: the provider is failing, not sending more requests"
+                if self.error_handler:
+                    error_type = LLMError.RATE_LIMITED if rate_limited else LLMError.GENERIC_API_ERROR
+                    if await self.error_handler(error_type, last_error_msg):
+                        remaining_attempts = max_retries + 1
+                        request_log.status = LLMRequestStatus.SUCCESS
+                        continue
+                request_log.duration = time() - start
+                raise APIError(last_error_msg)
+
+            remaining_attempts -= 1
+            rate_limited = False
+
+            if self.circuit_breaker.is_open:
+                log.warning(f"Not sending request to {self.config.provider.value}: too many consecutive failures")
+                remaining_attempts = 0
+                continue
+
+            stream_parser = parser.stream() if isinstance(parser, JSONParser) else None
+            token = _stream_parser.set(stream_parser)
+            log_token = _request_log.set(request_log)
+            model_token = _response_model.set(response_model)
+            attempt_start = monotonic()
+            try:
+                send = partial(self._send_request, convo, temperature, json_mode, estimated_tokens, request_log)
+                if temperature == 0:
+                    flight_key = self._flight_key(convo, temperature, json_mode, parser, response_model)
+                    (response, prompt_tokens, completion_tokens), coalesced = await self.single_flight.do(
+                        flight_key, send, self.stream_handler
+                    )
+                else:
+                    # Sampled responses differ on each call, so each caller gets its own
+                    response, prompt_tokens, completion_tokens = await send()
+                    coalesced = False
+            except StreamValidationError as err:
+                # The provider is fine, the response isn't; the aborted request doesn't report usage
+                request_log.retry_time += monotonic() - attempt_start
+                self.circuit_breaker.record_success()
+                log.warning(f"Aborted LLM response that doesn't match the expected format: {err}")
+                request_log.response = stream_parser.text
+                request_log.prompt_tokens += estimated_tokens
+                request_log.completion_tokens += len(stream_parser.text) // 4
+                self._check_parse_retries(err, request_log, max_parse_retries, start)
+                convo = self._fit_context(self._retry_with_parse_error(convo, stream_parser.text, err, request_log))
+                request_log.messages = normalize_messages(convo)
+                last_error_msg = request_log.error
+                estimated_tokens = estimate_tokens(convo)
+                continue
+            except Exception as err:
+                if not self._is_api_error(err):
+                    raise
+
+                request_log.retry_time += monotonic() - attempt_start
+                self.circuit_breaker.record_failure()
+                request_log.error = self._describe_error(err)
+                last_error_msg = f"Error connecting to the LLM: {request_log.error}"
+                log.warning(f"LLM request to {self.config.provider.value} {self.config.model} failed: {err}")
+
+                hint = retry_after(err)
+                if self._is_rate_limited(err):
+                    rate_limited = True
+                    self._update_rate_limits(err.response)
+                    rate_limit_delay = self._rate_limit_delay(err)
+                    hint = max(hint, rate_limit_delay) if hint else rate_limit_delay
+                    self.rate_limiter.pause(hint)
+
+                if not self._is_transient(err) or not retry_budget.spend():
+                    remaining_attempts = 0
+                elif remaining_attempts > 0:
+                    delay = self.retry_policy.delay(attempt, hint)
+                    await asyncio.sleep(delay)
+                    request_log.retry_time += delay
+                    attempt += 1
+                continue
+            finally:
+                _stream_parser.reset(token)
+                _request_log.reset(log_token)
+                _response_model.reset(model_token)
+
+            if coalesced:
+                # The tokens were paid for (and logged) by the request we piggybacked on
+                request_log.coalesced = True
+                prompt_tokens = completion_tokens = 0
+
+            self.circuit_breaker.record_success()
+            request_log.response = response
+            request_log.prompt_tokens += prompt_tokens
+            request_log.completion_tokens += completion_tokens
+            request_log.error = None
+
+            if parser:
+                parse_start = monotonic()
+                try:
+                    parsed_response = parser(response)
+                except Exception as err:
+                    log.warning(f"Error parsing LLM response: {err}")
+                    parsed_response = self._repair_response(parser, response, request_log)
+                    if parsed_response is None:
+                        request_log.parse_time += monotonic() - parse_start
+                        request_log.retry_time += parse_start - attempt_start
+                        self._check_parse_retries(err, request_log, max_parse_retries, start)
+                        convo = self._fit_context(self._retry_with_parse_error(convo, response, err, request_log))
+                        request_log.messages = normalize_messages(convo)
+                        last_error_msg = request_log.error
+                        estimated_tokens = estimate_tokens(convo)
+                        continue
+                request_log.parse_time += monotonic() - parse_start
+            else:
+                parsed_response = response
+
+            if key is not None:
+                self.cache.set(key, response)
+
+            request_log.duration = time() - start
+            return parsed_response, request_log
+
+    def _fit_context(self, convo: Convo) -> Convo:
+        """
+        Trim the conversation to the model's prompt token budget.
+
+        Args:
+            convo: The conversation to send
+
+        Returns:
+            The conversation, or a trimmed copy if it's over the budget
+        """
+        budget = prompt_budget(self.config.model, self.config.max_context_tokens)
+        if budget is None:
+            return convo
+        return convo.fit(budget)
+
+    @staticmethod
+    def _repair_response(parser: Callable, response: str, request_log: LLMRequestLog) -> Any:
+        """
+        Try to repair a response that failed to parse, instead of asking for a new one.
+
+        JSON and code block parsers know how to fix the common ways responses
+        get mangled (see `JSONParser.repair()` and `CodeBlockParser.repair()`).
+
+        Args:
+            parser: The parser that rejected the response
+            response: The response text
+            request_log: Request log to count the repair in
+
+        Returns:
+            The parsed repaired response, or None if it can't be repaired
+        """
+        if not isinstance(parser, (JSONParser, CodeBlockParser)):
+            return None
+        try:
+            parsed_response = parser.repair(response)
+        except Exception as err:  # noqa
+            log.debug(f"Can't repair LLM response: {err}")
+            return None
+        if parsed_response is None:
+            return None
+
+        log.info("Repaired LLM response locally instead of retrying the request")
+        request_log.repairs += 1
+        return parsed_response
+
+    def _flight_key(
+        self,
+        convo: Convo,
+        temperature: float,
+        json_mode: bool,
+        parser: Optional[Callable],
+        response_model: Optional[type[BaseModel]],
+    ) -> str:
+        """
+        Key identifying requests that can share a single call to the LLM.
+
+        Besides the request itself, the key covers how the streamed response
+        is validated: a JSON parser aborts responses that don't match its
+        spec, which only callers expecting the same spec should share.
+
+        Args:
+            convo: The conversation to send
+            temperature: Sampling temperature
+            json_mode: Whether to request JSON output
+            parser: The parser for the response
+            response_model: Response schema sent with the request, if any
+
+        Returns:
+            Request key
+        """
+        key = f"{self.config.base_url}:" + cache_key(
+            self.config.provider, self.config.model, temperature, json_mode, convo
+        )
+        if isinstance(parser, JSONParser):
+            spec = parser.spec
+            key += f":json:{parser.strict}:{spec.__module__ + '.' + spec.__qualname__ if spec else None}"
+            if parser.on_item is not None:
+                # Parsed items are only reported to the caller whose parser streams the response
+                key += f":{id(parser)}"
+        if response_model is not None:
+            key += f":schema:{response_model.__module__}.{response_model.__qualname__}"
+        return key
+
+    async def _send_request(
+        self,
+        convo: Convo,
+        temperature: float,
+        json_mode: bool,
+        estimated_tokens: int,
+        request_log: LLMRequestLog,
+    ) -> tuple[str, int, int]:
+        """
+        Send the request to the LLM once the rate limiter allows it.
+
+        Records the time spent queued behind the rate limiter, and the
+        connection time, time to first token and streaming throughput of
+        the request.
+
+        Streamed chunks go through a `StreamBuffer`, so a slow stream
+        handler doesn't hold up reading the response.
+
+        Args:
+            convo: The conversation to send
+            temperature: Sampling temperature
+            json_mode: Whether to request JSON output
+            estimated_tokens: Estimated number of prompt tokens
+            request_log: Request log to record the timings to
+
+        Returns:
+            Tuple of (response text, prompt tokens, completion tokens)
+        """
+        async with self.rate_limiter.limit(estimated_tokens) as usage:
+            request_log.queue_time += usage["queued"]
+            timing = _AttemptTiming(started=monotonic())
+            token = _attempt_timing.set(timing)
+            buffer = StreamBuffer(self.stream_handler) if self.stream_handler else None
+            buffer_token = _stream_buffer.set(buffer)
             try:
                 response, prompt_tokens, completion_tokens = await self._make_request(
                     convo,
                     temperature=temperature,
                     json_mode=json_mode
                 )
+            except asyncio.CancelledError:
+                if buffer is not None:
+                    buffer.cancel()
+                    buffer = None
+                raise
+            finally:
+                _attempt_timing.reset(token)
+                _stream_buffer.reset(buffer_token)
+                if buffer is not None:
+                    # Deliver what was streamed, even if the attempt failed
+                    await buffer.close()
+                    request_log.stream_handler_time += buffer.handler_time
+            usage["actual_tokens"] = prompt_tokens + completion_tokens
 
-                if parser:
-                    try:
-                        response = parser(response)
-                    except Exception as e:
-                        if retries < max_retries:
-                            retries += 1
-                            continue
-                        raise APIError(f"Error parsing response: {e}")
-
-                return response, RequestLog(
-                    provider=self.config.provider,
-                    model=self.config.model,
-                    prompt_tokens=prompt_tokens,
-                    completion_tokens=completion_tokens,
-                    total_tokens=prompt_tokens + completion_tokens
-                )
+        if timing.connected is not None:
+            request_log.connect_time = timing.connected - timing.started
+        if timing.first_token is not None:
+            request_log.time_to_first_token = timing.first_token - timing.started
+            streaming_time = timing.last_token - timing.first_token
+            if streaming_time > 0 and completion_tokens:
+                request_log.tokens_per_second = completion_tokens / streaming_time
+        return response, prompt_tokens, completion_tokens
 
-            except Exception as e:
-                if retries < max_retries and isinstance(e, (APIConnectionError, APIError)):
-                    retries += 1
-                    continue
+    @staticmethod
+    def _check_parse_retries(err: Exception, request_log: LLMRequestLog, max_parse_retries: Optional[int], start: float):
+        """
+        Give up on a response that failed to parse, if out of parse retries.
 
-                if self.error_handler:
-                    if isinstance(e, APIConnectionError):
-                        message = f"Error connecting to the LLM: API connection error: {e}"
-                    elif isinstance(e, APIError):
-                        message = f"Error connecting to the LLM: LLM had an error processing our request: {e}"
-                    else:
-                        message = f"Error connecting to the LLM: {e}"
-
-                    if await self.error_handler(e, message):
-                        continue
+        Args:
+            err: The parse error
+            request_log: Request log to update
+            max_parse_retries: Maximum number of parse retries (None for no limit)
+            start: When the request was started (wall clock)
 
-                raise
+        Raises:
+            ParseError: If there are no parse retries left
+        """
+        if max_parse_retries is None or request_log.parse_retries < max_parse_retries:
+            return
+
+        request_log.status = LLMRequestStatus.ERROR
+        request_log.error = f"Error parsing response: {err}"
+        request_log.duration = time() - start
+        raise ParseError(request_log.error, request_log)
+
+    @staticmethod
+    def _retry_with_parse_error(convo: Convo, response: str, err: Exception, request_log: LLMRequestLog) -> Convo:
+        """
+        Prepare the conversation for retrying after an invalid response.
+
+        Shows the model what went wrong instead of blindly sending the same
+        request again.
+
+        Args:
+            convo: The conversation that was sent
+            response: The (possibly partial) invalid response
+            err: The parse error
+            request_log: Request log to update
+
+        Returns:
+            The conversation to send next
+        """
+        request_log.error = f"Error parsing response: {err}"
+        request_log.parse_retries += 1
+        request_log.parse_failures.append({"messages": request_log.messages, "response": response})
+        convo = convo.fork()
+        convo.assistant(response)
+        convo.user(f"Error parsing response: {err}. Please output your response EXACTLY as requested.")
+        request_log.messages = normalize_messages(convo)
+        return convo
+
+    async def _stream_chunk(self, content: Optional[str]):
+        """
+        Pass a streamed response chunk to the stream handler.
+
+        If the response is being validated incrementally, the chunk is
+        validated first.
+
+        Args:
+            content: Response text chunk, or None when the response is done
+
+        Raises:
+            StreamValidationError: If the response can't match the expected format
+        """
+        timing = _attempt_timing.get()
+        if timing is not None and content:
+            timing.last_token = monotonic()
+            if timing.first_token is None:
+                timing.first_token = timing.last_token
+
+        stream_parser = _stream_parser.get()
+        if stream_parser is not None and content:
+            stream_parser.feed(content)
+        buffer = _stream_buffer.get()
+        if buffer is not None:
+            buffer.put(content)
+        elif self.stream_handler:
+            handler_start = monotonic()
+            await self.stream_handler(content)
+            request_log = _request_log.get()
+            if request_log is not None:
+                request_log.stream_handler_time += monotonic() - handler_start
+        publish_chunk(content)
+
+    @staticmethod
+    def _record_cache_usage(read_tokens: Any = 0, write_tokens: Any = 0):
+        """
+        Record provider-side prompt cache usage for the current request.
+
+        Args:
+            read_tokens: Prompt tokens served from the provider's cache
+            write_tokens: Prompt tokens written to the provider's cache
+        """
+        request_log = _request_log.get()
+        if request_log is None:
+            return
+        if isinstance(read_tokens, int):
+            request_log.cache_read_tokens += read_tokens
+        if isinstance(write_tokens, int):
+            request_log.cache_write_tokens += write_tokens
+
+    @staticmethod
+    def _response_model() -> Optional[type[BaseModel]]:
+        """
+        Get the pydantic model the current response must conform to.
+
+        Clients for providers with native structured output (JSON schema
+        response format, forced tool use, JSON mode) use this to request it.
+
+        Returns:
+            The response model, or None if the response is free-form
+        """
+        return _response_model.get()
+
+    @staticmethod
+    def _mark_connected():
+        """Record that the provider has responded (headers received) to the current request."""
+        timing = _attempt_timing.get()
+        if timing is not None and timing.connected is None:
+            timing.connected = monotonic()
+
+    @staticmethod
+    async def _close_stream(stream: Any):
+        """Close an aborted response stream so the provider stops generating."""
+        close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+        if close is None:
+            return
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
 
     async def _make_request(
         self,
@@ -138,6 +627,72 @@ class BaseLLMClient:
     def rate_limit_sleep(self, err: Exception) -> Optional[datetime.timedelta]:
         """Calculate retry delay from rate limit headers."""
         raise NotImplementedError()
+
+    @staticmethod
+    def _status_code(err: Exception) -> Optional[int]:
+        status_code = getattr(err, "status_code", None)
+        if status_code is None:
+            status_code = getattr(getattr(err, "response", None), "status_code", None)
+        return status_code if isinstance(status_code, int) else None
+
+    def _is_api_error(self, err: Exception) -> bool:
+        """Check whether the error comes from talking to the LLM API."""
+        return isinstance(
+            err,
+            (
+                APIError,
+                openai.APIError,
+                anthropic.APIError,
+                groq.APIError,
+                httpx.TransportError,
+                httpx.HTTPStatusError,
+            ),
+        ) or self._is_rate_limited(err)
+
+    def _is_transient(self, err: Exception) -> bool:
+        """
+        Check whether retrying the request might help.
+
+        Client errors (4xx other than timeouts, conflicts and rate limits)
+        will fail the same way again, so they're not retried automatically.
+        """
+        status_code = self._status_code(err)
+        if status_code is None:
+            return True
+        return status_code in (408, 409, 429) or status_code >= 500
+
+    @staticmethod
+    def _describe_error(err: Exception) -> str:
+        if isinstance(err, (openai.APIConnectionError, anthropic.APIConnectionError, httpx.TransportError)):
+            return f"API connection error: {err}"
+        return f"LLM had an error processing our request: {err}"
+
+    @staticmethod
+    def _is_rate_limited(err: Exception) -> bool:
+        """Check whether the error is a 429 (rate limit) response from the provider."""
+        response = getattr(err, "response", None)
+        return getattr(response, "status_code", None) == 429
+
+    def _rate_limit_delay(self, err: Exception) -> datetime.timedelta:
+        """
+        Calculate how long to hold off requests after a rate limit error.
+
+        Uses the provider-specific `rate_limit_sleep()`, falling back to
+        a sane default if the headers are missing or can't be parsed.
+        """
+        try:
+            delay = self.rate_limit_sleep(err)
+        except Exception:  # noqa
+            delay = None
+        return delay if delay is not None else datetime.timedelta(seconds=5)
+
+    def _update_rate_limits(self, response: Any):
+        """
+        Update the shared rate limiter from the response headers.
+
+        :param response: HTTP response (or an object with a `headers` attribute), may be None.
+        """
+        self.rate_limiter.update_from_headers(getattr(response, "headers", None))
         
     @staticmethod
     def for_provider(provider: LLMProvider) -> type["BaseLLMClient"]:
@@ -146,6 +701,7 @@ class BaseLLMClient:
         from .azure_client import AzureClient
         from .deepseek_client import DeepSeekClient
         from .groq_client import GroqClient
+        from .lm_studio_client import LMStudioClient
         from .openai_client import OpenAIClient
 
         if provider == LLMProvider.OPENAI:
@@ -158,5 +714,7 @@ class BaseLLMClient:
             return AzureClient
         elif provider == LLMProvider.DEEPSEEK:
             return DeepSeekClient
+        elif provider == LLMProvider.LM_STUDIO:
+            return LMStudioClient
         else:
             raise ValueError(f"Unsupported LLM provider: {provider.value}")
\ No newline at end of file
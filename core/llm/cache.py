@@ -0,0 +1,294 @@
+"""Content-addressed cache for deterministic LLM responses."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from os import makedirs
+from os.path import dirname
+from typing import Optional
+
+from core.config import LLMCacheConfig, LLMProvider
+from core.llm.convo import Convo
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+
+def normalize_messages(convo: Convo) -> list[dict]:
+    """
+    Convert conversation messages to a canonical, JSON-serializable form.
+
+    Only the fields that influence the completion are kept, and dict
+    contents are dumped with sorted keys so equal convos hash equally.
+
+    :param convo: Conversation to normalize.
+    :return: List of message dicts.
+    """
+    messages = []
+    for msg in convo.messages:
+        content = msg.content
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True, default=str)
+        item = {"role": msg.role, "content": content}
+        if msg.name:
+            item["name"] = msg.name
+        messages.append(item)
+    return messages
+
+
+def cache_key(
+    provider: LLMProvider,
+    model: str,
+    temperature: float,
+    json_mode: bool,
+    convo: Convo,
+) -> str:
+    """
+    Compute the content address of an LLM request.
+
+    :param provider: LLM provider.
+    :param model: Model name.
+    :param temperature: Effective sampling temperature.
+    :param json_mode: Whether JSON output was requested.
+    :param convo: Conversation to send.
+    :return: Hex SHA-256 digest identifying the request.
+    """
+    payload = json.dumps(
+        {
+            "provider": provider.value,
+            "model": model,
+            "temperature": temperature,
+            "json_mode": json_mode,
+            "messages": normalize_messages(convo),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Base class for LLM response caches.
+
+    Subclasses implement `_get`, `_set` and `clear`; this class takes
+    care of the hit/miss bookkeeping.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_size: int = 100_000_000, max_age: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        :param key: Request key (see `cache_key()`).
+        :return: Cached response text, or None on a miss.
+        """
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        """
+        Store a response in the cache, evicting old entries if needed.
+
+        :param key: Request key (see `cache_key()`).
+        :param value: Response text.
+        """
+        self._set(key, value)
+
+    def stats(self) -> dict:
+        """Return cache hit/miss counters."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _expired(self, created_at: float) -> bool:
+        return self.max_age is not None and time.time() - created_at > self.max_age
+
+    def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError()
+
+    def _set(self, key: str, value: str):
+        raise NotImplementedError()
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        raise NotImplementedError()
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU response cache."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.size = 0
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        value, created_at = entry
+        if self._expired(created_at):
+            self._remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: str):
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (value, time.time())
+        self.size += len(value)
+
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_size):
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.size -= len(value)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    On-disk LRU response cache backed by SQLite.
+
+    Entries survive process restarts, so resumed projects and re-runs
+    can reuse responses from earlier sessions.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        if path != ":memory:" and dirname(path):
+            makedirs(dirname(path), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "  key TEXT PRIMARY KEY,"
+            "  value TEXT NOT NULL,"
+            "  size INTEGER NOT NULL,"
+            "  created_at REAL NOT NULL,"
+            "  accessed_at REAL NOT NULL"
+            ")"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    def _get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self._expired(created_at):
+                self.db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+
+            self.db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return value
+
+    def _set(self, key: str, value: str):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.max_age is not None:
+            self.db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.max_age,))
+
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and size <= self.max_size:
+            return
+
+        # Walk the entries from least to most recently used and drop them
+        # until we're back within both limits.
+        to_delete = []
+        for key, entry_size in self.db.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"):
+            if count <= self.max_entries and size <= self.max_size:
+                break
+            to_delete.append((key,))
+            count -= 1
+            size -= entry_size
+        self.db.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM llm_cache")
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self.lock:
+            self.db.close()
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache(config: Optional[LLMCacheConfig] = None) -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache, creating it on first use.
+
+    :param config: Cache configuration (default: from the global config).
+    :return: Response cache, or None if caching is disabled.
+    """
+    global _response_cache
+
+    if config is None:
+        from core.config import get_config
+
+        config = get_config().llm_cache
+
+    if not config.enabled:
+        return None
+
+    if _response_cache is None:
+        kwargs = {
+            "max_entries": config.max_entries,
+            "max_size": config.max_size,
+            "max_age": config.max_age,
+        }
+        if config.backend == "sqlite":
+            _response_cache = SQLiteResponseCache(config.path, **kwargs)
+        else:
+            _response_cache = MemoryResponseCache(**kwargs)
+        log.debug(f"Initialized {config.backend} LLM response cache")
+
+    return _response_cache
+
+
+__all__ = [
+    "ResponseCache",
+    "MemoryResponseCache",
+    "SQLiteResponseCache",
+    "cache_key",
+    "get_response_cache",
+]
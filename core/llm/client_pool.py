@@ -0,0 +1,149 @@
+"""Process-wide registry of pooled provider API clients."""
+
+import asyncio
+from typing import Any, Callable, Optional
+
+import httpx
+
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# How long to keep idle connections around for reuse (in seconds)
+KEEPALIVE_EXPIRY = 30.0
+
+
+class ClientPool:
+    """
+    Registry of provider API clients shared between LLM client instances.
+
+    Agents create a new `BaseLLMClient` for every `get_llm()` call, but the
+    underlying SDK/HTTP clients (and their connection pools) are expensive
+    to set up, so we keep one per distinct provider configuration and
+    reuse it for the lifetime of the process.
+
+    Clients are bound to the event loop they were created in, so they're
+    also keyed by the running loop.
+    """
+
+    def __init__(self):
+        self.clients: dict[tuple, Any] = {}
+
+    @staticmethod
+    def _key(factory: Callable, kwargs: dict) -> tuple:
+        try:
+            loop_id = id(asyncio.get_running_loop())
+        except RuntimeError:
+            loop_id = None
+        return (factory, loop_id, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+    @staticmethod
+    def _limits(max_connections: int, keepalive_expiry: float = KEEPALIVE_EXPIRY) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+    def http_client(
+        self,
+        http_client_class: Callable = httpx.AsyncClient,
+        *,
+        max_connections: int,
+        http2: bool = False,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        **kwargs,
+    ) -> Any:
+        """
+        Get a pooled HTTP client.
+
+        :param http_client_class: HTTP client class (httpx.AsyncClient or compatible).
+        :param max_connections: Maximum number of concurrent connections.
+        :param http2: Whether to use HTTP/2 (if the `h2` package is installed).
+        :param keepalive_expiry: How long to keep idle connections open (in seconds).
+        :param kwargs: Additional arguments for the HTTP client.
+        :return: Shared HTTP client instance.
+        """
+        key = self._key(
+            http_client_class,
+            dict(kwargs, max_connections=max_connections, http2=http2, keepalive_expiry=keepalive_expiry),
+        )
+        if key not in self.clients:
+            self.clients[key] = http_client_class(
+                limits=self._limits(max_connections, keepalive_expiry),
+                http2=http2 and HTTP2_AVAILABLE,
+                **kwargs,
+            )
+        return self.clients[key]
+
+    def sdk_client(
+        self,
+        sdk_client_class: Callable,
+        http_client_class: Callable,
+        *,
+        max_connections: int,
+        http2: bool = False,
+        timeout: Optional[httpx.Timeout] = None,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        **kwargs,
+    ) -> Any:
+        """
+        Get a pooled provider SDK client (eg. AsyncOpenAI).
+
+        :param sdk_client_class: SDK client class.
+        :param http_client_class: HTTP client class to use with the SDK (usually
+            the SDK's `DefaultAsyncHttpxClient`).
+        :param max_connections: Maximum number of concurrent connections.
+        :param http2: Whether to use HTTP/2 (if the `h2` package is installed).
+        :param timeout: Request timeout.
+        :param keepalive_expiry: How long to keep idle connections open (in seconds).
+        :param kwargs: Additional arguments for the SDK client.
+        :return: Shared SDK client instance.
+        """
+        key = self._key(
+            sdk_client_class,
+            dict(
+                kwargs,
+                max_connections=max_connections,
+                http2=http2,
+                timeout=timeout,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        if key not in self.clients:
+            http_client = http_client_class(
+                limits=self._limits(max_connections, keepalive_expiry),
+                http2=http2 and HTTP2_AVAILABLE,
+                timeout=timeout,
+            )
+            self.clients[key] = sdk_client_class(http_client=http_client, timeout=timeout, **kwargs)
+        return self.clients[key]
+
+    async def close(self):
+        """
+        Close all pooled clients and their connections.
+        """
+        clients = list(self.clients.values())
+        self.clients.clear()
+
+        for client in clients:
+            try:
+                if hasattr(client, "aclose"):
+                    await client.aclose()
+                else:
+                    await client.close()
+            except Exception as err:  # noqa
+                log.warning(f"Error closing LLM API client: {err}", exc_info=True)
+
+
+client_pool = ClientPool()
+
+
+__all__ = ["ClientPool", "client_pool"]
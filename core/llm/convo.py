@@ -1,16 +1,70 @@
 """Conversation handling for LLM interactions."""
 
 import textwrap
-from dataclasses import dataclass
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field, replace
 from typing import Optional, Any
 import json
 
-@dataclass
+from core.llm.tokens import MESSAGE_OVERHEAD, REPLY_OVERHEAD, count_tokens
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+# Smallest part of a history message worth keeping (compacted) when fitting
+# a conversation to a budget
+MIN_COMPACT_TOKENS = 64
+
+@dataclass(frozen=True, slots=True)
 class Message:
-    """A message in a conversation."""
+    """
+    A message in a conversation.
+
+    Messages are immutable, so conversations (and their forks) can share
+    them; use `dataclasses.replace()` to get a modified copy.
+    """
     role: str
     content: str
     name: Optional[str] = None
+    # The conversation up to and including this message is a stable prefix
+    # worth caching on the provider side (see `Convo.cache_prefix()`).
+    cache_breakpoint: bool = field(default=False, compare=False)
+    # The message only describes the response format, and is not needed by
+    # providers that take the response schema directly
+    schema_hint: bool = field(default=False, compare=False)
+    # Token count cache
+    _tokens: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def token_count(self) -> int:
+        """Number of tokens in the message content (computed once, then cached)."""
+        if self._tokens is None:
+            content = self.content if isinstance(self.content, str) else json.dumps(self.content)
+            # The cache doesn't change the message, so it's fine to set on a frozen instance
+            object.__setattr__(self, "_tokens", count_tokens(content))
+        return self._tokens
+
+    def compact(self, max_tokens: int) -> "Message":
+        """
+        Shorten the message content to about `max_tokens` tokens.
+
+        Keeps the beginning and the end of the content (where the
+        instructions and the question usually are) and replaces the middle
+        with a marker.
+
+        Args:
+            max_tokens: Approximate number of tokens to keep
+
+        Returns:
+            Compacted copy of the message
+        """
+        content = self.content if isinstance(self.content, str) else json.dumps(self.content)
+        marker = f"\n\n[... {self.token_count - max_tokens} tokens omitted ...]\n\n"
+        keep = max(max_tokens - count_tokens(marker), 0)
+        chars = int(len(content) * keep / max(self.token_count, 1))
+        head = chars * 2 // 3
+        tail = chars - head
+        return replace(self, content=content[:head] + marker + (content[-tail:] if tail else ""))
 
     def __getitem__(self, key: str) -> Any:
         """Allow dictionary-style access to message fields."""
@@ -24,17 +78,183 @@ class Message:
                 self.content == other.get("content") and
                 (self.name == other.get("name") if "name" in other else True)
             )
-        return super().__eq__(other)
+        if isinstance(other, Message):
+            return (self.role, self.content, self.name) == (other.role, other.content, other.name)
+        return NotImplemented
+
+    def to_dict(self) -> dict:
+        """
+        Convert to the message format expected by OpenAI-compatible APIs.
+
+        Only the fields the API understands are included, always in the
+        same order, so identical prompt prefixes serialize to identical
+        bytes and hit the provider's prompt cache.
+        """
+        msg = {"role": self.role, "content": self.content}
+        if self.name:
+            msg["name"] = self.name
+        return msg
+
+class _Node:
+    """A message, linked to the node of the message before it."""
+
+    __slots__ = ("message", "parent", "length", "_total_tokens")
+
+    def __init__(self, message: Message, parent: Optional["_Node"]):
+        self.message = message
+        self.parent = parent
+        self.length = parent.length + 1 if parent is not None else 1
+        self._total_tokens = None
+
+    @property
+    def total_tokens(self) -> int:
+        """
+        Running total of message tokens up to and including this message.
+
+        Computed on first use and cached in the node, so only the messages
+        added since the last count (in this list or any list sharing the
+        nodes) are counted.
+        """
+        uncounted = []
+        node = self
+        while node is not None and node._total_tokens is None:
+            uncounted.append(node)
+            node = node.parent
+        total = node._total_tokens if node is not None else 0
+        for node in reversed(uncounted):
+            total += node.message.token_count + MESSAGE_OVERHEAD
+            node._total_tokens = total
+        return total
+
+
+class MessageList(Sequence):
+    """
+    Immutable list of messages with structural sharing.
+
+    Stored as a chain of nodes from the last message back to the first, so
+    appending a message or taking a prefix (eg. when forking or trimming a
+    conversation) is O(1) per message added or removed, and the result shares
+    the earlier messages with the original instead of copying them.
+
+    Indexing from the end is cheap, while iterating or indexing from the
+    start walks the chain.
+    """
+
+    __slots__ = ("_tail",)
+
+    def __init__(self, messages: Iterable[Message] = ()):
+        tail = None
+        for msg in messages:
+            tail = _Node(msg, tail)
+        self._tail = tail
+
+    @classmethod
+    def _from_node(cls, node: Optional[_Node]) -> "MessageList":
+        messages = cls.__new__(cls)
+        messages._tail = node
+        return messages
+
+    def append(self, message: Message) -> "MessageList":
+        """Get a new list with `message` added at the end."""
+        return self._from_node(_Node(message, self._tail))
+
+    def replace_last(self, message: Message) -> "MessageList":
+        """Get a new list with the last message replaced by `message`."""
+        if self._tail is None:
+            raise IndexError("replace_last on an empty message list")
+        return self._from_node(_Node(message, self._tail.parent))
+
+    def _prefix(self, length: int) -> "MessageList":
+        node = self._tail
+        for _ in range(len(self) - max(length, 0)):
+            node = node.parent
+        return self._from_node(node)
+
+    def __len__(self) -> int:
+        return self._tail.length if self._tail is not None else 0
+
+    @property
+    def token_count(self) -> int:
+        """Total number of tokens in the messages, including the per-message overhead."""
+        return self._tail.total_tokens if self._tail is not None else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if start == 0 and step == 1:
+                # Prefixes share the nodes with this list
+                return self._prefix(stop)
+            return MessageList(list(self)[index])
+
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("message index out of range")
+        node = self._tail
+        for _ in range(length - 1 - index):
+            node = node.parent
+        return node.message
+
+    def __reversed__(self):
+        node = self._tail
+        while node is not None:
+            yield node.message
+            node = node.parent
+
+    def __iter__(self):
+        messages = list(self.__reversed__())
+        messages.reverse()
+        return iter(messages)
+
+    def __add__(self, other: Iterable[Message]) -> "MessageList":
+        node = self._tail
+        for msg in other:
+            node = _Node(msg, node)
+        return self._from_node(node)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, MessageList) and other._tail is self._tail:
+            return True
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MessageList({list(self)!r})"
+
+    def __copy__(self) -> "MessageList":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "MessageList":
+        # Immutable, so copies can share it
+        return self
+
+    def __reduce__(self):
+        # Pickle as a flat list, not a deeply nested chain of nodes
+        return MessageList, (list(self),)
+
 
 class Convo:
     """A conversation with an LLM."""
 
     def __init__(self, system_prompt: Optional[str] = None):
         """Initialize a new conversation."""
-        self.messages: list[Message] = []
+        self.messages = MessageList()
         if system_prompt:
             self.system(system_prompt)
 
+    @property
+    def messages(self) -> MessageList:
+        """Messages in the conversation."""
+        return self._messages
+
+    @messages.setter
+    def messages(self, messages: Iterable[Message]):
+        self._messages = messages if isinstance(messages, MessageList) else MessageList(messages)
+
     def add(self, role: str, content: Any, name: Optional[str] = None) -> 'Convo':
         """Add a message to the conversation.
         
@@ -65,7 +285,7 @@ class Convo:
         if not content:
             raise ValueError("Message content cannot be empty")
 
-        self.messages.append(Message(role=role, content=content, name=name))
+        self._messages = self._messages.append(Message(role=role, content=content, name=name))
         return self
 
     def user(self, content: str | dict, name: Optional[str] = None) -> 'Convo':
@@ -86,10 +306,128 @@ class Convo:
             raise TypeError("Function message content must be str or dict")
         return self.add("function", content, name)
 
+    def cache_prefix(self) -> 'Convo':
+        """
+        Mark the conversation so far as a cacheable prompt prefix.
+
+        Providers that support explicit prompt caching (Anthropic) place a
+        cache breakpoint after the last message; others cache matching
+        prefixes automatically.
+
+        Returns:
+            self for chaining
+        """
+        if self._messages:
+            self._messages = self._messages.replace_last(replace(self._messages[-1], cache_breakpoint=True))
+        return self
+
+    def mark_schema_hint(self) -> 'Convo':
+        """
+        Mark the last message as a response schema hint.
+
+        Schema hints are left out for providers that take the response
+        schema directly (see `without_schema_hints()`).
+
+        Returns:
+            self for chaining
+        """
+        if self._messages:
+            self._messages = self._messages.replace_last(replace(self._messages[-1], schema_hint=True))
+        return self
+
+    @property
+    def token_count(self) -> int:
+        """
+        Total number of prompt tokens in the conversation.
+
+        The messages keep a running total, so this only counts the
+        messages added since the last call.
+        """
+        return REPLY_OVERHEAD + self.messages.token_count
+
+    @staticmethod
+    def _is_pinned(msg: Message, index: int, last: int) -> bool:
+        """System messages, cache breakpoints and the last message are always kept."""
+        return msg.role == "system" or msg.cache_breakpoint or index == last
+
+    def fit(self, max_tokens: int) -> 'Convo':
+        """
+        Fit the conversation into a token budget.
+
+        System messages, cache breakpoints (the stable prompt prefix) and
+        the last message are pinned and never changed. The rest of the
+        history is the lowest priority and is dropped oldest first; the
+        message that crosses the budget is compacted instead of dropped if
+        enough of it can be kept.
+
+        If the pinned messages alone are over the budget, all the history
+        is dropped and a warning is logged.
+
+        Args:
+            max_tokens: Maximum number of prompt tokens
+
+        Returns:
+            self if it already fits, otherwise a trimmed copy
+        """
+        total = self.token_count
+        if total <= max_tokens:
+            return self
+
+        original = total
+        messages = list(self.messages)
+        last = len(messages) - 1
+        for i, msg in enumerate(messages):
+            if total <= max_tokens:
+                break
+            if self._is_pinned(msg, i, last):
+                continue
+            keep = msg.token_count - (total - max_tokens)
+            if keep >= MIN_COMPACT_TOKENS:
+                compacted = msg.compact(keep)
+                if compacted.token_count < msg.token_count:
+                    total += compacted.token_count - msg.token_count
+                    messages[i] = compacted
+                    continue
+            total -= msg.token_count + MESSAGE_OVERHEAD
+            messages[i] = None
+        messages = [msg for msg in messages if msg is not None]
+
+        if total > max_tokens:
+            log.warning(
+                f"Can't fit the conversation into {max_tokens} tokens: the system prompt, "
+                f"cached prefix and last message alone take {total} tokens"
+            )
+
+        log.info(
+            f"Trimmed conversation from {original} to {total} tokens "
+            f"({len(self.messages) - len(messages)} messages dropped) to fit the {max_tokens} token budget"
+        )
+        new_convo = self.fork()
+        new_convo.messages = messages
+        return new_convo
+
+    def without_schema_hints(self) -> 'Convo':
+        """
+        Get the conversation without the response schema hints.
+
+        Returns:
+            self if there are no schema hints, otherwise a copy without them
+        """
+        if not any(msg.schema_hint for msg in self.messages):
+            return self
+        new_convo = self.fork()
+        new_convo.messages = [msg for msg in self.messages if not msg.schema_hint]
+        return new_convo
+
     def fork(self) -> 'Convo':
-        """Create a copy of this conversation."""
+        """
+        Create a copy of this conversation.
+
+        The copy shares the (immutable) messages with the original, so
+        forking is O(1) regardless of the conversation length.
+        """
         new_convo = Convo()
-        new_convo.messages = self.messages.copy()
+        new_convo.messages = self.messages
         return new_convo
 
     def after(self, other: 'Convo') -> 'Convo':
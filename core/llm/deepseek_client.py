@@ -7,7 +7,9 @@ from typing import Optional, Dict, Any, List, Tuple
 import httpx
 from core.config import LLMProvider
 from core.llm.base import BaseLLMClient
+from core.llm.client_pool import client_pool
 from core.llm.convo import Convo
+from core.llm.parser import StreamValidationError
 from core.llm.request_log import LLMRequestLog, LLMRequestStatus
 from core.log import get_logger
 
@@ -22,9 +24,14 @@ class DeepSeekClient(BaseLLMClient):
         """Initialize the DeepSeek client with proper configuration."""
         base_url = self.config.base_url or "https://api.deepseek.com/v1/chat/completions"
         
-        self.client = httpx.AsyncClient(
+        self.client = client_pool.http_client(
+            max_connections=self.config.max_connections,
             base_url=base_url,
-            timeout=60.0,
+            timeout=httpx.Timeout(
+                max(self.config.connect_timeout, self.config.read_timeout),
+                connect=self.config.connect_timeout,
+                read=self.config.read_timeout,
+            ),
             headers={
                 "Authorization": f"Bearer {self.config.api_key}",
                 "Content-Type": "application/json",
@@ -39,7 +46,10 @@ class DeepSeekClient(BaseLLMClient):
         json_mode: bool = False,
     ) -> Tuple[str, int, int]:
         """
-        Make a request to the DeepSeek API with retries.
+        Make a streaming request to the DeepSeek API.
+
+        The response is streamed as server-sent events (OpenAI-compatible
+        chat completion chunks); token usage comes with the final chunk.
 
         Args:
             convo: Conversation history
@@ -80,29 +90,53 @@ class DeepSeekClient(BaseLLMClient):
         request_data = {
             "model": self.config.model,
             "messages": messages,
-            "temperature": temperature or self.config.temperature,
+            "temperature": self.config.temperature if temperature is None else temperature,
             "max_tokens": self.config.extra.get("max_tokens", 8192) if self.config.extra else 8192,
             "top_p": self.config.extra.get("top_p", 0.95) if self.config.extra else 0.95,
+            "stream": True,
+            "stream_options": {"include_usage": True},
         }
         
-        if json_mode:
+        # DeepSeek has no JSON schema support, so schema-bound requests use JSON mode
+        # and rely on the schema in the prompt
+        if json_mode or self._response_model() is not None:
             request_data["response_format"] = {"type": "json_object"}
 
+        content_parts = []
+        usage = {}
         try:
-            response = await self.client.post("", json=request_data)
-            response.raise_for_status()
-            data = response.json()
-
-            # Get tokens used
-            usage = data.get("usage", {})
+            async with self.client.stream("POST", "", json=request_data) as response:
+                self._mark_connected()
+                self._update_rate_limits(response)
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+
+                async for line in response.aiter_lines():
+                    # Skip blank lines between events and ": keep-alive" comments
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:") :].strip()
+                    if data == "[DONE]":
+                        break
+
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    # The final chunk with usage stats has no choices
+                    choices = chunk.get("choices")
+                    content = choices[0].get("delta", {}).get("content") if choices else None
+                    if content:
+                        content_parts.append(content)
+                        await self._stream_chunk(content)
+
+            # Tell the stream handler we're done
+            await self._stream_chunk(None)
+
+            response_text = "".join(content_parts)
             prompt_tokens = usage.get("prompt_tokens", 0)
             completion_tokens = usage.get("completion_tokens", 0)
-
-            response_text = data["choices"][0]["message"]["content"]
-
-            # Stream response if handler provided
-            if self.stream_handler:
-                await self.stream_handler(response_text)
+            # DeepSeek caches prompt prefixes automatically (on disk)
+            self._record_cache_usage(usage.get("prompt_cache_hit_tokens", 0))
 
             logger.debug(f"Got response ({completion_tokens} tokens): {response_text[:100]}...")
             return response_text, prompt_tokens, completion_tokens
@@ -118,6 +152,10 @@ class DeepSeekClient(BaseLLMClient):
             logger.error(f"DeepSeek API error: {error_msg}", exc_info=True)
             raise
 
+        except StreamValidationError:
+            # Leaving `client.stream()` closed the connection, so DeepSeek stops generating
+            raise
+
         except Exception as e:
             logger.error(f"Unexpected error calling DeepSeek API: {e}", exc_info=True)
             raise
@@ -1,24 +1,29 @@
 import datetime
 from typing import Optional
 
-import tiktoken
-from groq import AsyncGroq, RateLimitError
+from groq import AsyncGroq, DefaultAsyncHttpxClient, RateLimitError
 from httpx import Timeout
 
 from core.config import LLMProvider
 from core.llm.base import BaseLLMClient
+from core.llm.client_pool import client_pool
 from core.llm.convo import Convo
+from core.llm.parser import StreamValidationError
+from core.llm.tokens import count_tokens
 from core.log import get_logger
 
 log = get_logger(__name__)
-tokenizer = tiktoken.get_encoding("cl100k_base")
 
 
 class GroqClient(BaseLLMClient):
     provider = LLMProvider.GROQ
 
     def _init_client(self):
-        self.client = AsyncGroq(
+        self.client = client_pool.sdk_client(
+            AsyncGroq,
+            DefaultAsyncHttpxClient,
+            max_connections=self.config.max_connections,
+            http2=True,
             api_key=self.config.api_key,
             base_url=self.config.base_url,
             timeout=Timeout(
@@ -36,7 +41,7 @@ class GroqClient(BaseLLMClient):
     ) -> tuple[str, int, int]:
         completion_kwargs = {
             "model": self.config.model,
-            "messages": convo.messages,
+            "messages": [msg.to_dict() for msg in convo.messages],
             "temperature": self.config.temperature if temperature is None else temperature,
             "stream": True,
         }
@@ -44,33 +49,36 @@ class GroqClient(BaseLLMClient):
             completion_kwargs["response_format"] = {"type": "json_object"}
 
         stream = await self.client.chat.completions.create(**completion_kwargs)
+        self._mark_connected()
+        self._update_rate_limits(getattr(stream, "response", None))
         response = []
         prompt_tokens = 0
         completion_tokens = 0
 
-        async for chunk in stream:
-            if not chunk.choices:
-                continue
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
 
-            content = chunk.choices[0].delta.content
-            if not content:
-                continue
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
 
-            response.append(content)
-            if self.stream_handler:
-                await self.stream_handler(content)
+                response.append(content)
+                await self._stream_chunk(content)
+        except StreamValidationError:
+            await self._close_stream(stream)
+            raise
 
         response_str = "".join(response)
 
         # Tell the stream handler we're done
-        if self.stream_handler:
-            await self.stream_handler(None)
+        await self._stream_chunk(None)
 
         if prompt_tokens == 0 and completion_tokens == 0:
             # FIXME: Here we estimate Groq tokens using the same method as for OpenAI....
-            # See https://cookbook.openai.com/examples/how_to_count_tokens_with_tiktoken
-            prompt_tokens = sum(3 + len(tokenizer.encode(msg["content"])) for msg in convo.messages)
-            completion_tokens = len(tokenizer.encode(response_str))
+            prompt_tokens = convo.token_count
+            completion_tokens = count_tokens(response_str)
 
         return response_str, prompt_tokens, completion_tokens
 
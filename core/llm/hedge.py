@@ -0,0 +1,289 @@
+"""Hedged LLM requests with failover to a secondary provider/model."""
+
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, Callable, Optional
+
+from core.config import LLMConfig, LLMHedgeConfig, LLMProvider
+from core.llm.base import APIError, BaseLLMClient, LLMError, ParseError
+from core.llm.cache import normalize_messages
+from core.llm.convo import Convo
+from core.llm.rate_limiter import estimate_tokens
+from core.llm.request_log import LLMRequestLog, LLMRequestStatus
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+PRIMARY = "primary"
+SECONDARY = "secondary"
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent time-to-first-token samples for a model.
+    """
+
+    def __init__(self, window: int = 200):
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Get the p-th percentile of the recorded samples.
+
+        :param p: Percentile (0-100).
+        :return: Latency in seconds, or None if there are no samples.
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))
+        return ordered[index]
+
+
+_latency_trackers: dict[tuple, LatencyTracker] = {}
+
+
+def get_latency_tracker(config: LLMConfig) -> LatencyTracker:
+    """
+    Get the time-to-first-token tracker for the provider and model in `config`.
+
+    :param config: LLM configuration.
+    :return: Latency tracker shared by all clients using the same model.
+    """
+    provider = config.provider.value if isinstance(config.provider, LLMProvider) else str(config.provider)
+    key = (provider, config.model, config.base_url)
+    if key not in _latency_trackers:
+        _latency_trackers[key] = LatencyTracker()
+    return _latency_trackers[key]
+
+
+class _HedgedCall:
+    """State of a single hedged request, shared by the primary and secondary attempts."""
+
+    def __init__(self):
+        self.started = monotonic()
+        self.first_token = asyncio.Event()
+        # The first attempt to stream a token owns the stream handler;
+        # the other one is buffered in case it finishes first.
+        self.owner: Optional[str] = None
+        self.buffered: list[Optional[str]] = []
+        # Response text streamed by each attempt so far
+        self.streamed: dict[str, list[str]] = {PRIMARY: [], SECONDARY: []}
+
+
+_hedged_call: ContextVar[Optional[_HedgedCall]] = ContextVar("hedged_call", default=None)
+
+
+class HedgedClient:
+    """
+    LLM client racing a secondary provider/model against a slow primary.
+
+    The request is sent to the primary model. If it doesn't produce the
+    first token within the configured percentile of its recent
+    time-to-first-token (or fails outright), the same request is sent to
+    the secondary model and whichever finishes first wins. The loser is
+    cancelled, and its (estimated) token usage is reported in the winner's
+    request log.
+
+    The primary is sent without retries, so a failing primary fails over
+    right away instead of retrying first. The error handler is only asked
+    whether to try again once both attempts have failed.
+
+    Only one of the attempts is streamed to the stream handler: the first
+    one to produce a token.
+    """
+
+    def __init__(self, primary: BaseLLMClient, secondary: BaseLLMClient, policy: LLMHedgeConfig):
+        self.primary = primary
+        self.secondary = secondary
+        self.policy = policy
+        self.latency = get_latency_tracker(primary.config)
+
+        self.stream_handler = primary.stream_handler
+        primary.stream_handler = self._stream_handler_for(PRIMARY)
+        secondary.stream_handler = self._stream_handler_for(SECONDARY)
+        self.error_handler = primary.error_handler
+        primary.error_handler = None
+
+    @property
+    def config(self) -> LLMConfig:
+        return self.primary.config
+
+    def hedge_delay(self) -> float:
+        """How long to wait for the primary's first token before hedging (in seconds)."""
+        if len(self.latency.samples) < self.policy.min_samples:
+            return self.policy.default_delay
+        return self.latency.percentile(self.policy.percentile)
+
+    def _stream_handler_for(self, name: str) -> Callable:
+        async def stream_handler(content: Optional[str]):
+            call = _hedged_call.get()
+            if call is None:
+                if self.stream_handler:
+                    await self.stream_handler(content)
+                return
+
+            if content and name == PRIMARY and not call.first_token.is_set():
+                call.first_token.set()
+                self.latency.record(monotonic() - call.started)
+            if content:
+                call.streamed[name].append(content)
+            if content and call.owner is None:
+                call.owner = name
+
+            if call.owner == name:
+                if self.stream_handler:
+                    await self.stream_handler(content)
+            else:
+                call.buffered.append(content)
+
+        return stream_handler
+
+    async def __call__(self, convo: Convo, **kwargs) -> tuple[Any, LLMRequestLog]:
+        """
+        Send the conversation to the LLM, hedging slow requests.
+
+        Accepts the same arguments as `BaseLLMClient.__call__()`.
+
+        :return: Tuple of (response, request log) from the winning attempt.
+        """
+        while True:
+            try:
+                return await self._hedged(convo, **kwargs)
+            except ParseError:
+                raise
+            except APIError as err:
+                if not self.error_handler or not await self.error_handler(LLMError.GENERIC_API_ERROR, err.message):
+                    raise
+
+    async def _hedged(self, convo: Convo, **kwargs) -> tuple[Any, LLMRequestLog]:
+        """
+        Race the primary against the secondary once.
+
+        :return: Tuple of (response, request log) from the winning attempt.
+        """
+        state = _HedgedCall()
+        token = _hedged_call.set(state)
+        try:
+            primary = asyncio.create_task(self.primary(convo, **{**kwargs, "max_retries": 0}))
+        finally:
+            # The attempts run in their own tasks, with a copy of the context
+            _hedged_call.reset(token)
+
+        tasks = {PRIMARY: primary}
+        try:
+            delay = self.hedge_delay()
+            first_token = asyncio.create_task(state.first_token.wait())
+            await asyncio.wait({primary, first_token}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            first_token.cancel()
+
+            if primary.done() and primary.exception() is None:
+                return primary.result()
+            if state.first_token.is_set():
+                # The primary is streaming, no point in hedging unless it fails
+                try:
+                    return await primary
+                except APIError:
+                    if state.owner == PRIMARY and self.stream_handler:
+                        # End the partial response, so the secondary's isn't appended to it
+                        await self.stream_handler(None)
+                    state.owner = None
+                    state.buffered.clear()
+
+            if primary.done():
+                log.warning(f"Request to {self.primary.config.model} failed, failing over to {self.secondary.config.model}")
+            else:
+                log.info(
+                    f"No response from {self.primary.config.model} after {delay:.1f}s, "
+                    f"hedging with {self.secondary.config.model}"
+                )
+
+            token = _hedged_call.set(state)
+            try:
+                tasks[SECONDARY] = asyncio.create_task(self.secondary(convo, **kwargs))
+            finally:
+                _hedged_call.reset(token)
+            response, request_log = await self._first_successful(tasks, state)
+            for name, task in tasks.items():
+                if not task.done():
+                    request_log.hedged.append(self._cancelled_log(name, convo, state, kwargs.get("temperature")))
+            return response, request_log
+        finally:
+            if not state.first_token.is_set():
+                # The primary failed or was cancelled before its first token. Its
+                # time to first token is at least the time elapsed so far; leaving
+                # it out would skew the percentile (and the hedge delay) towards
+                # the fast responses, hedging more and more requests.
+                self.latency.record(monotonic() - state.started)
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+    def _cancelled_log(
+        self,
+        name: str,
+        convo: Convo,
+        state: _HedgedCall,
+        temperature: Optional[float],
+    ) -> LLMRequestLog:
+        """
+        Log the attempt that lost the race.
+
+        The attempt is cancelled before it reports its usage, so the tokens
+        are estimated: the provider bills the prompt, and what was streamed
+        so far.
+
+        :param name: Name of the losing attempt.
+        :param convo: The conversation sent.
+        :param state: State of the hedged call.
+        :param temperature: Temperature override the request was made with.
+        :return: Request log of the cancelled attempt.
+        """
+        config = self.primary.config if name == PRIMARY else self.secondary.config
+        response = "".join(state.streamed[name])
+        return LLMRequestLog(
+            provider=config.provider,
+            model=config.model,
+            temperature=config.temperature if temperature is None else temperature,
+            messages=normalize_messages(convo),
+            prompt_tokens=estimate_tokens(convo),
+            completion_tokens=len(response) // 4,
+            duration=monotonic() - state.started,
+            status=LLMRequestStatus.ERROR,
+            response=response,
+            error="Cancelled: the hedged request was won by the other model",
+        )
+
+    async def _first_successful(self, tasks: dict[str, asyncio.Task], state: _HedgedCall) -> tuple[Any, LLMRequestLog]:
+        """
+        Wait for the first attempt to succeed.
+
+        :param tasks: Attempts in progress, by name.
+        :param state: State of the hedged call.
+        :return: Result of the winning attempt.
+        :raises: The primary's error, if all attempts fail.
+        """
+        pending = set(tasks.values())
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for name, task in tasks.items():
+                if task in done and task.exception() is None:
+                    if state.owner not in (None, name):
+                        log.debug(f"Hedged request won by the {name} model after the other one started streaming")
+                        if self.stream_handler:
+                            # End the loser's partial response, so the winner's isn't appended to it
+                            await self.stream_handler(None)
+                    if state.owner != name and self.stream_handler:
+                        for content in state.buffered:
+                            await self.stream_handler(content)
+                    return task.result()
+            if not pending:
+                raise tasks[PRIMARY].exception()
+
+
+__all__ = ["HedgedClient", "LatencyTracker", "get_latency_tracker"]
@@ -0,0 +1,177 @@
+import hashlib
+import json
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional
+
+from httpx import Timeout
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from core.config import LLMConfig, LLMProvider
+from core.llm.client_pool import client_pool
+from core.llm.convo import Convo
+from core.llm.openai_client import OpenAIClient
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_BASE_URL = "http://localhost:1234/v1"
+
+# Local servers have no per-request connection cost worth paying again after
+# a pause (eg. while the user reviews a step), so keep connections open longer
+LOCAL_KEEPALIVE_EXPIRY = 600.0
+
+# Number of leading messages identifying a conversation (the system prompt and
+# the initial request); later calls in the same conversation share them.
+SESSION_PREFIX_MESSAGES = 2
+
+
+class SlotPool:
+    """
+    Assignment of conversations to the inference server's slots.
+
+    llama.cpp-style servers keep the KV cache of the last prompt processed
+    in each slot. Sending consecutive requests from the same conversation to
+    the same slot lets the server reuse the cached prefix instead of
+    processing the whole prompt again. When all slots are taken, the least
+    recently used one is reassigned.
+    """
+
+    def __init__(self, num_slots: int):
+        self.num_slots = num_slots
+        self.sessions: OrderedDict[str, int] = OrderedDict()
+
+    @staticmethod
+    def session_key(convo: Convo) -> str:
+        """
+        Identify the conversation a request belongs to.
+
+        :param convo: Conversation to send.
+        :return: Hash of the conversation's leading messages.
+        """
+        prefix = [
+            (msg.role, msg.content if isinstance(msg.content, str) else json.dumps(msg.content, sort_keys=True))
+            for msg in convo.messages[:SESSION_PREFIX_MESSAGES]
+        ]
+        return hashlib.sha256(json.dumps(prefix).encode("utf-8")).hexdigest()
+
+    def slot_for(self, convo: Convo) -> int:
+        """
+        Get the slot to send a conversation to.
+
+        :param convo: Conversation to send.
+        :return: Slot ID.
+        """
+        key = self.session_key(convo)
+        if key in self.sessions:
+            self.sessions.move_to_end(key)
+            return self.sessions[key]
+
+        if len(self.sessions) < self.num_slots:
+            slot = len(self.sessions)
+        else:
+            _, slot = self.sessions.popitem(last=False)
+        self.sessions[key] = slot
+        return slot
+
+
+_slot_pools: dict[tuple, SlotPool] = {}
+
+
+def get_slot_pool(config: LLMConfig, num_slots: int) -> SlotPool:
+    """
+    Get the slot assignments for the server and model in `config`.
+
+    :param config: LLM configuration.
+    :param num_slots: Number of slots the server has.
+    :return: Slot pool shared by all clients using the same server.
+    """
+    key = (config.base_url or DEFAULT_BASE_URL, config.model, num_slots)
+    if key not in _slot_pools:
+        _slot_pools[key] = SlotPool(num_slots)
+    return _slot_pools[key]
+
+
+class LMStudioClient(OpenAIClient):
+    """
+    Client for local OpenAI-compatible inference servers (LM Studio, llama.cpp).
+
+    Connections are kept alive between steps, the server is asked to
+    cache the processed prompt, and if the server has multiple slots
+    (`slots` in the provider's `extra` config), each conversation is
+    pinned to a slot so its follow-up requests reuse the KV cache.
+
+    Other `extra` options:
+    - `ttl`: seconds LM Studio keeps a just-in-time loaded model in memory while idle
+    """
+
+    provider = LLMProvider.LM_STUDIO
+    # Both LM Studio and llama.cpp constrain the output to a JSON schema
+    native_schema = True
+
+    def _init_client(self):
+        extra = self.config.extra or {}
+        num_slots = extra.get("slots")
+        self.slots = get_slot_pool(self.config, num_slots) if num_slots else None
+        self.ttl = extra.get("ttl")
+
+        self.client = client_pool.sdk_client(
+            AsyncOpenAI,
+            DefaultAsyncHttpxClient,
+            max_connections=self.config.max_connections,
+            keepalive_expiry=LOCAL_KEEPALIVE_EXPIRY,
+            # Local servers don't require a key, but the SDK does
+            api_key=self.config.api_key or "lm-studio",
+            base_url=self.config.base_url or DEFAULT_BASE_URL,
+            timeout=Timeout(
+                max(self.config.connect_timeout, self.config.read_timeout),
+                connect=self.config.connect_timeout,
+                read=self.config.read_timeout,
+            ),
+        )
+
+    def _completion_kwargs(self, convo: Convo, temperature: Optional[float], json_mode: bool) -> dict:
+        completion_kwargs = super()._completion_kwargs(convo, temperature, json_mode)
+
+        if completion_kwargs.get("response_format", {}).get("type") == "json_object":
+            # LM Studio only supports schema-constrained JSON
+            completion_kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": {"type": "object"}},
+            }
+
+        extra_body = {"cache_prompt": True}
+        if self.slots is not None:
+            extra_body["id_slot"] = self.slots.slot_for(convo)
+        if self.ttl is not None:
+            extra_body["ttl"] = self.ttl
+        completion_kwargs["extra_body"] = extra_body
+        return completion_kwargs
+
+    async def warm_up(self) -> bool:
+        """
+        Load the model into memory before it's needed.
+
+        Local servers load models on first use, which can take a while;
+        doing it at startup keeps that out of the first step's latency.
+
+        Returns:
+            True if the model responded, False otherwise.
+        """
+        start = monotonic()
+        try:
+            await self.client.chat.completions.create(
+                model=self.config.model,
+                messages=[{"role": "user", "content": "Hi"}],
+                max_tokens=1,
+                extra_body={"ttl": self.ttl} if self.ttl is not None else None,
+            )
+        except Exception as err:  # noqa
+            log.warning(f"Couldn't warm up {self.config.model} at {self.config.base_url or DEFAULT_BASE_URL}: {err}")
+            return False
+
+        log.info(f"Warmed up {self.config.model} in {monotonic() - start:.1f}s")
+        return True
+
+
+__all__ = ["LMStudioClient", "SlotPool"]
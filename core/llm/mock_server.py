@@ -0,0 +1,334 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API.
+
+Used for load and latency testing without network access: point the
+OpenAI (or DeepSeek) client at it via `base_url` and it streams scripted
+or recorded responses with configurable latency, injects rate limit and
+server errors, and reports token usage like the real API does.
+
+Run it with:
+
+    python -m core.llm.mock_server --port 8001 --ttft 0.5 --tokens-per-second 50
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from core.llm.replay import ReplayStore
+from core.llm.tokens import MESSAGE_OVERHEAD, REPLY_OVERHEAD, count_tokens
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+# Splits the response into word-sized stream chunks (leading whitespace included)
+CHUNK_PATTERN = re.compile(r"\s*\S+|\s+")
+
+# Length of the rate limit window (in seconds)
+RATE_LIMIT_WINDOW = 60
+
+
+@dataclass
+class MockLLMConfig:
+    """Behaviour of the mock LLM server."""
+
+    # Responses served in order (round robin), unless a recorded one matches
+    responses: list[str] = field(default_factory=lambda: ["OK"])
+    # Recorded responses (JSONL export or database URL, see `ReplayStore`)
+    replay_source: Optional[str] = None
+    # Delay before the first chunk (in seconds)
+    ttft: float = 0.0
+    # Streaming speed, 0 streams the whole response at once
+    tokens_per_second: float = 0.0
+    # Fraction of requests failing with a randomly picked status from `error_statuses`
+    error_rate: float = 0.0
+    error_statuses: list[int] = field(default_factory=lambda: [429, 500, 503])
+    # Delay the client is asked to wait after a 429 (in seconds)
+    retry_after: float = 1.0
+    # Per-minute limits, 0 means unlimited; exceeding them results in a 429
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    # Seed for the error injection, for reproducible runs
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockLLMStats:
+    """Usage accounting of the mock LLM server."""
+
+    requests: int = 0
+    errors: dict[int, int] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class MockLLMServer:
+    """
+    OpenAI-compatible chat completions server with scripted behaviour.
+
+    Exposes `POST /chat/completions` (also under `/v1`), supporting both
+    streaming (server-sent events) and non-streaming responses, and
+    `GET /stats` with the usage accounting.
+    """
+
+    def __init__(self, config: Optional[MockLLMConfig] = None):
+        self.config = config or MockLLMConfig()
+        self.store = ReplayStore(self.config.replay_source) if self.config.replay_source else None
+        self.stats = MockLLMStats()
+        self.random = random.Random(self.config.seed)
+        self.next_response = 0
+        self.window_start = time.time()
+        self.window_requests = 0
+        self.window_tokens = 0
+
+        self.app = FastAPI(title="Mock LLM")
+        for prefix in ["", "/v1"]:
+            # httpx appends a slash to the base URL, so clients using the full endpoint as base URL post to ".../"
+            for path in ["/chat/completions", "/chat/completions/"]:
+                self.app.add_api_route(prefix + path, self.chat_completions, methods=["POST"])
+        self.app.add_api_route("/stats", self.get_stats, methods=["GET"])
+
+    def pick_response(self, messages: list[dict]) -> str:
+        """
+        Pick the response to a conversation.
+
+        :param messages: Messages from the request.
+        :return: Recorded response if one matches, otherwise the next scripted one.
+        """
+        if self.store is not None:
+            recorded = self.store.lookup_messages(messages)
+            if recorded is not None:
+                return recorded.response
+
+        response = self.config.responses[self.next_response % len(self.config.responses)]
+        self.next_response += 1
+        return response
+
+    def rate_limit_headers(self) -> dict[str, str]:
+        """
+        Rate limit headers, in the formats the OpenAI and DeepSeek clients understand.
+
+        :return: Response headers.
+        """
+        now = time.time()
+        reset = max(self.window_start + RATE_LIMIT_WINDOW - now, 0)
+        headers = {"x-ratelimit-reset": str(int(now + reset))}
+        if self.config.requests_per_minute:
+            headers["x-ratelimit-limit-requests"] = str(self.config.requests_per_minute)
+            headers["x-ratelimit-remaining-requests"] = str(
+                max(self.config.requests_per_minute - self.window_requests, 0)
+            )
+            headers["x-ratelimit-reset-requests"] = f"{int(reset)}s"
+        if self.config.tokens_per_minute:
+            headers["x-ratelimit-limit-tokens"] = str(self.config.tokens_per_minute)
+            headers["x-ratelimit-remaining-tokens"] = str(max(self.config.tokens_per_minute - self.window_tokens, 0))
+            headers["x-ratelimit-reset-tokens"] = f"{int(reset)}s"
+        return headers
+
+    def check_limits(self, prompt_tokens: int) -> Optional[int]:
+        """
+        Account a request against the rate limits and the error injection.
+
+        :param prompt_tokens: Prompt size of the request.
+        :return: Error status to respond with, or None if the request may proceed.
+        """
+        now = time.time()
+        if now - self.window_start >= RATE_LIMIT_WINDOW:
+            self.window_start = now
+            self.window_requests = 0
+            self.window_tokens = 0
+
+        if self.config.requests_per_minute and self.window_requests >= self.config.requests_per_minute:
+            return 429
+        if self.config.tokens_per_minute and self.window_tokens + prompt_tokens > self.config.tokens_per_minute:
+            return 429
+
+        if self.config.error_rate and self.random.random() < self.config.error_rate:
+            return self.random.choice(self.config.error_statuses)
+
+        self.window_requests += 1
+        self.window_tokens += prompt_tokens
+        return None
+
+    def error_response(self, status: int) -> JSONResponse:
+        self.stats.errors[status] = self.stats.errors.get(status, 0) + 1
+        headers = self.rate_limit_headers()
+        if status == 429:
+            error_type = "rate_limit_exceeded"
+            headers["retry-after"] = str(self.config.retry_after)
+            headers["retry-after-ms"] = str(int(self.config.retry_after * 1000))
+        else:
+            error_type = "server_error"
+        return JSONResponse(
+            {"error": {"message": f"Mock LLM error {status}", "type": error_type, "code": None, "param": None}},
+            status_code=status,
+            headers=headers,
+        )
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "mock")
+
+        prompt_tokens = REPLY_OVERHEAD + sum(
+            MESSAGE_OVERHEAD + count_tokens(self._content(msg.get("content"))) for msg in messages
+        )
+        self.stats.requests += 1
+
+        if self.store is not None:
+            await self.store.load()
+
+        status = self.check_limits(prompt_tokens)
+        if status is not None:
+            return self.error_response(status)
+
+        text = self.pick_response([{**msg, "content": self._content(msg.get("content"))} for msg in messages])
+        completion_tokens = count_tokens(text)
+        self.window_tokens += completion_tokens
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        completion_id = f"chatcmpl-{uuid4().hex}"
+        created = int(time.time())
+        headers = self.rate_limit_headers()
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.config.ttft + self._streaming_time(completion_tokens))
+            return JSONResponse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+                headers=headers,
+            )
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events() -> AsyncIterator[str]:
+            def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(data)}\n\n"
+
+            await asyncio.sleep(self.config.ttft)
+            yield chunk({"role": "assistant", "content": ""})
+
+            parts = CHUNK_PATTERN.findall(text)
+            delay = self._streaming_time(completion_tokens) / len(parts) if parts else 0
+            for part in parts:
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk({"content": part})
+
+            yield chunk({}, "stop")
+            if include_usage:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    async def get_stats(self):
+        return {
+            "requests": self.stats.requests,
+            "errors": self.stats.errors,
+            "prompt_tokens": self.stats.prompt_tokens,
+            "completion_tokens": self.stats.completion_tokens,
+        }
+
+    def _streaming_time(self, completion_tokens: int) -> float:
+        if not self.config.tokens_per_second:
+            return 0.0
+        return completion_tokens / self.config.tokens_per_second
+
+    @staticmethod
+    def _content(content) -> str:
+        if content is None:
+            return ""
+        if not isinstance(content, str):
+            return json.dumps(content, sort_keys=True, default=str)
+        return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server for load and latency testing")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8001, help="Port to listen on")
+    parser.add_argument("--responses", help="JSON file with a list of responses to serve in order")
+    parser.add_argument("--replay", help="Recorded responses to serve (JSONL export or database URL)")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Time to first token (in seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming speed (0 for no delay)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests to fail")
+    parser.add_argument(
+        "--error-statuses",
+        type=lambda value: [int(status) for status in value.split(",")],
+        default=[429, 500, 503],
+        help="Comma-separated HTTP statuses of the injected errors",
+    )
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of rate limit errors (in seconds)")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute limit (0 for unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens per minute limit (0 for unlimited)")
+    parser.add_argument("--seed", type=int, help="Random seed for the error injection")
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        replay_source=args.replay,
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_statuses=args.error_statuses,
+        retry_after=args.retry_after,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        seed=args.seed,
+    )
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            config.responses = json.load(f)
+
+    import uvicorn
+
+    uvicorn.run(MockLLMServer(config).app, host=args.host, port=args.port)
+
+
+__all__ = ["MockLLMConfig", "MockLLMServer"]
+
+
+if __name__ == "__main__":
+    main()
@@ -2,38 +2,85 @@ import datetime
 import re
 from typing import Optional, Callable, AsyncGenerator
 
-import tiktoken
 from httpx import Timeout
-from openai import AsyncOpenAI, APIError, APIConnectionError
+from openai import AsyncOpenAI, APIError, APIConnectionError, DefaultAsyncHttpxClient
 from openai.types.chat import ChatCompletionChunk
 
 from core.config import LLMConfig
 from core.llm.base import BaseLLMClient
+from core.llm.client_pool import client_pool
 from core.llm.convo import Convo
+from core.llm.parser import StreamValidationError
 from core.llm.request_log import RequestLog
+from core.llm.tokens import count_tokens
 from core.log import get_logger
 
 log = get_logger(__name__)
-tokenizer = tiktoken.get_encoding("cl100k_base")
+
+# Models supporting the `json_schema` response format (structured outputs)
+STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "o1", "o3", "o4")
+# Model snapshots that predate structured outputs
+NO_STRUCTURED_OUTPUT_MODELS = ("gpt-4o-2024-05-13", "o1-preview", "o1-mini")
 
 
 class OpenAIClient(BaseLLMClient):
     """OpenAI chat completion client."""
 
-    def __init__(self, config: LLMConfig, error_handler: Optional[Callable] = None, stream_handler: Optional[Callable] = None):
-        """Initialize the OpenAI client.
-        
+    @property
+    def native_schema(self) -> bool:
+        model = self.config.model
+        return model.startswith(STRUCTURED_OUTPUT_MODELS) and not model.startswith(NO_STRUCTURED_OUTPUT_MODELS)
+
+    def _init_client(self):
+        self.client = client_pool.sdk_client(
+            AsyncOpenAI,
+            DefaultAsyncHttpxClient,
+            max_connections=self.config.max_connections,
+            http2=True,
+            api_key=self.config.api_key,
+            base_url=self.config.endpoint,
+            timeout=Timeout(
+                max(self.config.connect_timeout, self.config.read_timeout),
+                connect=self.config.connect_timeout,
+                read=self.config.read_timeout,
+            ),
+        )
+
+    def _completion_kwargs(self, convo: Convo, temperature: Optional[float], json_mode: bool) -> dict:
+        """Build the arguments for the (streaming) chat completion request.
+
         Args:
-            config: LLM configuration
-            error_handler: Optional function to handle errors
-            stream_handler: Optional function to handle streaming responses
+            convo: The conversation to send
+            temperature: Override the default temperature
+            json_mode: Whether to request JSON output
+
+        Returns:
+            Keyword arguments for `chat.completions.create()`
         """
-        super().__init__(config, error_handler)
-        self.stream_handler = stream_handler
-        self.client = AsyncOpenAI(
-            api_key=config.api_key,
-            base_url=config.endpoint,
-        )
+        completion_kwargs = {
+            "model": self.config.model,
+            "messages": [msg.to_dict() for msg in convo.messages],
+            "temperature": self.config.temperature if temperature is None else temperature,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+
+        response_model = self._response_model()
+        if response_model is not None and self.native_schema:
+            # Not strict: strict mode only supports a subset of JSON schema
+            # (eg. no optional fields), which our models don't stick to
+            completion_kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": response_model.__name__,
+                    "schema": response_model.model_json_schema(),
+                    "strict": False,
+                },
+            }
+        elif json_mode:
+            completion_kwargs["response_format"] = {"type": "json_object"}
+
+        return completion_kwargs
 
     async def _make_request(
         self,
@@ -51,30 +98,34 @@ class OpenAIClient(BaseLLMClient):
         Returns:
             Tuple of (response text, prompt tokens, completion tokens)
         """
-        completion_kwargs = {
-            "model": self.config.model,
-            "messages": [msg.__dict__ for msg in convo.messages],
-            "temperature": self.config.temperature if temperature is None else temperature,
-            "stream": True,
-        }
-
-        if json_mode:
-            completion_kwargs["response_format"] = {"type": "json_object"}
-
+        completion_kwargs = self._completion_kwargs(convo, temperature, json_mode)
         stream = await self.client.chat.completions.create(**completion_kwargs)
-        
+        self._mark_connected()
+        self._update_rate_limits(getattr(stream, "response", None))
+
         content_parts = []
-        async for chunk in stream:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                content_parts.append(content)
-                if self.stream_handler:
-                    await self.stream_handler(content)
+        chunk = None
+        try:
+            async for chunk in stream:
+                # The final chunk with usage stats has no choices
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    content_parts.append(content)
+                    await self._stream_chunk(content)
+        except StreamValidationError:
+            await self._close_stream(stream)
+            raise
 
         response = "".join(content_parts)
         
-        # Get token counts from the last chunk
-        usage = chunk.usage
+        # Get token counts from the last chunk. OpenAI caches long prompt prefixes
+        # automatically and reports the cached part in `prompt_tokens_details`.
+        usage = getattr(chunk, "usage", None)
+        if usage is None:
+            # Some OpenAI-compatible servers don't report usage when streaming
+            return response, convo.token_count, count_tokens(response)
+        prompt_tokens_details = getattr(usage, "prompt_tokens_details", None)
+        self._record_cache_usage(getattr(prompt_tokens_details, "cached_tokens", None) or 0)
         return response, usage.prompt_tokens, usage.completion_tokens
 
     def rate_limit_sleep(self, err: APIError) -> Optional[datetime.timedelta]:
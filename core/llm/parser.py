@@ -1,9 +1,116 @@
 import json
 import re
 from enum import Enum
-from typing import Optional, Union
+from typing import Any, Callable, Optional, Union, get_args, get_origin
 
-from pydantic import BaseModel, ValidationError, create_model
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+
+# How much prose before the JSON value a tolerant incremental parser accepts
+MAX_PREAMBLE = 200
+
+
+def _unfence(text: str) -> str:
+    """
+    Get the contents of the code block wrapping the text.
+
+    Everything between the opening fence and the *last* closing fence is
+    the contents, so fences inside the block (eg. Markdown in a JSON
+    string) are kept. A missing closing fence (truncated response) is
+    tolerated.
+
+    :param text: Text, possibly wrapped in a code block.
+    :return: Contents of the code block, or the text if it's not fenced.
+    """
+    text = text.strip()
+    start = text.find("```")
+    if start == -1:
+        return text
+
+    newline = text.find("\n", start)
+    if newline == -1:
+        return text[start + 3 :]
+    body = text[newline + 1 :]
+    end = body.rfind("\n```")
+    if end == -1:
+        return body.rstrip().removesuffix("```")
+    return body[:end]
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Try to repair an almost-valid JSON response.
+
+    Handles the common ways LLMs mangle JSON: a code fence that's not
+    closed or contains other fences, a preamble ("Here is the JSON:") or
+    conclusion around the value, trailing commas, and a response truncated
+    before the closing brackets.
+
+    :param text: Response text.
+    :return: Valid JSON text, or None if the response can't be repaired.
+    """
+    text = text.strip()
+    value_start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    fence_start = text.find("```")
+    if fence_start != -1 and (value_start == -1 or fence_start < value_start):
+        text = _unfence(text)
+        value_start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if value_start == -1:
+        return None
+
+    out: list[str] = []
+    stack: list[str] = []
+    in_string = escape = False
+
+    def drop_trailing_comma():
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+
+    for c in text[value_start:]:
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            if not stack or stack[-1] != c:
+                return None
+            drop_trailing_comma()
+            out.append(stack.pop())
+            if not stack:
+                # Ignore anything after the value
+                break
+        else:
+            out.append(c)
+    else:
+        # Truncated response: close the open string and brackets
+        if in_string:
+            if escape:
+                out.pop()
+            out.append('"')
+        drop_trailing_comma()
+        if out and out[-1] == ":":
+            out.append(" null")
+        while stack:
+            drop_trailing_comma()
+            out.append(stack.pop())
+
+    repaired = "".join(out)
+    try:
+        json.loads(repaired)
+    except json.JSONDecodeError:
+        return None
+    return repaired
 
 
 class MultiCodeBlockParser:
@@ -62,12 +169,28 @@ class CodeBlockParser(MultiCodeBlockParser):
 
     def __call__(self, text: str) -> str:
         blocks = super().__call__(text)
-        # FIXME: if there are more than 1 code block, this means the output actually contains ```,
-        # so re-parse this with that in mind
+        # If there is more than one code block, the output may actually contain ```,
+        # see `repair()`
         if len(blocks) != 1:
             raise ValueError(f"Expected a single code block, got {len(blocks)}")
         return blocks[0]
 
+    def repair(self, text: str) -> str:
+        """
+        Parse a response that failed to parse, assuming it's a single code block.
+
+        Treats everything between the first opening and the last closing
+        fence as the code block (the code itself contains fences), and
+        tolerates a missing closing fence.
+
+        :param text: Response text.
+        :return: Contents of the code block.
+        :raises ValueError: If the response has no code block.
+        """
+        if "```" not in text:
+            raise ValueError("Expected a code block")
+        return _unfence(text).strip()
+
 
 class OptionalCodeBlockParser:
     def __call__(self, text: str) -> str:
@@ -82,12 +205,239 @@ class OptionalCodeBlockParser:
         return text
 
 
+class StreamValidationError(ValueError):
+    """
+    The streamed LLM response can't possibly match the expected format.
+    """
+
+
+class IncrementalJSONParser:
+    """
+    Validate a JSON response while it's being streamed.
+
+    Feed the response chunks as they arrive. As soon as the partial response
+    is certain not to match the spec (prose instead of JSON, an unknown key
+    for a model that forbids extra fields, an invalid list element),
+    `StreamValidationError` is raised so the caller can abort the request
+    instead of paying for the rest of the completion.
+
+    Elements of top-level list fields (eg. `ReviewChanges.hunks`) are
+    validated and handed to the `on_item` callback as soon as each one
+    is complete.
+
+    Usage:
+    >>> parser = IncrementalJSONParser(TaskSteps, on_item=on_step)
+    >>> parser.feed('{"steps": [{"type": "command", "command": {"command": "ls"}}, ')
+    >>> assert len(parser.items["steps"]) == 1  # on_step() was called with the first step
+    """
+
+    def __init__(
+        self,
+        spec: Optional[type[BaseModel]] = None,
+        on_item: Optional[Callable[[str, Any], None]] = None,
+        allow_preamble: bool = False,
+    ):
+        self.spec = spec
+        self.on_item = on_item
+        self.allow_preamble = allow_preamble
+        self.text = ""
+        self.items: dict[str, list] = {}
+
+        self.fields: dict[str, str] = {}
+        self.list_adapters: dict[str, TypeAdapter] = {}
+        self.forbid_extra = False
+        if spec is not None:
+            self.forbid_extra = spec.model_config.get("extra") == "forbid"
+            for name, field in spec.model_fields.items():
+                self.fields[name] = name
+                if field.alias:
+                    self.fields[field.alias] = name
+                if get_origin(field.annotation) is list and get_args(field.annotation):
+                    self.list_adapters[name] = TypeAdapter(get_args(field.annotation)[0])
+
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.stack: list[str] = []
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_start: Optional[int] = None
+        self.current_key: Optional[str] = None
+        self.list_field: Optional[str] = None
+        self.elem_start: Optional[int] = None
+
+    def feed(self, chunk: str):
+        """
+        Process the next chunk of the streamed response.
+
+        :param chunk: Response text chunk.
+        :raises StreamValidationError: If the response can't match the spec.
+        """
+        self.text += chunk
+        if not self.started and not self._find_start():
+            return
+        self._scan()
+
+    def _find_start(self) -> bool:
+        """Skip the optional preamble and code fence and find the start of the JSON value."""
+        stripped = self.text.lstrip()
+        offset = len(self.text) - len(stripped)
+
+        if self.allow_preamble and stripped and not stripped.startswith(("`", "{", "[")):
+            # Skip a preamble ("Here is the JSON:"), it's removed when the response is repaired
+            starts = [i for i in (stripped.find("```"), stripped.find("{")) if i != -1]
+            if not starts:
+                if len(stripped) > MAX_PREAMBLE:
+                    raise StreamValidationError(f"Expected a JSON value, got: {stripped[:40]!r}")
+                return False
+            offset += min(starts)
+            stripped = stripped[min(starts) :]
+
+        if stripped.startswith("```"):
+            newline = stripped.find("\n")
+            if newline == -1:
+                return False
+            rest = stripped[newline + 1 :]
+            offset += newline + 1 + len(rest) - len(rest.lstrip())
+            stripped = rest.lstrip()
+        elif "```".startswith(stripped):
+            # Empty, or the beginning of a code fence
+            return False
+
+        if not stripped:
+            return False
+
+        if stripped[0] not in "{[":
+            raise StreamValidationError(f"Expected a JSON value, got: {stripped[:40]!r}")
+        if stripped[0] == "[" and self.spec is not None:
+            raise StreamValidationError("Expected a JSON object, got an array")
+
+        self.started = True
+        self.pos = offset
+        return True
+
+    def _scan(self):
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self._on_key(json.loads(text[self.key_start : i + 1]))
+                        self.key_start = None
+                continue
+
+            if self.done:
+                break
+
+            depth = len(self.stack)
+            in_list_field = depth == 2 and self.list_field is not None and self.stack[1] == "["
+            if in_list_field and self.elem_start is None and c not in " \t\r\n,]":
+                self.elem_start = i
+
+            if c == '"':
+                self.in_string = True
+                if depth == 1 and self.stack[0] == "{" and self.expect_key:
+                    self.key_start = i
+                    self.expect_key = False
+            elif c in "{[":
+                if depth == 1 and self.stack[0] == "{" and c == "[" and self.current_key in self.list_adapters:
+                    self.list_field = self.current_key
+                    self.elem_start = None
+                self.stack.append(c)
+                if depth == 0 and c == "{":
+                    self.expect_key = True
+            elif c in "}]":
+                if in_list_field and c == "]":
+                    self._on_element(i)
+                    self.list_field = None
+                if self.stack:
+                    self.stack.pop()
+                if not self.stack:
+                    self.done = True
+            elif c == ",":
+                if depth == 1 and self.stack[0] == "{":
+                    self.expect_key = True
+                elif in_list_field:
+                    self._on_element(i)
+
+        self.pos = len(text)
+
+    def _on_key(self, key: str):
+        if self.spec is not None and key not in self.fields and self.forbid_extra:
+            raise StreamValidationError(f"Unexpected field `{key}` in response")
+        self.current_key = self.fields.get(key, key)
+
+    def _on_element(self, end: int):
+        if self.elem_start is None:
+            return
+
+        raw = self.text[self.elem_start : end].strip()
+        self.elem_start = None
+        field = self.list_field
+        try:
+            item = self.list_adapters[field].validate_json(raw)
+        except ValidationError as err:
+            errtxt = JSONParser.errors_to_markdown(err.errors())
+            raise StreamValidationError(f"Invalid element in `{field}`:\n{errtxt}") from err
+
+        self.items.setdefault(field, []).append(item)
+        if self.on_item:
+            self.on_item(field, item)
+
+
+# Response models extended with the `original_response` field, by spec
+_extended_models: dict[type[BaseModel], type[BaseModel]] = {}
+
+
+def extended_model(spec: type[BaseModel]) -> type[BaseModel]:
+    """
+    Get the model with the fields of `spec`, plus the original response text.
+
+    The model is created once per spec, and reused for all the parsed responses.
+
+    :param spec: Response model.
+    :return: Extended model.
+    """
+    if spec not in _extended_models:
+        _extended_models[spec] = create_model(
+            f"Extended{spec.__name__}",
+            original_response=(str, ...),
+            **{field_name: (field.annotation, field.default) for field_name, field in spec.model_fields.items()},
+        )
+    return _extended_models[spec]
+
+
 class JSONParser:
-    def __init__(self, spec: Optional[BaseModel] = None, strict: bool = True):
+    def __init__(
+        self,
+        spec: Optional[BaseModel] = None,
+        strict: bool = True,
+        on_item: Optional[Callable[[str, Any], None]] = None,
+    ):
         self.spec = spec
         self.strict = strict or (spec is not None)
+        self.on_item = on_item
         self.original_response = None
 
+    def stream(self) -> Optional[IncrementalJSONParser]:
+        """
+        Create an incremental parser to validate the response while it's streamed.
+
+        :return: Incremental parser, or None if early validation is not possible
+            (non-strict parsing tolerates invalid responses).
+        """
+        if not self.strict:
+            return None
+        # A preamble doesn't need a new request, see `repair()`
+        return IncrementalJSONParser(self.spec, on_item=self.on_item, allow_preamble=True)
+
     @property
     def schema(self):
         return self.spec.model_json_schema() if self.spec else None
@@ -102,6 +452,21 @@ class JSONParser:
             error_txt.append(f"- `{loc}`: {etype} ({msg})")
         return "\n".join(error_txt)
 
+    def repair(self, text: str) -> Union[BaseModel, dict, None]:
+        """
+        Parse a response that failed to parse, after repairing it.
+
+        See `repair_json()` for the kinds of damage that can be repaired.
+
+        :param text: Response text.
+        :return: Parsed response.
+        :raises ValueError: If the response can't be repaired, or is still invalid after repair.
+        """
+        repaired = repair_json(text)
+        if repaired is None:
+            raise ValueError("JSON can't be repaired")
+        return self(repaired)
+
     def __call__(self, text: str) -> Union[BaseModel, dict, None]:
         self.original_response = text.strip()  # Store the original text
         text = self.original_response
@@ -132,17 +497,9 @@ class JSONParser:
         except Exception as err:
             raise ValueError(f"Error parsing JSON: {err}") from err
 
-        # Create a new model that includes the original model fields and the original text
-        ExtendedModel = create_model(
-            f"Extended{self.spec.__name__}",
-            original_response=(str, ...),
-            **{field_name: (field.annotation, field.default) for field_name, field in self.spec.__fields__.items()},
-        )
-
-        # Instantiate the extended model
-        extended_model = ExtendedModel(original_response=self.original_response, **model.dict())
-
-        return extended_model
+        # Include the original text with the model fields
+        ExtendedModel = extended_model(self.spec)
+        return ExtendedModel(original_response=self.original_response, **model.model_dump())
 
 
 class EnumParser:
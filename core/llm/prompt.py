@@ -1,7 +1,126 @@
+from collections import OrderedDict
+from os import makedirs
 from os.path import isdir
-from typing import Any, Optional
+from typing import Any, Callable, Hashable, Iterator, Optional
 
-from jinja2 import BaseLoader, Environment, FileSystemLoader, StrictUndefined, TemplateNotFound
+from jinja2 import (
+    BaseLoader,
+    BytecodeCache,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    StrictUndefined,
+    Template,
+    TemplateNotFound,
+)
+from jinja2.runtime import Context
+
+from core.config import get_config
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+_bytecode_caches: dict[Optional[str], BytecodeCache] = {}
+
+
+def get_bytecode_cache() -> Optional[BytecodeCache]:
+    """
+    Get the on-disk cache of compiled templates, as configured.
+
+    Jinja checks the cached code against the template source, so
+    templates that changed are recompiled.
+
+    :return: Shared bytecode cache, or None if it's disabled.
+    """
+    config = get_config().prompt
+    if not config.bytecode_cache:
+        return None
+
+    if config.cache_dir not in _bytecode_caches:
+        if config.cache_dir:
+            makedirs(config.cache_dir, exist_ok=True)
+        _bytecode_caches[config.cache_dir] = FileSystemBytecodeCache(config.cache_dir)
+    return _bytecode_caches[config.cache_dir]
+
+
+class PartialCache:
+    """
+    Cache of rendered partial templates.
+
+    Partials listing the project files are included in most prompts and
+    are the most expensive part to render. Each cacheable partial is
+    registered with a fingerprint function that computes, from the
+    render context, a key covering everything the partial reads. As
+    long as the fingerprint doesn't change, the rendered output is
+    reused, whichever template includes it.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self.fingerprints: dict[str, Callable[[Context], Hashable]] = {}
+        self.rendered: OrderedDict[tuple[str, Hashable], str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, name: str, fingerprint: Callable[[Context], Hashable]):
+        """
+        Make a partial template cacheable.
+
+        :param name: Template name (eg. "partials/files_list.prompt").
+        :param fingerprint: Function computing the cache key from the render context.
+        """
+        self.fingerprints[name] = fingerprint
+
+    def render(self, name: str, render_func: Callable[[Context], Iterator[str]], context: Context) -> Iterator[str]:
+        """
+        Render the template, or reuse the output of an earlier render with the same fingerprint.
+
+        :param name: Template name.
+        :param render_func: Compiled template render function.
+        :param context: Render context.
+        :return: Rendered template parts.
+        """
+        try:
+            key = (name, self.fingerprints[name](context))
+            hash(key)
+        except Exception as err:  # noqa
+            log.debug(f"Can't compute fingerprint for {name}, rendering without cache: {err}")
+            yield from render_func(context)
+            return
+
+        if key in self.rendered:
+            self.hits += 1
+            self.rendered.move_to_end(key)
+            yield self.rendered[key]
+            return
+
+        self.misses += 1
+        output = "".join(render_func(context))
+        self.rendered[key] = output
+        if len(self.rendered) > self.max_size:
+            self.rendered.popitem(last=False)
+        yield output
+
+    def clear(self):
+        self.rendered.clear()
+
+
+class CachedPartialTemplate(Template):
+    """
+    Template whose rendering goes through the environment's partial cache.
+
+    Hooking into the template (instead of changing the templates to use
+    a custom tag) makes `{% include %}` of registered partials cached.
+    """
+
+    @classmethod
+    def _from_namespace(cls, environment, namespace, globals):
+        tpl = super()._from_namespace(environment, namespace, globals)
+        partial_cache: Optional[PartialCache] = getattr(environment, "partial_cache", None)
+        if partial_cache is not None and tpl.name in partial_cache.fingerprints:
+            render_func = tpl.root_render_func
+            tpl.root_render_func = lambda context: partial_cache.render(tpl.name, render_func, context)
+        return tpl
 
 
 class FormatTemplate:
@@ -10,7 +129,7 @@ class FormatTemplate:
 
 
 class BaseJinjaTemplate:
-    def __init__(self, loader: Optional[BaseLoader]):
+    def __init__(self, loader: Optional[BaseLoader], bytecode_cache: Optional[BytecodeCache] = None):
         self.env = Environment(
             loader=loader,
             autoescape=False,
@@ -18,6 +137,7 @@ class BaseJinjaTemplate:
             trim_blocks=True,
             keep_trailing_newline=True,
             undefined=StrictUndefined,
+            bytecode_cache=bytecode_cache,
         )
 
 
@@ -31,11 +151,19 @@ class JinjaStringTemplate(BaseJinjaTemplate):
 
 
 class JinjaFileTemplate(BaseJinjaTemplate):
-    def __init__(self, template_dirs: list[str]):
+    def __init__(
+        self,
+        template_dirs: list[str],
+        bytecode_cache: Optional[BytecodeCache] = None,
+        partial_cache: Optional[PartialCache] = None,
+    ):
         for td in template_dirs:
             if not isdir(td):
                 raise ValueError(f"Template directory does not exist: {td}")
-        super().__init__(FileSystemLoader(template_dirs))
+        super().__init__(FileSystemLoader(template_dirs), bytecode_cache)
+        if partial_cache is not None:
+            self.env.template_class = CachedPartialTemplate
+            self.env.extend(partial_cache=partial_cache)
 
     def __call__(self, template: str, **kwargs: dict[str, Any]) -> str:
         try:
@@ -44,5 +172,22 @@ class JinjaFileTemplate(BaseJinjaTemplate):
             raise ValueError(f"Template not found: {template}") from err
         return tpl.render(**kwargs)
 
+    def warm_up(self) -> int:
+        """
+        Compile all the templates up front, so their first use doesn't stall.
+
+        Templates that fail to compile are skipped (and will fail when used).
+
+        :return: Number of templates compiled.
+        """
+        compiled = 0
+        for name in self.env.list_templates():
+            try:
+                self.env.get_template(name)
+                compiled += 1
+            except Exception as err:  # noqa
+                log.warning(f"Error compiling template {name}: {err}")
+        return compiled
+
 
-__all__ = ["FormatTemplate", "JinjaStringTemplate", "JinjaFileTemplate"]
+__all__ = ["FormatTemplate", "JinjaStringTemplate", "JinjaFileTemplate", "PartialCache", "get_bytecode_cache"]
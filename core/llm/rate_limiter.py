@@ -0,0 +1,247 @@
+"""Shared per-model concurrency and rate limiting for LLM requests."""
+
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import Mapping, Optional
+
+from core.config import LLMConfig, LLMProvider
+from core.llm.convo import Convo
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+
+def estimate_tokens(convo: Convo) -> int:
+    """
+    Estimate the number of prompt tokens in a conversation.
+
+    Uses the conversation's (cached) token count, so re-estimating a
+    growing conversation on each retry is cheap.
+
+    :param convo: Conversation to estimate.
+    :return: Estimated number of tokens.
+    """
+    return convo.token_count
+
+
+class TokenBucket:
+    """
+    Token bucket refilling `capacity` units per minute.
+
+    A bucket with no capacity is unlimited.
+    """
+
+    def __init__(self, capacity: Optional[float] = None):
+        self.capacity = capacity
+        self.level = capacity or 0.0
+        self.updated = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Calculate how long to wait until `amount` units are available.
+
+        :param amount: Number of units needed.
+        :return: Time to wait (in seconds).
+        """
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        # Requests larger than the whole bucket would never fit; let them
+        # through once the bucket is full.
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def consume(self, amount: float):
+        """
+        Take `amount` units from the bucket.
+
+        The level can go negative when correcting an estimate after the fact.
+        """
+        if not self.capacity:
+            return
+        self._refill()
+        self.level -= amount
+
+    def update(self, capacity: Optional[float], remaining: Optional[float] = None):
+        """
+        Update the bucket from the limits reported by the provider.
+
+        :param capacity: Limit per minute.
+        :param remaining: Currently remaining units, if known.
+        """
+        self._refill()
+        if capacity:
+            if not self.capacity:
+                self.level = capacity
+            self.capacity = capacity
+        if remaining is not None and self.capacity:
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """
+    Limit in-flight requests, requests per minute and tokens per minute
+    for a single provider/model.
+
+    Callers wait in line until there's room for their request instead of
+    sending it and getting a 429 error. The limits can be configured
+    up front, and are refined from the rate limit headers the provider
+    sends back with each response.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.lock = asyncio.Lock()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.queued_time = 0.0
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until the request can be sent.
+
+        :param tokens: Estimated number of tokens the request will use.
+        :return: Time spent waiting (in seconds).
+        """
+        start = monotonic()
+        if self.semaphore:
+            await self.semaphore.acquire()
+
+        try:
+            async with self.lock:
+                while True:
+                    delay = max(
+                        self.paused_until - monotonic(),
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(tokens),
+                    )
+                    if delay <= 0:
+                        break
+                    log.debug(f"Rate limit reached, waiting {delay:.1f}s before sending the request")
+                    await asyncio.sleep(delay)
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+        except BaseException:
+            if self.semaphore:
+                self.semaphore.release()
+            raise
+
+        self.in_flight += 1
+        waited = monotonic() - start
+        self.queued_time += waited
+        return waited
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        """
+        Release the request slot.
+
+        :param estimated_tokens: Number of tokens reserved in `acquire()`.
+        :param actual_tokens: Number of tokens the request actually used, if known.
+        """
+        self.in_flight -= 1
+        if self.semaphore:
+            self.semaphore.release()
+        if actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    @asynccontextmanager
+    async def limit(self, tokens: int):
+        """
+        Context manager holding a request slot for the duration of the block.
+
+        The yielded dict can be updated with the `actual_tokens` used.
+
+        :param tokens: Estimated number of tokens the request will use.
+        """
+        usage = {"queued": await self.acquire(tokens), "actual_tokens": None}
+        try:
+            yield usage
+        finally:
+            self.release(tokens, usage["actual_tokens"])
+
+    def pause(self, delay: datetime.timedelta):
+        """
+        Stop sending requests for a while (eg. after hitting a rate limit).
+
+        :param delay: How long to pause.
+        """
+        until = monotonic() + max(delay.total_seconds(), 0)
+        if until > self.paused_until:
+            self.paused_until = until
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]):
+        """
+        Learn the current limits from the provider's rate limit headers.
+
+        Supports OpenAI-style `x-ratelimit-*` and Anthropic `anthropic-ratelimit-*`
+        headers.
+
+        :param headers: Response headers.
+        """
+        if not headers:
+            return
+
+        def number(name: str) -> Optional[float]:
+            try:
+                return float(headers[name])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        if "x-ratelimit-limit-requests" in headers or "x-ratelimit-limit-tokens" in headers:
+            self.requests.update(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"))
+            self.tokens.update(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"))
+        elif "anthropic-ratelimit-requests-limit" in headers or "anthropic-ratelimit-tokens-limit" in headers:
+            self.requests.update(
+                number("anthropic-ratelimit-requests-limit"),
+                number("anthropic-ratelimit-requests-remaining"),
+            )
+            self.tokens.update(
+                number("anthropic-ratelimit-tokens-limit"),
+                number("anthropic-ratelimit-tokens-remaining"),
+            )
+
+
+_rate_limiters: dict[tuple, RateLimiter] = {}
+
+
+def get_rate_limiter(config: LLMConfig) -> RateLimiter:
+    """
+    Get the shared rate limiter for the provider and model in `config`.
+
+    :param config: LLM configuration.
+    :return: Rate limiter shared by all clients using the same model.
+    """
+    try:
+        loop_id = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop_id = None
+
+    provider = config.provider.value if isinstance(config.provider, LLMProvider) else str(config.provider)
+    key = (provider, config.model, config.base_url, loop_id)
+    if key not in _rate_limiters:
+        _rate_limiters[key] = RateLimiter(
+            max_concurrent=config.max_concurrent_requests,
+            requests_per_minute=config.requests_per_minute,
+            tokens_per_minute=config.tokens_per_minute,
+        )
+    return _rate_limiters[key]
+
+
+__all__ = ["RateLimiter", "TokenBucket", "estimate_tokens", "get_rate_limiter"]
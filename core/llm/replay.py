@@ -0,0 +1,278 @@
+"""Replay recorded LLM responses instead of calling the provider."""
+
+import asyncio
+import hashlib
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+from core.config import DBConfig, LLMReplayConfig
+from core.llm.base import APIError, BaseLLMClient
+from core.llm.cache import normalize_messages
+from core.llm.convo import Convo
+from core.llm.request_log import LLMRequestStatus
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+
+def messages_key(messages: list[dict]) -> str:
+    """
+    Compute the lookup key for a list of (normalized) messages.
+
+    :param messages: Messages as stored in `LLMRequest.messages`.
+    :return: Hex SHA-256 digest of the messages.
+    """
+    canonical = []
+    for msg in messages:
+        content = msg["content"]
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True, default=str)
+        item = {"role": msg["role"], "content": content}
+        if msg.get("name"):
+            item["name"] = msg["name"]
+        canonical.append(item)
+
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReplayMissError(APIError):
+    """
+    No recorded response matches the conversation.
+
+    The run has diverged from the recording, so retrying won't help.
+    """
+
+
+@dataclass
+class RecordedResponse:
+    """A single recorded LLM response."""
+
+    response: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    duration: float = 0.0
+
+
+class ReplayStore:
+    """
+    Recorded LLM responses, indexed by the conversation that produced them.
+
+    If the same conversation was recorded multiple times, the responses
+    are served in the order they were recorded, and the last one is
+    repeated once they're exhausted.
+    """
+
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+        self.loaded = source is None
+        self.lock = asyncio.Lock()
+        self.responses: dict[str, list[RecordedResponse]] = defaultdict(list)
+        self.served: dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, messages: list[dict], recorded: RecordedResponse):
+        """
+        Add a recorded response to the store.
+
+        :param messages: Messages that were sent to the LLM.
+        :param recorded: Recorded response.
+        """
+        self.responses[messages_key(messages)].append(recorded)
+
+    def add_request(self, messages: list[dict], recorded: RecordedResponse, parse_failures: Optional[list[dict]] = None):
+        """
+        Add a recorded request to the store, including its parse retries.
+
+        A request whose response couldn't be parsed was retried with a
+        different conversation; each of those attempts is added first, so
+        the replayed request goes through the same retries.
+
+        :param messages: Messages of the final request.
+        :param recorded: Recorded response to the final request.
+        :param parse_failures: Earlier attempts, as `{"messages": ..., "response": ...}`.
+        """
+        for failure in parse_failures or []:
+            self.add(failure["messages"], RecordedResponse(response=failure["response"]))
+        self.add(messages, recorded)
+
+    def lookup(self, convo: Convo) -> Optional[RecordedResponse]:
+        """
+        Find the recorded response for a conversation.
+
+        Providers that take the response schema directly are sent (and
+        recorded with) the conversation without the schema hints, so if
+        there's no recording with the hints, the conversation is looked up
+        without them.
+
+        :param convo: Conversation to look up.
+        :return: Recorded response, or None if there's no match.
+        """
+        messages = normalize_messages(convo)
+        if messages_key(messages) not in self.responses:
+            without_hints = convo.without_schema_hints()
+            if without_hints is not convo:
+                messages = normalize_messages(without_hints)
+        return self.lookup_messages(messages)
+
+    def lookup_messages(self, messages: list[dict]) -> Optional[RecordedResponse]:
+        """
+        Find the recorded response for a list of (normalized) messages.
+
+        :param messages: Messages to look up.
+        :return: Recorded response, or None if there's no match.
+        """
+        key = messages_key(messages)
+        recorded = self.responses.get(key)
+        if not recorded:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        idx = min(self.served[key], len(recorded) - 1)
+        self.served[key] += 1
+        return recorded[idx]
+
+    def load_jsonl(self, path: str):
+        """
+        Load recorded requests from a JSONL export.
+
+        Each line is a JSON object with (at least) the `messages` and
+        `response` fields of the `llm_requests` table.
+
+        :param path: Path to the JSONL file.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                if row.get("status", LLMRequestStatus.SUCCESS) != LLMRequestStatus.SUCCESS:
+                    continue
+                if row.get("response") is None or "messages" not in row:
+                    continue
+                self.add_request(
+                    row["messages"],
+                    RecordedResponse(
+                        response=row["response"],
+                        prompt_tokens=row.get("prompt_tokens", 0),
+                        completion_tokens=row.get("completion_tokens", 0),
+                        duration=row.get("duration", 0.0),
+                    ),
+                    row.get("parse_failures"),
+                )
+
+    async def load_db(self, url: str):
+        """
+        Load recorded requests from the `llm_requests` table of a database.
+
+        :param url: Database URL.
+        """
+        from core.db.models import LLMRequest
+        from core.db.session import SessionManager
+
+        manager = SessionManager(DBConfig(url=url))
+        async with manager as session:
+            result = await session.execute(
+                select(LLMRequest)
+                .where(LLMRequest.status == LLMRequestStatus.SUCCESS, LLMRequest.response.is_not(None))
+                .order_by(LLMRequest.id)
+            )
+            for row in result.scalars():
+                self.add_request(
+                    row.messages,
+                    RecordedResponse(
+                        response=row.response,
+                        prompt_tokens=row.prompt_tokens,
+                        completion_tokens=row.completion_tokens,
+                        duration=row.duration,
+                    ),
+                    row.parse_failures,
+                )
+        await manager.engine.dispose()
+
+    async def load(self):
+        """Load the recorded responses from the source, if not already loaded."""
+        async with self.lock:
+            if self.loaded:
+                return
+
+            if self.source.endswith(".jsonl"):
+                self.load_jsonl(self.source)
+            else:
+                await self.load_db(self.source)
+
+            self.loaded = True
+            log.info(f"Loaded {sum(len(r) for r in self.responses.values())} recorded LLM responses from {self.source}")
+
+
+class ReplayClient(BaseLLMClient):
+    """
+    LLM client serving recorded responses.
+
+    Used in place of the provider client to run the whole pipeline
+    offline and reproducibly. A conversation that wasn't recorded fails
+    the request right away, without retrying or asking the user.
+    """
+
+    def __init__(self, *args, store: ReplayStore, simulate_latency: bool = False, **kwargs):
+        self.store = store
+        self.simulate_latency = simulate_latency
+        super().__init__(*args, **kwargs)
+
+    async def _make_request(
+        self,
+        convo: Convo,
+        temperature: Optional[float] = None,
+        json_mode: bool = False,
+    ) -> tuple[str, int, int]:
+        await self.store.load()
+
+        recorded = self.store.lookup(convo)
+        if recorded is None:
+            raise ReplayMissError("No recorded LLM response matches this conversation")
+
+        if self.simulate_latency and recorded.duration > 0:
+            await asyncio.sleep(recorded.duration)
+
+        await self._stream_chunk(recorded.response)
+        await self._stream_chunk(None)
+
+        return recorded.response, recorded.prompt_tokens, recorded.completion_tokens
+
+    async def api_check(self) -> bool:
+        return True
+
+    def _is_api_error(self, err: Exception) -> bool:
+        # Not a provider error, so it's neither retried nor counted by the circuit breaker
+        return not isinstance(err, ReplayMissError) and super()._is_api_error(err)
+
+
+_replay_store: Optional[ReplayStore] = None
+
+
+def get_replay_store(config: LLMReplayConfig) -> Optional[ReplayStore]:
+    """
+    Get the process-wide replay store, if replay is configured.
+
+    :param config: Replay configuration.
+    :return: Replay store, or None if replay is disabled.
+    """
+    global _replay_store
+
+    if not config.source:
+        return None
+
+    if _replay_store is None or _replay_store.source != config.source:
+        _replay_store = ReplayStore(config.source)
+
+    return _replay_store
+
+
+__all__ = ["ReplayStore", "ReplayClient", "ReplayMissError", "RecordedResponse", "get_replay_store"]
@@ -1,10 +1,20 @@
 """Request logging for LLM interactions"""
 
+import json
 from enum import Enum
-from typing import List, Optional
+from hashlib import sha1
+from typing import Any, List, Optional
 from dataclasses import dataclass, field
 from core.config import LLMProvider
 
+# Prompt context values whose serialized form is larger than this (in characters)
+# are stored as a reference (content hash and size) instead of inline
+MAX_PROMPT_VALUE_SIZE = 2048
+
+# Cap on the serialized size of a prompt log entry's context; values past it
+# are stored as references regardless of their size
+MAX_PROMPT_CONTEXT_SIZE = 16384
+
 class LLMError(str, Enum):
     """Types of LLM errors."""
     GENERIC_API_ERROR = "generic_api_error"
@@ -15,6 +25,54 @@ class LLMRequestStatus(str, Enum):
     SUCCESS = "success"
     ERROR = "error"
 
+class PromptLogEntry:
+    """
+    Prompt template rendered into a conversation, with its context.
+
+    The context is kept as-is and serialized (at most once) only when the
+    request is persisted, so rendering prompts that are never logged
+    doesn't pay for it. Large values are replaced by a reference: the
+    SHA1 hash of the value (for strings, the same as the ID of the stored
+    file content, if it's a file) and its size.
+    """
+
+    __slots__ = ("template", "context", "_serialized")
+
+    def __init__(self, template: str, context: dict[str, Any]):
+        self.template = template
+        self.context = context
+        self._serialized = None
+
+    @staticmethod
+    def _reference(text: str) -> dict:
+        return {"sha1": sha1(text.encode("utf-8")).hexdigest(), "size": len(text)}
+
+    def _serialize_context(self) -> dict:
+        context = {}
+        total_size = 0
+        for key, value in self.context.items():
+            if isinstance(value, str) and len(value) > MAX_PROMPT_VALUE_SIZE:
+                context[key] = self._reference(value)
+                continue
+
+            text = json.dumps(value, default=str)
+            if len(text) > MAX_PROMPT_VALUE_SIZE or total_size + len(text) > MAX_PROMPT_CONTEXT_SIZE:
+                context[key] = self._reference(text)
+            else:
+                context[key] = json.loads(text)
+                total_size += len(text)
+        return context
+
+    def to_dict(self) -> dict:
+        """Convert to a JSON-serializable format suitable for storing in the database."""
+        if self._serialized is None:
+            self._serialized = {"template": self.template, "context": self._serialize_context()}
+        return self._serialized
+
+    def __repr__(self) -> str:
+        return f"PromptLogEntry({self.template!r})"
+
+
 @dataclass
 class RequestLog:
     """Simple log of an LLM request."""
@@ -30,13 +88,53 @@ class LLMRequestLog:
     provider: LLMProvider
     model: str
     temperature: float
+    messages: List[dict] = field(default_factory=list)
     prompt_tokens: int = 0
     completion_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
     duration: float = 0.0
     status: LLMRequestStatus = LLMRequestStatus.SUCCESS
     response: Optional[str] = None
     error: Optional[str] = None
-    prompts: List[str] = field(default_factory=list)
+    prompts: List[PromptLogEntry] = field(default_factory=list)
+    cached: bool = False
+    coalesced: bool = False
+    # Number of times the request was retried because the response couldn't be parsed
+    parse_retries: int = 0
+    # Requests retried because the response couldn't be parsed, as {"messages": ..., "response": ...}
+    parse_failures: List[dict] = field(default_factory=list)
+    # Number of responses that failed to parse, but were repaired without a retry
+    repairs: int = 0
+    # How the model was picked for an agent with size-based routing (see `RoutedClient`):
+    # "routed" (a smaller model), "default" (the agent's model) or "escalated"
+    route: Optional[str] = None
+    # Requests to smaller models that failed to parse before escalating to this one
+    escalated: List["LLMRequestLog"] = field(default_factory=list)
+    # Hedged requests to the other model that lost the race and were cancelled (see `HedgedClient`)
+    hedged: List["LLMRequestLog"] = field(default_factory=list)
+    # Timings (in seconds) of the successful attempt
+    connect_time: Optional[float] = None
+    time_to_first_token: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    # Time spent (in seconds) across all attempts
+    queue_time: float = 0.0
+    parse_time: float = 0.0
+    retry_time: float = 0.0
+    stream_handler_time: float = 0.0
+
+    def timings(self) -> dict:
+        """Timing breakdown of the request."""
+        return {
+            "duration": self.duration,
+            "connect_time": self.connect_time,
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "queue_time": self.queue_time,
+            "parse_time": self.parse_time,
+            "retry_time": self.retry_time,
+            "stream_handler_time": self.stream_handler_time,
+        }
 
     def log_it(self) -> dict:
         """Convert to a format suitable for logging."""
@@ -46,7 +144,18 @@ class LLMRequestLog:
             "temperature": self.temperature,
             "prompt_tokens": self.prompt_tokens,
             "completion_tokens": self.completion_tokens,
-            "duration": self.duration,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
             "status": self.status,
-            "error": self.error if self.error else None
-        }
\ No newline at end of file
+            "error": self.error if self.error else None,
+            "cached": self.cached,
+            "coalesced": self.coalesced,
+            "parse_retries": self.parse_retries,
+            "repairs": self.repairs,
+            "route": self.route,
+            **self.timings(),
+        }
+
+    def serialized_prompts(self) -> list[dict]:
+        """Prompt log entries in a JSON-serializable format."""
+        return [p.to_dict() if isinstance(p, PromptLogEntry) else p for p in self.prompts]
\ No newline at end of file
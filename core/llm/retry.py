@@ -0,0 +1,176 @@
+"""Retry policy, retry budget and circuit breaker for LLM requests."""
+
+import asyncio
+import datetime
+import random
+from email.utils import parsedate_to_datetime
+from time import monotonic
+from typing import Optional
+
+from core.config import LLMRetryConfig
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+
+def retry_after(err: Exception) -> Optional[datetime.timedelta]:
+    """
+    Get the delay requested by the server via the `Retry-After` header.
+
+    Supports both `retry-after-ms` and `retry-after` (delta seconds or
+    HTTP date) headers.
+
+    :param err: Exception raised by the LLM client.
+    :return: Requested delay, or None if the server didn't specify one.
+    """
+    headers = getattr(getattr(err, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        if "retry-after-ms" in headers:
+            return datetime.timedelta(milliseconds=float(headers["retry-after-ms"]))
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return datetime.timedelta(seconds=float(value))
+            except ValueError:
+                reset = parsedate_to_datetime(value)
+                return max(reset - datetime.datetime.now(tz=reset.tzinfo), datetime.timedelta(0))
+    except (TypeError, ValueError):
+        pass
+
+    return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    The delay before retry `n` (counting from 0) is drawn uniformly from
+    `[0, min(max_delay, base_delay * 2**n)]`, but never shorter than the
+    delay the provider asked for (rate limit reset or `Retry-After`).
+    """
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, hint: Optional[datetime.timedelta] = None) -> float:
+        """
+        Calculate the delay before the next retry.
+
+        :param attempt: Number of retries already made for this request.
+        :param hint: Delay requested by the provider, if any.
+        :return: Delay in seconds.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if hint is not None:
+            delay = max(delay, hint.total_seconds())
+        return delay
+
+
+class RetryBudget:
+    """
+    Limit on the total number of automatic retries in a session.
+
+    Once the budget is spent, failed requests are no longer retried
+    automatically, so a misbehaving provider can't burn through our quota.
+    """
+
+    def __init__(self, max_retries: Optional[int] = None):
+        self.max_retries = max_retries
+        self.spent = 0
+
+    def spend(self) -> bool:
+        """
+        Try to take one retry from the budget.
+
+        :return: True if the retry is allowed, False if the budget is exhausted.
+        """
+        if self.max_retries is not None and self.spent >= self.max_retries:
+            return False
+        self.spent += 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After `failure_threshold` consecutive failures, the circuit opens and
+    requests fail fast for `reset_timeout` seconds. After that, one trial
+    request is let through (half-open): if it succeeds the circuit closes,
+    if it fails it opens again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests should fail fast."""
+        if self.opened_at is None:
+            return False
+        return monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None or not self.is_open:
+                log.warning(f"Opening LLM circuit breaker after {self.failures} consecutive failures")
+            self.opened_at = monotonic()
+
+
+retry_budget = RetryBudget()
+_circuit_breakers: dict[tuple, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str, config: LLMRetryConfig) -> CircuitBreaker:
+    """
+    Get the circuit breaker shared by all clients for the provider.
+
+    :param provider: LLM provider.
+    :param config: Retry configuration.
+    :return: Circuit breaker for the provider.
+    """
+    try:
+        loop_id = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop_id = None
+
+    key = (provider, loop_id)
+    if key not in _circuit_breakers:
+        _circuit_breakers[key] = CircuitBreaker(
+            failure_threshold=config.breaker_failure_threshold,
+            reset_timeout=config.breaker_reset_timeout,
+        )
+    return _circuit_breakers[key]
+
+
+def configure_retry_budget(config: LLMRetryConfig):
+    """
+    Reset the session retry budget from the configuration.
+
+    :param config: Retry configuration.
+    """
+    retry_budget.max_retries = config.session_retry_budget
+    retry_budget.spent = 0
+
+
+__all__ = [
+    "RetryPolicy",
+    "RetryBudget",
+    "CircuitBreaker",
+    "retry_after",
+    "retry_budget",
+    "get_circuit_breaker",
+    "configure_retry_budget",
+]
@@ -0,0 +1,100 @@
+"""Size-aware routing of LLM requests to smaller models."""
+
+from typing import Any, Callable, Optional
+
+from core.config import LLMConfig, LLMRouteConfig
+from core.llm.base import ParseError
+from core.llm.convo import Convo
+from core.llm.request_log import LLMRequestLog
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+# Expected response size of classification-style requests (a word, a command, a yes/no with a reason)
+SHORT_RESPONSE_TOKENS = 256
+
+ROUTED = "routed"
+DEFAULT = "default"
+ESCALATED = "escalated"
+
+
+class RoutedClient:
+    """
+    LLM client sending small requests to smaller, faster models.
+
+    The request goes to the first route (smallest model first) whose
+    limits fit the prompt size and the expected response size, or to the
+    agent's own model if none do. If a smaller model's response can't be
+    parsed, the request is escalated to the next larger model that fits,
+    and ultimately to the agent's model, which gets the usual parse
+    retries.
+    """
+
+    def __init__(self, default: Callable, routes: list[tuple[LLMRouteConfig, Callable]]):
+        self.default = default
+        self.routes = routes
+
+    @property
+    def config(self) -> LLMConfig:
+        return self.default.config
+
+    def candidates(self, prompt_tokens: int, expected_output_tokens: Optional[int]) -> list[tuple[LLMRouteConfig, Callable]]:
+        """
+        Get the routes that can handle a request, from smallest to largest.
+
+        :param prompt_tokens: Prompt size (in tokens).
+        :param expected_output_tokens: Expected response size (in tokens), if known.
+        :return: Routes whose limits fit the request.
+        """
+        candidates = []
+        for route, client in self.routes:
+            if prompt_tokens > route.max_prompt_tokens:
+                continue
+            if route.max_output_tokens is not None and (
+                expected_output_tokens is None or expected_output_tokens > route.max_output_tokens
+            ):
+                continue
+            candidates.append((route, client))
+        return candidates
+
+    async def __call__(
+        self,
+        convo: Convo,
+        expected_output_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> tuple[Any, LLMRequestLog]:
+        """
+        Send the conversation to the smallest model that can handle it.
+
+        Accepts the same arguments as `BaseLLMClient.__call__()`.
+
+        :param convo: Conversation to send.
+        :param expected_output_tokens: Expected response size (in tokens), if known.
+        :return: Tuple of (response, request log) from the model that answered.
+        """
+        prompt_tokens = convo.token_count
+        escalated = []
+
+        for route, client in self.candidates(prompt_tokens, expected_output_tokens):
+            log.debug(
+                f"Routing request ({prompt_tokens} prompt tokens, expected response: "
+                f"{expected_output_tokens or 'unknown'}) to {route.model}"
+            )
+            try:
+                response, request_log = await client(convo, max_parse_retries=route.max_parse_retries, **kwargs)
+            except ParseError as err:
+                log.warning(f"Response from {route.model} couldn't be parsed, escalating: {err.message}")
+                escalated.append(err.request_log)
+                continue
+
+            request_log.route = ROUTED
+            request_log.escalated = escalated
+            return response, request_log
+
+        response, request_log = await self.default(convo, **kwargs)
+        request_log.route = ESCALATED if escalated else DEFAULT
+        request_log.escalated = escalated
+        return response, request_log
+
+
+__all__ = ["RoutedClient", "SHORT_RESPONSE_TOKENS"]
@@ -0,0 +1,188 @@
+"""Single-flight coalescing of identical in-flight LLM requests."""
+
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from core.llm.parser import StreamValidationError
+from core.llm.stream_buffer import StreamBuffer
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+
+class Flight:
+    """
+    A request in flight, shared by everyone asking for the same thing.
+
+    The chunks streamed by the leader (the caller actually making the
+    request) are recorded and forwarded to the followers' stream handlers,
+    so late joiners see the whole response. Each follower gets its own
+    `StreamBuffer`, so a slow follower doesn't hold up the leader reading
+    the response.
+    """
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.chunks: list[Optional[str]] = []
+        self.subscribers: list[StreamBuffer] = []
+
+    def publish(self, content: Optional[str]):
+        """
+        Forward a streamed chunk to all followers, without waiting for them.
+
+        :param content: Response text chunk, or None when the response is done.
+        """
+        self.chunks.append(content)
+        for buffer in list(self.subscribers):
+            try:
+                buffer.put(content)
+            except Exception as err:  # noqa
+                # A misbehaving follower must not break the leader's request
+                log.warning(f"Error in coalesced request stream handler: {err}")
+                self.subscribers.remove(buffer)
+
+    def subscribe(self, handler: Callable) -> StreamBuffer:
+        """
+        Replay the chunks streamed so far and subscribe to the rest.
+
+        :param handler: Follower's stream handler.
+        :return: Buffer delivering the chunks to the handler.
+        """
+        buffer = StreamBuffer(handler)
+        for content in self.chunks:
+            buffer.put(content)
+        self.subscribers.append(buffer)
+        return buffer
+
+    def unsubscribe(self, buffer: StreamBuffer):
+        if buffer in self.subscribers:
+            self.subscribers.remove(buffer)
+
+
+# Flight the current task is leading (per asyncio task)
+_current_flight: ContextVar[Optional[Flight]] = ContextVar("current_flight", default=None)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical requests into a single call.
+
+    The first caller for a key (the leader) makes the call; callers with the
+    same key arriving while it's in flight (followers) wait for it and
+    share the result, including any error.
+
+    If the leader is cancelled, or aborts the response because it didn't
+    match the leader's parser, followers make the call themselves.
+    """
+
+    def __init__(self):
+        self.flights: dict[str, Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        stream_handler: Optional[Callable] = None,
+    ) -> tuple[Any, bool]:
+        """
+        Call `fn()`, or share the result of an identical call already in flight.
+
+        :param key: Request key; requests with equal keys are coalesced.
+        :param fn: Function making the call.
+        :param stream_handler: Stream handler to receive the chunks if the call is shared.
+        :return: Tuple of (result, whether it was shared from another call).
+        """
+        while key in self.flights:
+            flight = self.flights[key]
+            self.coalesced += 1
+            log.debug(f"Coalescing identical in-flight LLM request ({self.coalesced} so far)")
+
+            buffer = flight.subscribe(stream_handler) if stream_handler else None
+            try:
+                await flight.done.wait()
+            except asyncio.CancelledError:
+                if buffer is not None:
+                    flight.unsubscribe(buffer)
+                    buffer.cancel()
+                raise
+
+            retry = isinstance(flight.error, (asyncio.CancelledError, StreamValidationError))
+            if buffer is not None:
+                flight.unsubscribe(buffer)
+                try:
+                    if retry and flight.chunks and flight.chunks[-1] is not None:
+                        # End the partial response the follower has already shown,
+                        # so the retried response isn't appended to it
+                        buffer.put(None)
+                    await buffer.close()
+                except Exception as err:  # noqa
+                    log.warning(f"Error in coalesced request stream handler: {err}")
+
+            if retry:
+                self.coalesced -= 1
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        flight = Flight()
+        self.flights[key] = flight
+        self.calls += 1
+        token = _current_flight.set(flight)
+        try:
+            flight.result = await fn()
+            return flight.result, False
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            _current_flight.reset(token)
+            del self.flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        """Return the number of calls made and calls avoided by coalescing."""
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / total if total else 0.0,
+        }
+
+
+def publish_chunk(content: Optional[str]):
+    """
+    Forward a streamed chunk to the followers of the flight the current task leads.
+
+    :param content: Response text chunk, or None when the response is done.
+    """
+    flight = _current_flight.get()
+    if flight is not None:
+        flight.publish(content)
+
+
+_single_flights: dict[Optional[int], SingleFlight] = {}
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the single-flight group shared by all LLM clients.
+
+    :return: Single-flight group for the running event loop.
+    """
+    try:
+        loop_id = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop_id = None
+
+    if loop_id not in _single_flights:
+        _single_flights[loop_id] = SingleFlight()
+    return _single_flights[loop_id]
+
+
+__all__ = ["Flight", "SingleFlight", "get_single_flight", "publish_chunk"]
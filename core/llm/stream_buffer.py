@@ -0,0 +1,127 @@
+"""Bounded buffer decoupling LLM response streaming from UI delivery."""
+
+import asyncio
+from contextlib import suppress
+from time import monotonic
+from typing import Callable, Optional
+
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+# How long to wait for more chunks before delivering a batch (in seconds)
+FLUSH_INTERVAL = 0.05
+# Deliver right away once this many characters are pending
+MAX_BATCH = 1024
+
+
+class StreamBuffer:
+    """
+    Buffer between the LLM response stream and the stream handler.
+
+    The client puts chunks into the buffer without waiting, so the response
+    is read at network speed. A background task delivers them to the stream
+    handler, coalescing the chunks that arrive within `flush_interval` (or
+    until `max_batch` characters are pending) into a single update.
+
+    If the handler (usually the UI) is slower than the stream, chunks
+    received while it's busy are merged into the next update instead of
+    queueing up, so the pending data is always at most one update. The
+    end-of-response marker (None) is always delivered, in order.
+    """
+
+    def __init__(
+        self,
+        handler: Callable,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_batch: int = MAX_BATCH,
+    ):
+        self.handler = handler
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        # Pending chunks; consecutive text chunks are merged, None marks the end of a response
+        self.pending: list[Optional[str]] = []
+        self.pending_size = 0
+        self.closed = False
+        self.error: Optional[BaseException] = None
+        self.has_data = asyncio.Event()
+        self.batch_ready = asyncio.Event()
+
+        self.chunks = 0
+        self.deliveries = 0
+        self.handler_time = 0.0
+        self.task = asyncio.create_task(self._deliver())
+
+    def put(self, content: Optional[str]):
+        """
+        Queue a chunk for delivery, without waiting for the handler.
+
+        :param content: Response text chunk, or None when the response is done.
+        :raises: The error raised by the handler, if it failed.
+        """
+        if self.error is not None:
+            raise self.error
+
+        if content is None:
+            self.pending.append(None)
+            self.batch_ready.set()
+        else:
+            self.chunks += 1
+            if self.pending and self.pending[-1] is not None:
+                self.pending[-1] += content
+            else:
+                self.pending.append(content)
+            self.pending_size += len(content)
+            if self.pending_size >= self.max_batch:
+                self.batch_ready.set()
+        self.has_data.set()
+
+    async def _deliver(self):
+        while True:
+            if not self.pending:
+                if self.closed:
+                    return
+                self.has_data.clear()
+                await self.has_data.wait()
+                continue
+
+            if not self.batch_ready.is_set() and not self.closed and self.flush_interval > 0:
+                # Wait a bit for more chunks, so the handler gets fewer, larger updates
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.batch_ready.wait(), self.flush_interval)
+
+            batch, self.pending, self.pending_size = self.pending, [], 0
+            self.batch_ready.clear()
+            for content in batch:
+                start = monotonic()
+                try:
+                    await self.handler(content)
+                except Exception as err:  # noqa
+                    log.warning(f"Error in LLM stream handler: {err}", exc_info=True)
+                    self.error = err
+                    return
+                finally:
+                    self.handler_time += monotonic() - start
+                self.deliveries += 1
+
+    async def close(self):
+        """
+        Deliver the remaining chunks and stop.
+
+        :raises: The error raised by the handler, if it failed.
+        """
+        self.closed = True
+        self.has_data.set()
+        self.batch_ready.set()
+        await self.task
+        if self.error is not None:
+            raise self.error
+
+    def cancel(self):
+        """Stop delivering chunks, dropping the pending ones."""
+        self.closed = True
+        self.task.cancel()
+
+
+__all__ = ["StreamBuffer"]
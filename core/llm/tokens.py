@@ -0,0 +1,127 @@
+"""Token counting and per-model context budgets."""
+
+from typing import Optional
+
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+# Tokens added by the chat format for each message and for priming the reply
+# See https://cookbook.openai.com/examples/how_to_count_tokens_with_tiktoken
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+# Tokens kept free for the model's response
+COMPLETION_RESERVE = 4096
+
+# Context window sizes of known models, matched by the longest model name prefix
+# (see `context_window()`)
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4.1": 1_047_576,
+    "gpt-4.5": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4-1106": 128_000,
+    "gpt-4-0125": 128_000,
+    "gpt-4-32k": 32_768,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o1-mini": 128_000,
+    "o1-preview": 128_000,
+    "o3": 200_000,
+    "o4": 200_000,
+    "claude-": 200_000,
+    "deepseek-": 64_000,
+    "llama-3.1": 128_000,
+    "llama3-": 8_192,
+}
+
+_encoder = None
+_encoder_loaded = False
+
+
+def get_encoder():
+    """
+    Get the tiktoken encoder, loading it on first use.
+
+    Loading the encoder is slow (and may need to download the BPE ranks),
+    so it's deferred until a token count is actually needed.
+
+    :return: The `cl100k_base` encoder, or None if it can't be loaded.
+    """
+    global _encoder, _encoder_loaded
+
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception as err:  # noqa
+            log.warning(f"Can't load the tiktoken encoder, estimating token counts from text length: {err}")
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in a text.
+
+    Falls back to the ~4 characters per token rule of thumb if the
+    encoder isn't available.
+
+    :param text: Text to count.
+    :return: Number of tokens.
+    """
+    encoder = get_encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def context_window(model: str) -> Optional[int]:
+    """
+    Get the context window size of a known model.
+
+    A prefix only matches up to a "-" (unless it ends with one), so that
+    "gpt-4" matches "gpt-4-0613" but not "gpt-4.1" or "gpt-4o".
+
+    :param model: Model name.
+    :return: Context window (in tokens), or None if the model is unknown.
+    """
+    matches = [
+        prefix
+        for prefix in MODEL_CONTEXT_WINDOWS
+        if model == prefix or model.startswith(prefix if prefix.endswith("-") else f"{prefix}-")
+    ]
+    if not matches:
+        return None
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def prompt_budget(model: str, max_context_tokens: Optional[int] = None) -> Optional[int]:
+    """
+    Get the maximum number of prompt tokens to send to a model.
+
+    :param model: Model name.
+    :param max_context_tokens: Configured budget, overrides the model's context window.
+    :return: Prompt token budget, or None if there's no known limit.
+    """
+    if max_context_tokens is not None:
+        return max_context_tokens
+
+    window = context_window(model)
+    if window is None:
+        return None
+    return max(window - COMPLETION_RESERVE, window // 2)
+
+
+__all__ = [
+    "COMPLETION_RESERVE",
+    "MESSAGE_OVERHEAD",
+    "REPLY_OVERHEAD",
+    "context_window",
+    "count_tokens",
+    "get_encoder",
+    "prompt_budget",
+]
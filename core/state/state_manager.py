@@ -248,9 +248,9 @@ class StateManager:
             self.current_session.add(self.next_state)
             self.next_state = await self.current_state.create_next_state()
 
-            # After the next_state becomes the current_state, we need to load
-            # the FileContent model, which was previously loaded by the load_project(),
-            # but is not populated by the `create_next_state()`
+            # After the next_state becomes the current_state, we need its files' FileContent
+            # models loaded. Files cloned by `create_next_state()` share the content already
+            # loaded for the previous state, so usually there's nothing left to load here.
             for f in self.current_state.files:
                 await f.awaitable_attrs.content
 
@@ -292,7 +292,16 @@ class StateManager:
                     request_log.prompt_tokens + request_log.completion_tokens,
                     request_log.duration,
                     request_log.status != LLMRequestStatus.SUCCESS,
+                    agent=agent.agent_type if agent else None,
+                    timings=request_log.timings(),
+                    parse_retries=request_log.parse_retries,
                 )
+                if request_log.coalesced:
+                    telemetry.inc("num_llm_coalesced")
+                if request_log.route == "routed":
+                    telemetry.inc("num_llm_routed")
+                elif request_log.route == "escalated":
+                    telemetry.inc("num_llm_escalated")
                 LLMRequest.from_request_log(self.current_state, agent, request_log)
 
             except Exception as e:
@@ -4,7 +4,7 @@ import traceback
 from copy import deepcopy
 from os import getenv
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import httpx
 
@@ -122,6 +122,14 @@ class Telemetry:
                 "num_llm_errors": 0,
                 # Number of tokens used for LLM requests
                 "num_llm_tokens": 0,
+                # Number of LLM requests that shared an identical request already in flight
+                "num_llm_coalesced": 0,
+                # Number of LLM requests retried because the response couldn't be parsed
+                "num_llm_parse_retries": 0,
+                # Number of LLM requests answered by a smaller model (size-based routing)
+                "num_llm_routed": 0,
+                # Number of LLM requests escalated to a larger model after a smaller one's response failed to parse
+                "num_llm_escalated": 0,
                 # Number of development steps
                 "num_steps": 0,
                 # Number of commands run during development
@@ -156,12 +164,18 @@ class Telemetry:
                 "large_requests": None,
                 # Statistics for slow requests
                 "slow_requests": None,
+                # LLM request timings per agent
+                "llm_timings": None,
+                # LLM parse failure retries per agent
+                "llm_parse_retries": None,
             }
         )
         self.start_time = None
         self.end_time = None
         self.large_requests = []
         self.slow_requests = []
+        self.llm_timings = {}
+        self.llm_parse_retries = {}
 
     def set(self, name: str, value: Any):
         """
@@ -277,6 +291,9 @@ class Telemetry:
         tokens: int,
         elapsed_time: int,
         is_error: bool,
+        agent: Optional[str] = None,
+        timings: Optional[dict] = None,
+        parse_retries: int = 0,
     ):
         """
         Record an LLM request.
@@ -284,9 +301,25 @@ class Telemetry:
         :param tokens: number of tokens in the request
         :param elapsed_time: time elapsed for the request
         :param is_error: whether the request resulted in an error
+        :param agent: type of the agent that made the request
+        :param timings: timing breakdown of the request (see `LLMRequestLog.timings()`)
+        :param parse_retries: number of retries because the response couldn't be parsed
         """
         self.inc("num_llm_requests")
 
+        if parse_retries:
+            self.inc("num_llm_parse_retries", parse_retries)
+            if agent:
+                self.llm_parse_retries[agent] = self.llm_parse_retries.get(agent, 0) + parse_retries
+
+        if agent and timings:
+            agent_timings = self.llm_timings.setdefault(agent, {})
+            agent_timings.setdefault("num_requests", 0)
+            agent_timings["num_requests"] += 1
+            for name, value in timings.items():
+                if value is not None:
+                    agent_timings.setdefault(name, []).append(value)
+
         if is_error:
             self.inc("num_llm_errors")
         else:
@@ -319,6 +352,22 @@ class Telemetry:
             "median_time": sorted(self.slow_requests)[n_slow // 2] if n_slow > 0 else None,
         }
 
+        llm_timings = {}
+        for agent, agent_timings in self.llm_timings.items():
+            stats = {"num_requests": agent_timings["num_requests"]}
+            for name, values in agent_timings.items():
+                if name == "num_requests":
+                    continue
+                stats[name] = {
+                    "total": sum(values),
+                    "avg": sum(values) / len(values),
+                    "median": sorted(values)[len(values) // 2],
+                    "max": max(values),
+                }
+            llm_timings[agent] = stats
+        self.data["llm_timings"] = llm_timings
+        self.data["llm_parse_retries"] = dict(self.llm_parse_retries)
+
     async def send(self, event: str = "pilot-telemetry"):
         """
         Send telemetry data to the phone-home endpoint.
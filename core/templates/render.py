@@ -7,6 +7,11 @@ from typing import Any, Callable
 
 from jinja2 import Environment, FileSystemLoader
 
+from core.llm.prompt import get_bytecode_cache
+
+# Jinja environments (and their compiled templates) shared by all renderers, per template directory
+_environments: dict[str, Environment] = {}
+
 
 def escape_string(str: str) -> str:
     """
@@ -42,15 +47,19 @@ class Renderer:
 
     def __init__(self, template_dir: str):
         self.template_dir = template_dir
-        self.jinja_env = Environment(
-            loader=FileSystemLoader(template_dir),
-            autoescape=False,
-            lstrip_blocks=True,
-            trim_blocks=True,
-            keep_trailing_newline=True,
-        )
-        # Add filters here
-        self.jinja_env.filters["escape_string"] = escape_string
+        if template_dir not in _environments:
+            jinja_env = Environment(
+                loader=FileSystemLoader(template_dir),
+                autoescape=False,
+                lstrip_blocks=True,
+                trim_blocks=True,
+                keep_trailing_newline=True,
+                bytecode_cache=get_bytecode_cache(),
+            )
+            # Add filters here
+            jinja_env.filters["escape_string"] = escape_string
+            _environments[template_dir] = jinja_env
+        self.jinja_env = _environments[template_dir]
 
     def render_template(self, template: str, context: Any) -> str:
         """
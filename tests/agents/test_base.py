@@ -83,3 +83,58 @@ async def test_get_llm(mock_BaseLLMClient):
 
     state_manager.log_llm_request.assert_awaited_once()
     assert state_manager.log_llm_request.call_args.args[0] == "log"
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+@patch("core.agents.base.HedgedClient")
+@patch("core.agents.base.get_config")
+async def test_get_llm_hedged(mock_get_config, mock_HedgedClient, mock_AsyncOpenAI):
+    from core.config import Config, LLMHedgeConfig
+
+    config = Config()
+    config.agent["default"].hedge = LLMHedgeConfig(provider="openai", model="gpt-4o-mini")
+    mock_get_config.return_value = config
+
+    hedged_log = MagicMock()
+    mock_HedgedClient.return_value = AsyncMock(return_value=("response", MagicMock(hedged=[hedged_log])))
+    state_manager = MagicMock(log_llm_request=AsyncMock())
+    agent = AgentUnderTest(state_manager, MagicMock(spec=UIBase))
+    llm = agent.get_llm()
+
+    primary, secondary, hedge_policy = mock_HedgedClient.call_args.args
+    assert primary.config.model == "gpt-4"
+    assert secondary.config.model == "gpt-4o-mini"
+    assert hedge_policy is config.agent["default"].hedge
+
+    assert await llm(None) == "response"
+    assert state_manager.log_llm_request.await_count == 2
+    assert state_manager.log_llm_request.await_args_list[0].args[0] is hedged_log
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+@patch("core.agents.base.RoutedClient")
+@patch("core.agents.base.get_config")
+async def test_get_llm_routed(mock_get_config, mock_RoutedClient, mock_AsyncOpenAI):
+    from core.config import Config, LLMRouteConfig
+
+    config = Config()
+    route = LLMRouteConfig(provider="openai", model="gpt-4o-mini", max_prompt_tokens=2000)
+    config.agent["default"].routes = [route]
+    mock_get_config.return_value = config
+
+    escalated_log = MagicMock()
+    mock_RoutedClient.return_value = AsyncMock(return_value=("response", MagicMock(escalated=[escalated_log])))
+    state_manager = MagicMock(log_llm_request=AsyncMock())
+    agent = AgentUnderTest(state_manager, MagicMock(spec=UIBase))
+    llm = agent.get_llm()
+
+    default, routes = mock_RoutedClient.call_args.args
+    assert default.config.model == "gpt-4"
+    assert [(r, client.config.model) for r, client in routes] == [(route, "gpt-4o-mini")]
+
+    assert await llm(None, expected_output_tokens=10) == "response"
+    mock_RoutedClient.return_value.assert_awaited_once_with(None, expected_output_tokens=10)
+    assert state_manager.log_llm_request.await_count == 2
+    assert state_manager.log_llm_request.await_args_list[0].args[0] is escalated_log
@@ -0,0 +1,119 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from core.agents.bug_hunter import BugHunter
+from core.db.models.project_state import IterationStatus
+
+
+def hunting_iteration(num_cycles: int) -> dict:
+    return {
+        "id": "iteration-1",
+        "user_feedback": "The button doesn't work",
+        "user_feedback_qa": None,
+        "description": None,
+        "alternative_solutions": [],
+        "attempts": 1,
+        "status": IterationStatus.HUNTING_FOR_BUG,
+        "bug_hunting_cycles": [
+            {
+                "human_readable_instructions": f"Add logs, attempt {i}",
+                "backend_logs": f"backend log {i}",
+                "fix_attempted": False,
+            }
+            for i in range(num_cycles)
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_iteration_convo_keeps_short_history(agentcontext):
+    sm, _, ui, mock_get_llm = agentcontext
+
+    sm.current_state.tasks = [{"description": "Some task", "status": "todo", "instructions": "Testing here!"}]
+    sm.current_state.iterations = [hunting_iteration(3)]
+    await sm.commit()
+
+    bh = BugHunter(sm, ui)
+    bh.get_llm = mock_get_llm()
+    convo = await bh.generate_iteration_convo_so_far()
+
+    assert [msg.content for msg in convo.messages if msg.role == "assistant"] == [
+        "Add logs, attempt 0",
+        "Add logs, attempt 1",
+        "Add logs, attempt 2",
+    ]
+    bh.get_llm().assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("core.agents.bug_hunter.COMPACT_HISTORY_THRESHOLD", 0)
+async def test_iteration_convo_summarizes_older_cycles(agentcontext):
+    sm, _, ui, mock_get_llm = agentcontext
+
+    sm.current_state.tasks = [{"description": "Some task", "status": "todo", "instructions": "Testing here!"}]
+    sm.current_state.iterations = [hunting_iteration(4)]
+    await sm.commit()
+
+    bh = BugHunter(sm, ui)
+    bh.get_llm = mock_get_llm(return_value="Attempts 0 and 1 ruled out the backend")
+    convo = await bh.generate_iteration_convo_so_far()
+
+    assert [msg.content for msg in convo.messages if msg.role == "assistant"] == [
+        "Add logs, attempt 2",
+        "Add logs, attempt 3",
+    ]
+    assert "Attempts 0 and 1 ruled out the backend" in convo.messages[-5].content
+    assert "backend log 2" in convo.messages[-3].content
+    assert "backend log 3" in convo.messages[-1].content
+    assert [entry.template for entry in convo.prompt_log[-3:]] == [
+        "bug-hunter/hunting_cycles_summary",
+        "bug-hunter/log_data",
+        "bug-hunter/log_data",
+    ]
+    assert convo.prompt_log[-1].context["backend_logs"] == "backend log 3"
+
+    # The summary for the same cycles is reused
+    convo = await bh.generate_iteration_convo_so_far()
+    assert "Attempts 0 and 1 ruled out the backend" in convo.messages[-5].content
+    assert bh.get_llm().await_count == 1
+    assert sm.next_state.current_iteration["bug_hunting_summary"]["summary"] == "Attempts 0 and 1 ruled out the backend"
+
+
+@pytest.mark.asyncio
+@patch("core.agents.bug_hunter.COMPACT_HISTORY_THRESHOLD", 0)
+async def test_pair_programming_summarizes_older_questions(agentcontext):
+    sm, _, ui, mock_get_llm = agentcontext
+
+    sm.current_state.tasks = [{"description": "Some task", "status": "todo", "instructions": "Testing here!"}]
+    sm.current_state.iterations = [hunting_iteration(1)]
+    await sm.commit()
+    ui.start_important_stream = AsyncMock()
+
+    bh = BugHunter(sm, ui)
+    bh.get_llm = mock_get_llm(return_value="Earlier questions were about the database")
+    convo = await bh.generate_iteration_convo_so_far()
+    llm = AsyncMock(side_effect=["Answer 0", "Answer 1", "Answer 2"])
+
+    turns = []
+    await bh.answer_pair_programming_question(llm, convo, turns, "ask_a_question", question="Question 0")
+    await bh.answer_pair_programming_question(llm, convo, turns, "tell_me_more")
+    await bh.answer_pair_programming_question(llm, convo, turns, "ask_a_question", question="Question 2")
+
+    # Nothing to compact yet while there are at most two earlier questions
+    bh.get_llm().assert_not_awaited()
+    assert [turn["answer"] for turn in turns] == ["Answer 0", "Answer 1", "Answer 2"]
+    last_convo = llm.await_args.args[0]
+    assert [msg.content for msg in last_convo.messages[-4::2]] == ["Answer 0", "Answer 1"]
+
+    convo_so_far = await bh.pair_programming_convo_so_far(convo, turns)
+
+    assert [msg.content for msg in convo_so_far.messages[len(convo.messages) + 2 :: 2]] == ["Answer 1", "Answer 2"]
+    assert "Earlier questions were about the database" in convo_so_far.messages[len(convo.messages)].content
+    assert [entry.template for entry in convo_so_far.prompt_log[len(convo.prompt_log) :]] == [
+        "bug-hunter/pair_programming_summary",
+        "bug-hunter/tell_me_more",
+        "bug-hunter/ask_a_question",
+    ]
+    assert bh.get_llm().await_count == 1
+    assert len(convo.messages) == len((await bh.generate_iteration_convo_so_far()).messages)
@@ -27,6 +27,22 @@ def test_fork():
 
     assert len(convo.messages) == 1
     assert len(child.messages) == 2
+    assert child.messages[0] is convo.messages[0]
+    assert len(convo.prompt_log) == 0
+    assert len(child.prompt_log) == 1
+
+
+def test_template_logs_prompt_lazily():
+    """Test that the prompt context is logged as is, and only serialized when needed."""
+    agent = MagicMock(agent_type="spec-writer", current_state=None)
+    convo = AgentConvo(agent)
+    spec = MagicMock(__str__=lambda self: "the spec")
+
+    convo.template("ask_questions", spec=spec)
+
+    (entry,) = convo.prompt_log
+    assert entry.context["spec"] is spec
+    assert entry.to_dict() == {"template": "spec-writer/ask_questions", "context": {"spec": "the spec"}}
 
 
 def test_require_schema():
@@ -41,3 +57,40 @@ def test_require_schema():
 
     assert len(convo.messages) == 2
     assert '"description": "User name"' in convo.messages[1]["content"]
+    assert convo.messages[1].schema_hint
+    assert convo.without_schema_hints().messages == convo.messages[:1]
+
+    # The schema is rendered once per model
+    other = AgentConvo(agent).require_schema(MyModel)
+    assert other.messages[1]["content"] == convo.messages[1]["content"]
+    assert AgentConvo._schema_text(MyModel) is AgentConvo._schema_text(MyModel)
+
+
+def test_template_marks_cacheable_prefix():
+    """Test that the system prompt and the first template are marked as cacheable."""
+    agent = MagicMock(agent_type="spec-writer", current_state=None)
+    convo = AgentConvo(agent).template("ask_questions").template("ask_questions")
+
+    assert [msg.cache_breakpoint for msg in convo.messages] == [True, True, False]
+
+
+def test_files_list_partial_is_cached():
+    """Test that the file listing is rendered once per version of the project files."""
+    AgentConvo._init_templates()
+    AgentConvo.partial_cache.clear()
+
+    def make_file(path, content):
+        return MagicMock(path=path, content=MagicMock(id=f"hash-{content}", content=content), meta={})
+
+    state = MagicMock(files=[make_file("main.py", "print(1)\n")], relevant_files=None, modified_files={})
+    misses = AgentConvo.partial_cache.misses
+
+    first = AgentConvo.prompt_loader("partials/files_list.prompt", state=state)
+    second = AgentConvo.prompt_loader("partials/files_list.prompt", state=state)
+    assert first == second
+    assert "print(1)" in first
+    assert AgentConvo.partial_cache.misses == misses + 1
+
+    state.files = [make_file("main.py", "print(2)\n")]
+    assert "print(2)" in AgentConvo.prompt_loader("partials/files_list.prompt", state=state)
+    assert AgentConvo.partial_cache.misses == misses + 2
@@ -0,0 +1,33 @@
+import pytest
+
+from core.agents.convo import AgentConvo
+from core.agents.developer import CommandStep, Developer
+
+
+@pytest.mark.asyncio
+async def test_parse_task_steps_shows_steps_as_streamed(agentcontext):
+    """
+    Task steps are shown to the user as soon as each one is parsed, and
+    steps repeated by a retried response are shown only once.
+    """
+    sm, _, ui, _ = agentcontext
+
+    dev = Developer(sm, ui)
+    chunks = [
+        '{"steps": [{"type": "command", "command": {"command": "npm install", "timeout": 60}}, ',
+        '{"type": "save_file", "save_file": {"path": "index.js"}}]}',
+    ]
+
+    async def llm(convo, *, parser, temperature):
+        for _ in range(2):
+            stream_parser = parser.stream()
+            for chunk in chunks:
+                stream_parser.feed(chunk)
+        return parser("".join(chunks))
+
+    response = await dev.parse_task_steps(llm, AgentConvo(dev))
+
+    assert len(response.steps) == 2
+    assert isinstance(response.steps[0], CommandStep)
+    messages = [call.args[0] for call in ui.send_message.call_args_list]
+    assert messages == ["- Run `npm install`\n", "- Save `index.js`\n"]
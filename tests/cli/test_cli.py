@@ -58,6 +58,7 @@ def test_parse_arguments(mock_ArgumentParser):
         "--email",
         "--extension-version",
         "--no-check",
+        "--replay",
     }
 
     parser.parse_args.assert_called_once_with()
@@ -125,11 +126,23 @@ def test_load_config_defaults(tmp_path):
     config_file = tmp_path / "config.json"
     config_file.write_text("{}", encoding="utf-8")
 
-    config = load_config(MagicMock(config=config_file, level=None, database=None, local_ipc_port=None))
+    config = load_config(MagicMock(config=config_file, level=None, database=None, local_ipc_port=None, replay=None))
 
     assert config.log.level == "DEBUG"
     assert config.db.url == "sqlite+aiosqlite:///pythagora.db"
     assert config.ui.type == "plain"
+    assert config.llm_replay.source is None
+
+
+def test_load_config_replay(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text("{}", encoding="utf-8")
+
+    config = load_config(
+        MagicMock(config=config_file, level=None, database=None, local_ipc_port=None, replay="recorded.jsonl")
+    )
+
+    assert config.llm_replay.source == "recorded.jsonl"
 
 
 def test_load_config_overridden(tmp_path):
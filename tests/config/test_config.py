@@ -139,3 +139,41 @@ def test_encodings(encoding, bom, tmp_path):
 
     config = ConfigLoader().load(config_path)
     assert config.llm_for_agent("default").model == "gpt-4-turbo"
+
+
+def test_hedge_llm_for_agent():
+    data = {
+        **test_config_data,
+        "agent": {
+            **test_config_data["agent"],
+            "codemonkey": {
+                **test_config_data["agent"]["codemonkey"],
+                "hedge": {"provider": "openai", "model": "gpt-4o", "percentile": 90},
+            },
+        },
+    }
+    config = ConfigLoader().from_json(json.dumps(data))
+
+    assert config.hedge_llm_for_agent("default") is None
+    hedge = config.hedge_llm_for_agent("codemonkey")
+    assert hedge.provider == LLMProvider.OPENAI
+    assert hedge.model == "gpt-4o"
+    assert hedge.api_key == "sk-openai"
+    assert hedge.temperature == 0.5
+    assert config.agent_config("codemonkey").hedge.percentile == 90
+
+
+def test_all_llms():
+    config = ConfigLoader().from_json(json.dumps(test_config_data))
+
+    llms = config.all_llms()
+    assert [llm.provider for llm in llms] == [LLMProvider.OPENAI, LLMProvider.ANTHROPIC]
+    assert llms[0].api_key == "sk-openai"
+    assert llms[0].max_context_tokens is None
+
+    llm = config.llm_for_provider(LLMProvider.ANTHROPIC)
+    assert llm.base_url == "https://api.anthropic.com"
+    assert llm.read_timeout == 10.0
+
+    with pytest.raises(ValueError):
+        config.llm_for_provider(LLMProvider.GROQ)
@@ -1,5 +1,7 @@
+from unittest.mock import patch
+
 import pytest
-from sqlalchemy import select
+from sqlalchemy import delete, select
 
 from core.db.models import Branch, File, FileContent, Project, ProjectState
 from core.db.models.project_state import IterationStatus
@@ -40,11 +42,12 @@ async def test_get_by_id_preloads_branch_project_files(testdb):
 
     s = (await testdb.execute(select(ProjectState).where(ProjectState.id == state.id))).scalar_one_or_none()
 
-    # If "get_by_id" doesn't populate branch and project and load the files,
-    # this will crash because they can't be lazy-loaded without an await.
+    # If "get_by_id" doesn't populate branch and project, this will crash
+    # because they can't be lazy-loaded without an await.
     assert s.branch.id == state.branch.id
     assert s.branch.project.id == state.branch.project.id
-    assert s.files[0].content.content == "hello world"
+    files = await s.awaitable_attrs.files
+    assert files[0].content.content == "hello world"
 
 
 @pytest.mark.asyncio
@@ -60,8 +63,128 @@ async def test_create_next_state_clones_files(testdb):
     next_state = await state.create_next_state()
 
     # Check that the new state has a new file with the same content
-    assert next_state.files[0].id != state.files[0].id
+    assert next_state.files[0] is not state.files[0]
     assert next_state.files[0].content_id == f.content_id
+    # The already loaded content is shared
+    assert next_state.files[0].content is f.content
+
+    await testdb.commit()
+    assert next_state.branch_id == state.branch_id
+    assert next_state.specification_id == state.specification_id
+
+
+@pytest.mark.asyncio
+async def test_next_state_only_stores_changed_files(testdb):
+    state = create_project_state()
+    for path in ["a.txt", "b.txt", "c.txt"]:
+        state.files.append(File(path=path, content=FileContent(id=path, content=path)))
+    testdb.add(state)
+    await testdb.commit()
+
+    next_state = await state.create_next_state()
+    next_state.save_file("a.txt", FileContent(id="a2", content="changed"))
+    next_state.get_file_by_path("b.txt").meta = {"description": "B"}
+    next_state.files.remove(next_state.get_file_by_path("c.txt"))
+    next_state.save_file("d.txt", FileContent(id="d", content="new"))
+    await testdb.commit()
+
+    result = await testdb.execute(select(File).where(File.project_state_id == next_state.id))
+    changes = {f.path: (f.content_id, f.meta) for f in result.scalars()}
+    assert changes == {
+        "a.txt": ("a2", {}),
+        "b.txt": ("b.txt", {"description": "B"}),
+        "c.txt": (None, {}),
+        "d.txt": ("d", {}),
+    }
+
+    third_state = await next_state.create_next_state()
+    await testdb.commit()
+    result = await testdb.execute(select(File).where(File.project_state_id == third_state.id))
+    assert result.scalars().all() == []
+
+    testdb.expunge_all()
+    s = (await testdb.execute(select(ProjectState).where(ProjectState.id == third_state.id))).scalar_one()
+    files = await s.awaitable_attrs.files
+    assert [(f.path, f.content.content, f.meta) for f in files] == [
+        ("a.txt", "changed", {}),
+        ("b.txt", "b.txt", {"description": "B"}),
+        ("d.txt", "new", {}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_undone_file_change_is_not_stored(testdb):
+    state = create_project_state()
+    state.files.append(File(path="a.txt", content=FileContent(id="a", content="a")))
+    testdb.add(state)
+    await testdb.commit()
+
+    next_state = await state.create_next_state()
+    file = next_state.get_file_by_path("a.txt")
+    original = file.content
+    file.content = FileContent(id="a2", content="changed")
+    await testdb.commit()
+    file.content = original
+    await testdb.commit()
+
+    result = await testdb.execute(select(File).where(File.project_state_id == next_state.id))
+    assert result.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_files_snapshot_hides_older_files(testdb):
+    state = create_project_state()
+    state.files.append(File(path="deleted.txt", content=FileContent(id="d", content="d")))
+    testdb.add(state)
+    await testdb.commit()
+
+    # A state saved with all of its files, before files were stored as changes
+    legacy_state = ProjectState(
+        branch_id=state.branch_id,
+        prev_state=state,
+        step_index=2,
+        specification_id=state.specification_id,
+        files_snapshot=True,
+    )
+    testdb.add(legacy_state)
+    testdb.add(File(path="kept.txt", content_id="d", project_state=legacy_state))
+    await testdb.commit()
+
+    testdb.expunge_all()
+    s = (await testdb.execute(select(ProjectState).where(ProjectState.id == legacy_state.id))).scalar_one()
+    files = await s.awaitable_attrs.files
+    assert [f.path for f in files] == ["kept.txt"]
+
+
+@pytest.mark.asyncio
+@patch("core.db.models.project_state.FILES_SNAPSHOT_INTERVAL", 2)
+async def test_files_snapshot_is_stored_periodically(testdb):
+    state = create_project_state()
+    state.files.append(File(path="a.txt", content=FileContent(id="a", content="a")))
+    state.files.append(File(path="b.txt", content=FileContent(id="b", content="b")))
+    testdb.add(state)
+    await testdb.commit()
+
+    second_state = await state.create_next_state()
+    second_state.files = [f for f in second_state.files if f.path != "b.txt"]
+    await testdb.commit()
+
+    third_state = await second_state.create_next_state()
+    third_state.save_file("c.txt", FileContent(id="c", content="c"))
+    await testdb.commit()
+
+    # The snapshot stores all of its files, so the older states aren't needed anymore
+    assert second_state.files_snapshot
+    assert not third_state.files_snapshot
+    result = await testdb.execute(select(File.path).where(File.project_state_id == second_state.id))
+    assert result.scalars().all() == ["a.txt"]
+    await testdb.execute(delete(File).where(File.project_state_id == state.id))
+    await testdb.commit()
+
+    testdb.expunge_all()
+    s = (await testdb.execute(select(ProjectState).where(ProjectState.id == third_state.id))).scalar_one()
+    files = await s.awaitable_attrs.files
+    assert [f.path for f in files] == ["a.txt", "c.txt"]
 
 
 @pytest.mark.asyncio
@@ -107,15 +230,15 @@ async def test_deleting_state_removes_child_objects(testdb):
     # Double-check that objects are in the database
     s = (await testdb.execute(select(ProjectState).where(ProjectState.id == next_state.id))).scalar_one_or_none()
     assert s == next_state
-    f = (await testdb.execute(select(File).where(File.id == file.id))).scalar_one_or_none()
-    assert f == file
+    f = (await testdb.execute(select(File).where(File.project_state_id == next_state.id))).scalar_one_or_none()
+    assert f.path == file.path
 
     await state.delete_after()
 
     # Verify they're deleted
     s = (await testdb.execute(select(ProjectState).where(ProjectState.id == next_state.id))).scalar_one_or_none()
     assert s is None
-    f = (await testdb.execute(select(File).where(File.id == file.id))).scalar_one_or_none()
+    f = (await testdb.execute(select(File).where(File.project_state_id == next_state.id))).scalar_one_or_none()
     assert f is None
 
 
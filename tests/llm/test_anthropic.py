@@ -0,0 +1,106 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pydantic import BaseModel
+
+from core.config import LLMConfig, LLMProvider
+from core.llm.anthropic_client import AnthropicClient
+from core.llm.convo import Convo
+from core.llm.parser import JSONParser
+
+
+def test_adapt_messages_without_cache_breakpoints():
+    llm = AnthropicClient(LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku"))
+    convo = Convo("system").user("user").assistant("assistant")
+
+    assert llm._adapt_messages(convo) == [
+        {"role": "user", "content": "system\n\nuser"},
+        {"role": "assistant", "content": "assistant"},
+    ]
+
+
+def test_adapt_messages_with_cache_breakpoints():
+    llm = AnthropicClient(LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku"))
+    convo = Convo("system").cache_prefix().user("context").cache_prefix().user("question")
+
+    assert llm._adapt_messages(convo) == [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "system", "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": "context", "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": "question"},
+            ],
+        },
+    ]
+
+
+def test_adapt_messages_limits_cache_breakpoints():
+    llm = AnthropicClient(LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku"))
+    convo = Convo()
+    for i in range(6):
+        convo.user(f"question {i}").cache_prefix().assistant(f"answer {i}")
+
+    messages = llm._adapt_messages(convo)
+    cached = [msg for msg in messages if isinstance(msg["content"], list)]
+    assert [msg["content"][0]["text"] for msg in cached] == ["question 2", "question 3", "question 4", "question 5"]
+
+
+@pytest.mark.asyncio
+@patch("core.llm.anthropic_client.AsyncAnthropic")
+async def test_records_prompt_cache_usage(mock_AsyncAnthropic):
+    async def text_stream():
+        yield "hello"
+
+    usage = MagicMock(input_tokens=10, output_tokens=2, cache_read_input_tokens=1000, cache_creation_input_tokens=50)
+    stream = MagicMock(text_stream=text_stream(), get_final_message=AsyncMock(return_value=MagicMock(usage=usage)))
+    mock_AsyncAnthropic.return_value.messages.stream.return_value.__aenter__.return_value = stream
+
+    llm = AnthropicClient(
+        LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku", base_url="https://api.anthropic.com")
+    )
+    response, req_log = await llm(Convo("system").cache_prefix().user("hi"))
+
+    assert response == "hello"
+    assert req_log.prompt_tokens == 1060
+    assert req_log.completion_tokens == 2
+    assert req_log.cache_read_tokens == 1000
+    assert req_log.cache_write_tokens == 50
+
+
+@pytest.mark.asyncio
+@patch("core.llm.anthropic_client.AsyncAnthropic")
+async def test_forces_tool_use_for_structured_output(mock_AsyncAnthropic):
+    class Steps(BaseModel):
+        steps: list[int]
+
+    def make_stream(*events):
+        async def event_stream():
+            for event in events:
+                yield event
+
+        usage = MagicMock(input_tokens=10, output_tokens=2, cache_read_input_tokens=0, cache_creation_input_tokens=0)
+        stream = MagicMock(get_final_message=AsyncMock(return_value=MagicMock(usage=usage)))
+        stream.__aiter__.side_effect = lambda: event_stream()
+        return stream
+
+    stream = make_stream(
+        MagicMock(type="content_block_start"),
+        MagicMock(type="input_json", partial_json='{"steps": [1, '),
+        MagicMock(type="input_json", partial_json="2]}"),
+    )
+    mock_stream = mock_AsyncAnthropic.return_value.messages.stream
+    mock_stream.return_value.__aenter__.return_value = stream
+
+    llm = AnthropicClient(
+        LLMConfig(provider=LLMProvider.ANTHROPIC, model="claude-3-haiku", base_url="https://api.anthropic.com")
+    )
+    convo = Convo("system").user("hi")
+    convo.user("Respond with JSON matching this schema").mark_schema_hint()
+    response, req_log = await llm(convo, parser=JSONParser(Steps))
+
+    assert response.steps == [1, 2]
+    kwargs = mock_stream.call_args.kwargs
+    assert kwargs["tool_choice"] == {"type": "tool", "name": "Steps"}
+    assert kwargs["tools"][0]["input_schema"] == Steps.model_json_schema()
+    assert kwargs["messages"] == [{"role": "user", "content": "system\n\nhi"}]
@@ -0,0 +1,123 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.config import LLMCacheConfig, LLMConfig, LLMProvider
+from core.llm.cache import MemoryResponseCache, SQLiteResponseCache, cache_key, get_response_cache
+from core.llm.convo import Convo
+from core.llm.openai_client import OpenAIClient
+
+
+def test_cache_key_depends_on_request_params():
+    convo = Convo("system").user("hello")
+    key = cache_key(LLMProvider.OPENAI, "gpt-4", 0, False, convo)
+
+    assert key == cache_key(LLMProvider.OPENAI, "gpt-4", 0, False, Convo("system").user("hello"))
+    assert key != cache_key(LLMProvider.ANTHROPIC, "gpt-4", 0, False, convo)
+    assert key != cache_key(LLMProvider.OPENAI, "gpt-4o", 0, False, convo)
+    assert key != cache_key(LLMProvider.OPENAI, "gpt-4", 0, True, convo)
+    assert key != cache_key(LLMProvider.OPENAI, "gpt-4", 0, False, Convo("system").user("bye"))
+
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_memory_cache_size_eviction():
+    cache = MemoryResponseCache(max_size=10)
+    cache.set("a", "12345")
+    cache.set("b", "12345")
+    cache.set("c", "1")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "12345"
+
+
+def test_memory_cache_age_eviction():
+    cache = MemoryResponseCache(max_age=10)
+    with patch("core.llm.cache.time.time", return_value=100):
+        cache.set("a", "1")
+    with patch("core.llm.cache.time.time", return_value=105):
+        assert cache.get("a") == "1"
+    with patch("core.llm.cache.time.time", return_value=111):
+        assert cache.get("a") is None
+
+
+def test_sqlite_cache_persists(tmp_path):
+    path = str(tmp_path / "cache" / "llm.db")
+    cache = SQLiteResponseCache(path, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    cache.close()
+
+    cache = SQLiteResponseCache(path, max_entries=2)
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_get_response_cache_disabled():
+    assert get_response_cache(LLMCacheConfig(enabled=False)) is None
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_uses_cache_for_deterministic_calls(mock_AsyncOpenAI):
+    cache = MemoryResponseCache()
+    llm = OpenAIClient(LLMConfig(model="gpt-4"), cache=cache)
+    llm._make_request = AsyncMock(return_value=("hello", 10, 2))
+
+    convo = Convo("system").user("user")
+    response, req_log = await llm(convo, temperature=0)
+    assert response == "hello"
+    assert req_log.cached is False
+
+    response, req_log = await llm(convo, temperature=0)
+    assert response == "hello"
+    assert req_log.cached is True
+    assert llm._make_request.await_count == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_skips_cache_for_sampled_calls(mock_AsyncOpenAI):
+    cache = MemoryResponseCache()
+    llm = OpenAIClient(LLMConfig(model="gpt-4", temperature=0.5), cache=cache)
+    llm._make_request = AsyncMock(return_value=("hello", 10, 2))
+
+    convo = Convo("system").user("user")
+    await llm(convo)
+    await llm(convo)
+
+    assert llm._make_request.await_count == 2
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 0
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_ignores_unparseable_cached_response(mock_AsyncOpenAI):
+    cache = MemoryResponseCache()
+    llm = OpenAIClient(LLMConfig(model="gpt-4"), cache=cache)
+    llm._make_request = AsyncMock(return_value=("good", 10, 2))
+    convo = Convo("system").user("user")
+    cache.set(cache_key(LLMProvider.OPENAI, "gpt-4", 0, False, convo), "bad")
+
+    parser = MagicMock(side_effect=[ValueError("bad"), "parsed"])
+    response, req_log = await llm(convo, temperature=0, parser=parser)
+
+    assert response == "parsed"
+    assert req_log.cached is False
+    assert llm._make_request.await_count == 1
@@ -0,0 +1,62 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from core.config import LLMConfig
+from core.llm.client_pool import ClientPool
+from core.llm.openai_client import OpenAIClient
+
+
+def test_sdk_client_is_shared_for_same_config():
+    pool = ClientPool()
+    sdk_class = MagicMock()
+    http_class = MagicMock()
+
+    a = pool.sdk_client(sdk_class, http_class, max_connections=5, api_key="a", base_url=None)
+    b = pool.sdk_client(sdk_class, http_class, max_connections=5, api_key="a", base_url=None)
+    pool.sdk_client(sdk_class, http_class, max_connections=5, api_key="b", base_url=None)
+
+    assert a is b
+    assert sdk_class.call_count == 2
+    assert http_class.call_count == 2
+
+    limits = http_class.call_args.kwargs["limits"]
+    assert limits.max_connections == 5
+    assert sdk_class.call_args.kwargs["http_client"] is http_class.return_value
+
+
+@pytest.mark.asyncio
+async def test_http_client_pool_and_close():
+    pool = ClientPool()
+    a = pool.http_client(max_connections=3, base_url="https://example.com")
+    b = pool.http_client(max_connections=3, base_url="https://example.com")
+
+    assert a is b
+    assert isinstance(a, httpx.AsyncClient)
+
+    await pool.close()
+    assert a.is_closed
+    assert pool.clients == {}
+
+
+@pytest.mark.asyncio
+async def test_close_uses_sdk_close():
+    pool = ClientPool()
+    sdk_class = MagicMock(return_value=MagicMock(spec=["close"], close=AsyncMock()))
+    client = pool.sdk_client(sdk_class, MagicMock(), max_connections=1)
+
+    await pool.close()
+    client.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_llm_clients_share_sdk_client(mock_AsyncOpenAI):
+    cfg = LLMConfig(model="gpt-4", api_key="sk-test")
+
+    a = OpenAIClient(cfg)
+    b = OpenAIClient(cfg.model_copy(update={"model": "gpt-4o"}))
+
+    assert a.client is b.client
+    mock_AsyncOpenAI.assert_called_once()
@@ -1,6 +1,10 @@
+import pickle
+from dataclasses import FrozenInstanceError, replace
+from unittest.mock import PropertyMock, patch
+
 import pytest
 
-from core.llm.convo import Convo
+from core.llm.convo import Convo, Message, MessageList
 
 
 def test_convo_constructor_without_content():
@@ -294,3 +298,125 @@ def test_message_iterator():
         {"role": "system", "content": "hello"},
         {"role": "user", "content": "world"},
     ]
+
+
+def test_cache_prefix():
+    convo = Convo("system").user("context")
+    child = convo.fork()
+    child.cache_prefix().user("question")
+
+    assert [msg.cache_breakpoint for msg in child.messages] == [False, True, False]
+    assert not convo.messages[1].cache_breakpoint
+    assert child.messages[1] == convo.messages[1]
+    assert child.messages[1].to_dict() == {"role": "user", "content": "context"}
+
+
+@patch("core.llm.convo.count_tokens", side_effect=len)
+def test_token_count_is_cached(mock_count_tokens):
+    convo = Convo("system").user("hello")
+    assert convo.token_count == 3 + (6 + 3) + (5 + 3)
+    assert convo.token_count == 20
+    assert mock_count_tokens.call_count == 2
+
+    # Forks share the messages, and their cached counts
+    child = convo.fork().user("hi")
+    assert child.token_count == 20 + 2 + 3
+    assert mock_count_tokens.call_count == 3
+
+
+@patch("core.llm.convo.count_tokens", side_effect=len)
+def test_fit_drops_oldest_history(mock_count_tokens):
+    convo = Convo("system").user("context" * 10).cache_prefix()
+    for i in range(5):
+        convo.assistant(f"answer {i}" * 10).user(f"question {i}")
+
+    assert convo.fit(1000) is convo
+
+    fitted = convo.fit(convo.token_count - 150)
+    assert fitted is not convo
+    assert fitted.token_count <= convo.token_count - 150
+    assert fitted.messages[:2] == convo.messages[:2]
+    assert fitted.messages[-1] == convo.messages[-1]
+    assert "answer 0" not in [msg.content[:8] for msg in fitted.messages]
+    assert len(convo.messages) == 12
+
+
+@patch("core.llm.convo.count_tokens", side_effect=len)
+def test_fit_compacts_history_message(mock_count_tokens):
+    convo = Convo("system").user("context").cache_prefix()
+    convo.assistant("x" * 1000).user("question")
+
+    fitted = convo.fit(500)
+
+    assert fitted.token_count <= 500
+    assert [msg.content for msg in fitted.messages[:2]] == ["system", "context"]
+    assert fitted.messages[-1].content == "question"
+    content = fitted.messages[2].content
+    assert content.startswith("xxx") and content.endswith("xxx")
+    assert "tokens omitted" in content
+
+
+@patch("core.llm.convo.count_tokens", side_effect=len)
+def test_fit_never_changes_pinned_messages(mock_count_tokens):
+    convo = Convo("system").user("x" * 1000).cache_prefix()
+    convo.assistant("answer").user("y" * 1000)
+
+    with patch("core.llm.convo.log") as mock_log:
+        fitted = convo.fit(500)
+
+    assert [msg.content for msg in fitted.messages] == ["system", "x" * 1000, "y" * 1000]
+    mock_log.warning.assert_called_once()
+
+
+@patch("core.llm.convo.count_tokens", side_effect=len)
+def test_token_count_is_a_running_total(mock_count_tokens):
+    convo = Convo("system").user("hello")
+    assert convo.token_count == 20
+
+    convo.assistant("hi")
+    with patch.object(Message, "token_count", new_callable=PropertyMock) as mock_token_count:
+        mock_token_count.return_value = 2
+        assert convo.token_count == 20 + 2 + 3
+        # Only the new message was counted
+        assert mock_token_count.call_count == 1
+
+
+def test_fork_shares_messages():
+    convo = Convo("system").user("context")
+    child = convo.fork().assistant("answer")
+    grandchild = child.fork()
+
+    assert grandchild.messages is child.messages
+    assert child.messages[:2] is not convo.messages
+    assert child.messages[:2] == convo.messages
+    assert child.messages[0] is convo.messages[0]
+    assert len(convo.messages) == 2
+    assert len(child.messages) == 3
+
+
+def test_message_is_frozen():
+    msg = Message(role="user", content="hello")
+    with pytest.raises(FrozenInstanceError):
+        msg.content = "hi"
+
+    assert not hasattr(msg, "__dict__")
+    assert replace(msg, content="hi") == {"role": "user", "content": "hi"}
+
+
+def test_message_list():
+    messages = MessageList(Message(role="user", content=str(i)) for i in range(5))
+
+    assert len(messages) == 5
+    assert [msg.content for msg in messages] == ["0", "1", "2", "3", "4"]
+    assert messages[0].content == "0"
+    assert messages[-1].content == "4"
+    assert [msg.content for msg in messages[:-2]] == ["0", "1", "2"]
+    assert [msg.content for msg in messages[1::2]] == ["1", "3"]
+    assert [msg.content for msg in messages[3:] + messages[:1]] == ["3", "4", "0"]
+    assert messages == [{"role": "user", "content": str(i)} for i in range(5)]
+    assert messages != messages[:4]
+    with pytest.raises(IndexError):
+        messages[5]
+
+    assert pickle.loads(pickle.dumps(messages)) == messages
+    assert MessageList() == []
@@ -0,0 +1,70 @@
+import json
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from core.config import LLMConfig, LLMProvider
+from core.llm.base import APIError
+from core.llm.convo import Convo
+from core.llm.deepseek_client import DeepSeekClient
+
+
+def sse(*chunks) -> bytes:
+    events = [": keep-alive\n\n"]
+    events += [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks]
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+def delta(content: str) -> dict:
+    return {"choices": [{"index": 0, "delta": {"content": content}}]}
+
+
+def make_client(handler, **kwargs) -> DeepSeekClient:
+    llm = DeepSeekClient(
+        LLMConfig(provider=LLMProvider.DEEPSEEK, model="deepseek-chat", connect_timeout=5, read_timeout=30),
+        **kwargs,
+    )
+    llm.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://api.deepseek.test")
+    return llm
+
+
+@pytest.mark.asyncio
+async def test_deepseek_streams_response():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        usage = {"prompt_tokens": 10, "completion_tokens": 2, "prompt_cache_hit_tokens": 8}
+        body = sse(delta("hello"), delta(" world"), {"choices": [], "usage": usage})
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+    streamed = []
+    llm = make_client(handler, stream_handler=AsyncMock(side_effect=streamed.append))
+    response, req_log = await llm(Convo("system").user("hi"), temperature=0)
+
+    assert response == "hello world"
+    assert streamed == ["hello world", None]
+    assert (req_log.prompt_tokens, req_log.completion_tokens, req_log.cache_read_tokens) == (10, 2, 8)
+    assert requests[0]["stream"] is True
+    assert requests[0]["temperature"] == 0
+
+
+@pytest.mark.asyncio
+async def test_deepseek_client_uses_configured_timeouts():
+    llm = DeepSeekClient(
+        LLMConfig(provider=LLMProvider.DEEPSEEK, model="deepseek-chat", connect_timeout=5, read_timeout=30)
+    )
+    assert llm.client.timeout.connect == 5
+    assert llm.client.timeout.read == 30
+
+
+@pytest.mark.asyncio
+async def test_deepseek_reports_api_errors():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, json={"error": {"message": "Invalid model"}})
+
+    llm = make_client(handler)
+    with pytest.raises(APIError, match="400 Bad Request"):
+        await llm(Convo().user("hi"), max_retries=1)
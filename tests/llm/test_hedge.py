@@ -0,0 +1,187 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from core.config import LLMConfig, LLMHedgeConfig, LLMProvider
+from core.llm.base import APIError
+from core.llm.convo import Convo
+from core.llm.hedge import HedgedClient, LatencyTracker, get_latency_tracker
+from core.llm.request_log import LLMRequestLog, LLMRequestStatus
+
+
+def make_client(model, *chunks, delay=0, error=None):
+    """Create a fake LLM client streaming `chunks` after `delay` seconds."""
+    client = MagicMock(config=LLMConfig(model=model), stream_handler=None, error_handler=None)
+
+    async def call(convo, **kwargs):
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        for chunk in chunks:
+            await client.stream_handler(chunk)
+            await asyncio.sleep(0.01)
+        return "".join(chunks), LLMRequestLog(provider=LLMProvider.OPENAI, model=model, temperature=0)
+
+    client.side_effect = call
+    return client
+
+
+def policy(**kwargs):
+    return LLMHedgeConfig(provider="anthropic", model="secondary", **kwargs)
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker(window=10)
+    assert tracker.percentile(95) is None
+    for i in range(1, 21):
+        tracker.record(i)
+    assert len(tracker.samples) == 10
+    assert tracker.percentile(0) == 11
+    assert tracker.percentile(50) == 15
+    assert tracker.percentile(100) == 20
+
+
+def test_hedge_delay_uses_percentile_once_warmed_up():
+    primary = make_client("hedge-delay-primary")
+    hedged = HedgedClient(primary, make_client("secondary"), policy(min_samples=3, default_delay=7, percentile=50))
+    assert hedged.hedge_delay() == 7
+
+    for sample in (1, 2, 3):
+        get_latency_tracker(primary.config).record(sample)
+    assert hedged.hedge_delay() == 2
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    stream_handler = AsyncMock()
+    primary = make_client("fast-primary", "hello", " world")
+    secondary = make_client("secondary", "hi")
+    primary.stream_handler = stream_handler
+    hedged = HedgedClient(primary, secondary, policy(default_delay=1))
+
+    response, _ = await hedged(Convo().user("hi"))
+
+    assert response == "hello world"
+    secondary.assert_not_called()
+    assert [c.args[0] for c in stream_handler.await_args_list] == ["hello", " world"]
+    assert len(get_latency_tracker(primary.config).samples) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged():
+    stream_handler = AsyncMock()
+    primary = make_client("slow-primary", "late", delay=10)
+    secondary = make_client("secondary", "fast")
+    primary.stream_handler = stream_handler
+    hedged = HedgedClient(primary, secondary, policy(default_delay=0.01))
+
+    response, request_log = await hedged(Convo().user("hi"))
+
+    assert response == "fast"
+    assert request_log.model == "secondary"
+    stream_handler.assert_awaited_once_with("fast")
+
+    # The cancelled primary still cost the prompt tokens
+    [cancelled_log] = request_log.hedged
+    assert cancelled_log.model == "slow-primary"
+    assert cancelled_log.status == LLMRequestStatus.ERROR
+    assert cancelled_log.prompt_tokens > 0
+
+    # The primary's time to first token is at least as long as the race took
+    [sample] = get_latency_tracker(primary.config).samples
+    assert sample >= 0.01
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_fails_over():
+    primary = make_client("failing-primary", error=APIError("provider down"))
+    secondary = make_client("secondary", "ok")
+    hedged = HedgedClient(primary, secondary, policy(default_delay=10))
+
+    response, _ = await asyncio.wait_for(hedged(Convo().user("hi")), 1)
+    assert response == "ok"
+    assert len(get_latency_tracker(primary.config).samples) == 1
+
+
+@pytest.mark.asyncio
+async def test_primary_is_not_retried_before_failing_over():
+    primary = make_client("failing-primary", error=APIError("provider down"))
+    primary.error_handler = AsyncMock(return_value=True)
+    secondary = make_client("secondary", "ok")
+    hedged = HedgedClient(primary, secondary, policy(default_delay=10))
+
+    response, _ = await hedged(Convo().user("hi"), max_retries=2)
+
+    assert response == "ok"
+    assert primary.call_args.kwargs["max_retries"] == 0
+    assert secondary.call_args.kwargs["max_retries"] == 2
+    # The user is only asked once both attempts have failed
+    assert primary.error_handler is None
+    hedged.error_handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_primary_failing_while_streaming_fails_over():
+    stream_handler = AsyncMock()
+    primary = make_client("streaming-primary")
+
+    async def failing_call(convo, **kwargs):
+        await primary.stream_handler("partial")
+        raise APIError("connection reset")
+
+    primary.side_effect = failing_call
+    primary.stream_handler = stream_handler
+    secondary = make_client("secondary", "complete")
+    hedged = HedgedClient(primary, secondary, policy(default_delay=10))
+
+    response, _ = await hedged(Convo().user("hi"))
+
+    assert response == "complete"
+    assert [c.args[0] for c in stream_handler.await_args_list] == ["partial", None, "complete"]
+
+
+@pytest.mark.asyncio
+async def test_secondary_winning_ends_primary_stream():
+    stream_handler = AsyncMock()
+    primary = make_client("slow-streaming-primary")
+
+    async def slow_call(convo, **kwargs):
+        await asyncio.sleep(0.05)
+        await primary.stream_handler("partial")
+        await asyncio.sleep(10)
+
+    primary.side_effect = slow_call
+    primary.stream_handler = stream_handler
+    secondary = make_client("secondary", "complete", delay=0.1)
+    hedged = HedgedClient(primary, secondary, policy(default_delay=0.01))
+
+    response, _ = await asyncio.wait_for(hedged(Convo().user("hi")), 1)
+
+    assert response == "complete"
+    assert [c.args[0] for c in stream_handler.await_args_list] == ["partial", None, "complete"]
+
+
+@pytest.mark.asyncio
+async def test_asks_user_to_retry_if_both_fail():
+    primary = make_client("failing-primary", error=APIError("primary down"))
+    primary.error_handler = AsyncMock(side_effect=[True, False])
+    secondary = make_client("secondary", error=APIError("secondary down"))
+    hedged = HedgedClient(primary, secondary, policy(default_delay=10))
+
+    with pytest.raises(APIError):
+        await hedged(Convo().user("hi"))
+    assert hedged.error_handler.await_count == 2
+    assert primary.call_count == 2
+    assert secondary.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_reports_primary_error_if_both_fail():
+    primary = make_client("failing-primary", error=APIError("primary down"))
+    secondary = make_client("secondary", error=APIError("secondary down"))
+    hedged = HedgedClient(primary, secondary, policy(default_delay=10))
+
+    with pytest.raises(APIError) as exc_info:
+        await hedged(Convo().user("hi"))
+    assert exc_info.value.message == "primary down"
@@ -0,0 +1,95 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.config import LLMConfig, LLMProvider
+from core.llm.base import BaseLLMClient
+from core.llm.convo import Convo
+from core.llm.lm_studio_client import LMStudioClient, SlotPool
+
+
+def make_config(**extra) -> LLMConfig:
+    return LLMConfig(
+        provider=LLMProvider.LM_STUDIO,
+        model="qwen2.5-coder-7b",
+        base_url="http://localhost:1234/v1",
+        extra=extra or None,
+    )
+
+
+async def response_generator(*contents, usage=None):
+    for content in contents:
+        yield MagicMock(choices=[MagicMock(delta=MagicMock(content=content))], usage=None)
+    if usage is not None:
+        yield MagicMock(choices=[], usage=usage)
+
+
+def test_for_provider():
+    assert BaseLLMClient.for_provider(LLMProvider.LM_STUDIO) is LMStudioClient
+
+
+def test_slot_pool_pins_conversations():
+    pool = SlotPool(2)
+    first = Convo("system").user("first task")
+    second = Convo("system").user("second task")
+    third = Convo("system").user("third task")
+
+    assert pool.slot_for(first) == 0
+    assert pool.slot_for(second) == 1
+    # Follow-up requests in the same conversation go to the same slot
+    assert pool.slot_for(first.fork().assistant("done").user("next")) == 0
+    # The least recently used conversation gives up its slot
+    assert pool.slot_for(third) == 1
+    assert pool.slot_for(second) == 0
+
+
+@pytest.mark.asyncio
+@patch("core.llm.lm_studio_client.AsyncOpenAI")
+async def test_lm_studio_pins_slot_and_caches_prompt(mock_AsyncOpenAI):
+    usage = MagicMock(prompt_tokens=5, completion_tokens=1)
+    create = AsyncMock(side_effect=lambda **kwargs: response_generator("hello", usage=usage))
+    mock_AsyncOpenAI.return_value.chat.completions.create = create
+    llm = LMStudioClient(make_config(slots=4, ttl=300))
+
+    convo = Convo("system").user("task")
+    await llm(convo)
+    await llm(convo.fork().assistant("hello").user("more"))
+    await llm(Convo("system").user("other task"))
+
+    slots = [c.kwargs["extra_body"]["id_slot"] for c in create.await_args_list]
+    assert slots == [0, 0, 1]
+    assert create.await_args.kwargs["extra_body"]["cache_prompt"] is True
+    assert create.await_args.kwargs["extra_body"]["ttl"] == 300
+    assert mock_AsyncOpenAI.call_args.kwargs["api_key"] == "lm-studio"
+
+
+@pytest.mark.asyncio
+@patch("core.llm.lm_studio_client.AsyncOpenAI")
+async def test_lm_studio_json_mode_and_missing_usage(mock_AsyncOpenAI):
+    create = AsyncMock(return_value=response_generator('{"a": ', "1}"))
+    mock_AsyncOpenAI.return_value.chat.completions.create = create
+    llm = LMStudioClient(make_config())
+
+    response, req_log = await llm(Convo("system").user("give me json"), json_mode=True)
+
+    assert response == '{"a": 1}'
+    assert create.await_args.kwargs["response_format"]["type"] == "json_schema"
+    assert "id_slot" not in create.await_args.kwargs["extra_body"]
+    # The server didn't report usage, so it's estimated
+    assert req_log.prompt_tokens > 0
+    assert req_log.completion_tokens > 0
+
+
+@pytest.mark.asyncio
+@patch("core.llm.lm_studio_client.AsyncOpenAI")
+async def test_lm_studio_warm_up(mock_AsyncOpenAI):
+    create = AsyncMock()
+    mock_AsyncOpenAI.return_value.chat.completions.create = create
+    llm = LMStudioClient(make_config())
+
+    assert await llm.warm_up()
+    assert create.await_args.kwargs["max_tokens"] == 1
+    assert create.await_args.kwargs["model"] == "qwen2.5-coder-7b"
+
+    create.side_effect = ConnectionError("server is down")
+    assert not await llm.warm_up()
@@ -0,0 +1,107 @@
+import json
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, RateLimitError
+
+from core.config import LLMConfig, LLMProvider
+from core.llm.convo import Convo
+from core.llm.deepseek_client import DeepSeekClient
+from core.llm.mock_server import MockLLMConfig, MockLLMServer
+
+
+def http_client(server: MockLLMServer, base_url: str = "http://mock.test/v1") -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url=base_url)
+
+
+def openai_client(server: MockLLMServer) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key="test",
+        base_url="http://mock.test/v1",
+        http_client=http_client(server),
+        max_retries=0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_mock_server_streams_scripted_responses():
+    server = MockLLMServer(MockLLMConfig(responses=["hello world", "second"]))
+    client = openai_client(server)
+
+    stream = await client.chat.completions.create(
+        model="gpt-4o",
+        messages=[{"role": "user", "content": "hi"}],
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+
+    assert parts == ["hello", " world"]
+    assert chunk.usage.completion_tokens > 0
+    assert chunk.usage.prompt_tokens > 0
+
+    response = await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert response.choices[0].message.content == "second"
+
+    stats = (await http_client(server, "http://mock.test").get("/stats")).json()
+    assert stats["requests"] == 2
+    assert stats["completion_tokens"] == chunk.usage.completion_tokens + response.usage.completion_tokens
+
+
+@pytest.mark.asyncio
+async def test_mock_server_serves_recorded_responses(tmp_path):
+    messages = [{"role": "user", "content": "what's up"}]
+    recorded = tmp_path / "requests.jsonl"
+    recorded.write_text(json.dumps({"messages": messages, "response": "recorded"}) + "\n")
+
+    server = MockLLMServer(MockLLMConfig(responses=["scripted"], replay_source=str(recorded)))
+    client = openai_client(server)
+
+    response = await client.chat.completions.create(model="gpt-4o", messages=messages)
+    assert response.choices[0].message.content == "recorded"
+
+    response = await client.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "other"}])
+    assert response.choices[0].message.content == "scripted"
+
+
+@pytest.mark.asyncio
+async def test_mock_server_enforces_rate_limits():
+    server = MockLLMServer(MockLLMConfig(requests_per_minute=1, retry_after=2))
+    client = openai_client(server)
+    messages = [{"role": "user", "content": "hi"}]
+
+    await client.chat.completions.create(model="gpt-4o", messages=messages)
+    with pytest.raises(RateLimitError) as exc_info:
+        await client.chat.completions.create(model="gpt-4o", messages=messages)
+
+    headers = exc_info.value.response.headers
+    assert headers["retry-after"] == "2"
+    assert headers["x-ratelimit-remaining-requests"] == "0"
+    assert server.stats.errors == {429: 1}
+
+
+@pytest.mark.asyncio
+async def test_mock_server_injects_errors():
+    server = MockLLMServer(MockLLMConfig(error_rate=1, error_statuses=[503]))
+
+    response = await http_client(server).post("/chat/completions", json={"messages": []})
+
+    assert response.status_code == 503
+    assert response.json()["error"]["type"] == "server_error"
+    assert server.stats.errors == {503: 1}
+
+
+@pytest.mark.asyncio
+async def test_deepseek_client_against_mock_server():
+    server = MockLLMServer(MockLLMConfig(responses=["hello there"]))
+    llm = DeepSeekClient(LLMConfig(provider=LLMProvider.DEEPSEEK, model="deepseek-chat"))
+    llm.client = http_client(server, "http://mock.test/v1/chat/completions")
+
+    response, req_log = await llm(Convo("system").user("hi"))
+
+    assert response == "hello there"
+    assert req_log.prompt_tokens == server.stats.prompt_tokens
+    assert req_log.completion_tokens == server.stats.completion_tokens
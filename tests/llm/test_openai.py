@@ -2,11 +2,13 @@ from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import openai
 import pytest
+from pydantic import BaseModel
 
 from core.config import LLMConfig
 from core.llm.base import APIError
 from core.llm.convo import Convo
 from core.llm.openai_client import OpenAIClient
+from core.llm.parser import JSONParser
 
 
 async def mock_response_generator(*content):
@@ -48,6 +50,59 @@ async def test_openai_calls_gpt(mock_AsyncOpenAI):
     )
 
 
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_openai_records_cached_prompt_tokens(mock_AsyncOpenAI):
+    async def response_generator():
+        chunk = MagicMock(choices=[MagicMock(delta=MagicMock(content="hello"))])
+        yield chunk
+        usage = MagicMock(prompt_tokens=2000, completion_tokens=1, prompt_tokens_details=MagicMock(cached_tokens=1920))
+        yield MagicMock(choices=[], usage=usage)
+
+    mock_AsyncOpenAI.return_value.chat.completions.create = AsyncMock(return_value=response_generator())
+
+    llm = OpenAIClient(LLMConfig(model="gpt-4o"))
+    response, req_log = await llm(Convo("system hello").user("user hello"))
+
+    assert response == "hello"
+    assert req_log.prompt_tokens == 2000
+    assert req_log.cache_read_tokens == 1920
+    assert req_log.cache_write_tokens == 0
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+@patch("core.llm.base.monotonic")
+@patch("core.llm.stream_buffer.monotonic")
+async def test_openai_records_timings(mock_buffer_monotonic, mock_monotonic, mock_AsyncOpenAI):
+    clock = iter(range(100))
+    mock_monotonic.side_effect = lambda: next(clock)
+    # Stream handler runs in the background, so it gets its own clock
+    mock_buffer_monotonic.side_effect = [0, 2]
+
+    async def response_generator():
+        for content in ["hello", " world"]:
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content=content))])
+        yield MagicMock(choices=[], usage=MagicMock(prompt_tokens=10, completion_tokens=4))
+
+    mock_AsyncOpenAI.return_value.chat.completions.create = AsyncMock(return_value=response_generator())
+
+    llm = OpenAIClient(LLMConfig(model="gpt-4o"), stream_handler=AsyncMock())
+    llm.rate_limiter = MagicMock()
+    llm.rate_limiter.limit.return_value.__aenter__.return_value = {"queued": 0.5}
+    _, req_log = await llm(Convo("system hello").user("user hello"), parser=lambda text: text)
+
+    # Clock ticks: 0 attempt start, 1 request sent, 2 connected,
+    # 3 first chunk, 4 second chunk, 5-6 parser; both chunks are delivered in one update
+    assert req_log.queue_time == 0.5
+    assert req_log.connect_time == 1
+    assert req_log.time_to_first_token == 2
+    assert req_log.tokens_per_second == 4
+    assert req_log.stream_handler_time == 2
+    assert req_log.parse_time == 1
+    assert req_log.retry_time == 0
+
+
 @pytest.mark.asyncio
 @patch("core.llm.openai_client.AsyncOpenAI")
 async def test_openai_stream_handler(mock_AsyncOpenAI):
@@ -62,7 +117,8 @@ async def test_openai_stream_handler(mock_AsyncOpenAI):
     llm = OpenAIClient(cfg, stream_handler=stream_handler)
     await llm(convo)
 
-    stream_handler.assert_has_awaits([call("hello"), call("world")])
+    # Chunks received while the handler is busy are merged into one update
+    stream_handler.assert_has_awaits([call("helloworld")])
 
 
 @pytest.mark.asyncio
@@ -115,7 +171,7 @@ async def test_openai_parser_fails(mock_AsyncOpenAI):
     llm = OpenAIClient(cfg)
 
     with pytest.raises(APIError, match="Error parsing response"):
-        await llm(convo, parser=parser, max_retries=1)
+        await llm(convo, parser=parser, max_retries=0)
 
 
 @pytest.mark.asyncio
@@ -147,7 +203,7 @@ async def test_openai_error_handler_success(mock_AsyncOpenAI):
             ("Hello", 0, 0),  # success
         ]
     )
-    response, _ = await llm(convo, max_retries=2)
+    response, _ = await llm(convo, max_retries=1)
     assert response == "Hello"
 
 
@@ -166,7 +222,7 @@ async def test_openai_error_handler_failure(mock_AsyncOpenAI):
     llm._make_request = AsyncMock(side_effect=[openai.APIError("test error", None, body=None)])
 
     with pytest.raises(APIError, match="test error"):
-        await llm(convo, max_retries=1)
+        await llm(convo, max_retries=0)
 
     error_handler.assert_awaited_once()
 
@@ -192,3 +248,60 @@ def test_openai_rate_limit_parser(mock_AsyncOpenAI, remaining_tokens, reset_toke
 
     llm = OpenAIClient(LLMConfig(model="gpt-4"))
     assert int(llm.rate_limit_sleep(err).total_seconds()) == expected
+
+
+@pytest.mark.asyncio
+@patch("core.llm.convo.count_tokens", side_effect=len)
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_openai_fits_convo_to_budget(mock_AsyncOpenAI, mock_count_tokens):
+    llm = OpenAIClient(LLMConfig(model="gpt-4", max_context_tokens=60))
+    llm._make_request = AsyncMock(return_value=("hello", 1, 1))
+    convo = Convo("system").user("context").cache_prefix()
+    convo.assistant("a" * 50).user("question")
+
+    _, req_log = await llm(convo)
+
+    sent = llm._make_request.await_args.args[0]
+    assert sent.token_count <= 60
+    assert [msg.content for msg in sent.messages] == ["system", "context", "question"]
+    assert req_log.messages == [msg.to_dict() for msg in sent.messages]
+    assert len(convo.messages) == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("model", "native_schema"),
+    [("gpt-4o-2024-08-06", True), ("gpt-4o-2024-05-13", False), ("gpt-4", False)],
+)
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_openai_structured_output(mock_AsyncOpenAI, model, native_schema):
+    class Steps(BaseModel):
+        steps: list[int]
+
+    def make_stream(*contents):
+        async def stream():
+            for content in contents:
+                yield MagicMock(
+                    choices=[MagicMock(delta=MagicMock(content=content))],
+                    usage=MagicMock(prompt_tokens=1, completion_tokens=1),
+                )
+
+        return stream()
+
+    create = AsyncMock(side_effect=[make_stream('{"steps": "none"}'), make_stream('{"steps": [1, 2]}')])
+    mock_AsyncOpenAI.return_value.chat.completions.create = create
+    llm = OpenAIClient(LLMConfig(model=model))
+    convo = Convo("system").user("hi")
+    convo.user("Respond with JSON matching this schema").mark_schema_hint()
+
+    response, req_log = await llm(convo, parser=JSONParser(Steps))
+
+    assert response.steps == [1, 2]
+    assert req_log.parse_retries == 1
+    kwargs = create.await_args_list[0].kwargs
+    if native_schema:
+        assert kwargs["response_format"]["json_schema"]["schema"] == Steps.model_json_schema()
+        assert len(kwargs["messages"]) == 2
+    else:
+        assert "response_format" not in kwargs
+        assert len(kwargs["messages"]) == 3
@@ -1,10 +1,20 @@
+import json
 from enum import Enum
 from typing import Tuple
 
 import pytest
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, ConfigDict, field_validator
 
-from core.llm.parser import CodeBlockParser, EnumParser, JSONParser, MultiCodeBlockParser, OptionalCodeBlockParser
+from core.llm.parser import (
+    CodeBlockParser,
+    EnumParser,
+    IncrementalJSONParser,
+    JSONParser,
+    MultiCodeBlockParser,
+    OptionalCodeBlockParser,
+    StreamValidationError,
+    repair_json,
+)
 
 
 @pytest.mark.parametrize(
@@ -204,3 +214,132 @@ def test_enum_parser(input, expected):
 def test_optional_block_parser(input, expected):
     parser = OptionalCodeBlockParser()
     assert parser(input) == expected
+
+
+class Item(BaseModel):
+    name: str
+    size: int
+
+
+class ItemList(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    title: str
+    items: list[Item]
+
+
+def feed_chunks(parser, text, chunk_size=3):
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i : i + chunk_size])
+
+
+def test_incremental_json_parser_yields_list_items():
+    received = []
+    parser = IncrementalJSONParser(ItemList, on_item=lambda field, item: received.append((field, item)))
+    text = '```json\n{"title": "a \\"quoted\\" [title]", "items": [{"name": "x,]", "size": 1}, {"name": "y", "size": 2}]}\n```'
+
+    first_item_end = text.index("}, ") + 3
+    feed_chunks(parser, text[:first_item_end])
+    assert received == [("items", Item(name="x,]", size=1))]
+
+    feed_chunks(parser, text[first_item_end:])
+    assert [item for _, item in received] == [Item(name="x,]", size=1), Item(name="y", size=2)]
+    assert parser.done
+    assert JSONParser(ItemList)(parser.text).items == parser.items["items"]
+
+
+@pytest.mark.parametrize(
+    ("text", "error"),
+    [
+        ("Sure, here is the JSON:\n{", "Expected a JSON value"),
+        ("[1, 2", "Expected a JSON object"),
+        ('{"title": "x", "extra": ', "Unexpected field `extra`"),
+        ('{"title": "x", "items": [{"name": "a", "size": "big"},', "Invalid element in `items`"),
+    ],
+)
+def test_incremental_json_parser_aborts_early(text, error):
+    parser = IncrementalJSONParser(ItemList)
+    with pytest.raises(StreamValidationError, match=error):
+        feed_chunks(parser, text)
+
+
+def test_incremental_json_parser_waits_for_fence():
+    parser = IncrementalJSONParser(ItemList)
+    parser.feed("``")
+    parser.feed("`js")
+    assert not parser.started
+    parser.feed('on\n{"title"')
+    assert parser.started
+
+
+def test_json_parser_stream():
+    assert JSONParser(strict=False).stream() is None
+    assert isinstance(JSONParser(ItemList).stream(), IncrementalJSONParser)
+
+
+def test_incremental_json_parser_skips_preamble():
+    parser = IncrementalJSONParser(ItemList, allow_preamble=True)
+    feed_chunks(parser, 'Sure, here is the JSON:\n```json\n{"title": "x", "items": []}\n```')
+    assert parser.done
+
+    parser = IncrementalJSONParser(ItemList, allow_preamble=True)
+    with pytest.raises(StreamValidationError, match="Expected a JSON value"):
+        feed_chunks(parser, "I can't help with that. " * 20)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"a": [1, 2,], "b": {"c": 1,},}', {"a": [1, 2], "b": {"c": 1}}),
+        ('Here is the JSON:\n{"a": 1}\nLet me know if you need anything else.', {"a": 1}),
+        ('Here is the JSON:\n```json\n{"a": 1}\n```', {"a": 1}),
+        ('```json\n{"a": "```py\\nx\\n```"}\n```', {"a": "```py\nx\n```"}),
+        ('```json\n{"a": 1}', {"a": 1}),
+        ('{"a": [1, 2', {"a": [1, 2]}),
+        ('{"a": {"b": "trunc', {"a": {"b": "trunc"}}),
+        ('{"a": 1, "b":', {"a": 1, "b": None}),
+        ("no json here", None),
+        ('{"a": 1]', None),
+    ],
+)
+def test_repair_json(text, expected):
+    repaired = repair_json(text)
+    if expected is None:
+        assert repaired is None
+    else:
+        assert json.loads(repaired) == expected
+
+
+def test_json_parser_repair():
+    parser = JSONParser(ItemList)
+    text = 'Here you go:\n```json\n{"title": "x", "items": [{"name": "a", "size": 1},]}\n```'
+    with pytest.raises(ValueError):
+        parser(text)
+    assert parser.repair(text).items == [Item(name="a", size=1)]
+
+    with pytest.raises(ValueError):
+        parser.repair("no json here")
+
+
+def test_code_block_parser_repair():
+    parser = CodeBlockParser()
+    text = "```md\n# Readme\n```sh\nls\n```\nDone\n```"
+    with pytest.raises(ValueError):
+        parser(text)
+    assert parser.repair(text) == "# Readme\n```sh\nls\n```\nDone"
+    assert parser.repair("```py\nprint(1)") == "print(1)"
+
+
+def test_parse_json_reuses_extended_model():
+    class TestModel(BaseModel):
+        name: str
+        tags: list[str] = []
+
+    parser = JSONParser(spec=TestModel)
+    first = parser('{"name": "a"}')
+    second = JSONParser(spec=TestModel)('{"name": "b", "tags": ["x"]}')
+
+    assert type(first) is type(second)
+    assert type(first).__name__ == "ExtendedTestModel"
+    assert first.model_dump() == {"original_response": '{"name": "a"}', "name": "a", "tags": []}
+    assert second.model_dump() == {"original_response": '{"name": "b", "tags": ["x"]}', "name": "b", "tags": ["x"]}
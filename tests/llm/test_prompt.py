@@ -1,7 +1,16 @@
+from unittest.mock import patch
+
 import pytest
-from jinja2 import UndefinedError
+from jinja2 import FileSystemBytecodeCache, UndefinedError
 
-from core.llm.prompt import FormatTemplate, JinjaFileTemplate, JinjaStringTemplate
+from core.config import Config
+from core.llm.prompt import (
+    FormatTemplate,
+    JinjaFileTemplate,
+    JinjaStringTemplate,
+    PartialCache,
+    get_bytecode_cache,
+)
 
 
 def test_format_template():
@@ -57,3 +66,76 @@ def test_jinja_file_template():
 def test_jinja_file_template_nonexistent_directory():
     with pytest.raises(ValueError):
         JinjaFileTemplate(["nonexistent"])
+
+
+def test_jinja_file_template_uses_bytecode_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    template = JinjaFileTemplate(["tests/llm/prompts"], FileSystemBytecodeCache(str(cache_dir)))
+    assert template("test.txt", name="world", age=1) == "hello world,\nyou are 1 bn years old\n"
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # A new process (environment) loads the compiled template instead of compiling it again
+    template = JinjaFileTemplate(["tests/llm/prompts"], FileSystemBytecodeCache(str(cache_dir)))
+    with patch.object(template.env, "compile", side_effect=AssertionError("compiled again")):
+        assert template("test.txt", name="world", age=1) == "hello world,\nyou are 1 bn years old\n"
+
+
+def test_jinja_file_template_warm_up():
+    template = JinjaFileTemplate(["tests/llm/prompts"])
+    assert template.warm_up() == 1
+
+    with patch.object(template.env, "compile", side_effect=AssertionError("compiled again")):
+        template("test.txt", name="world", age=1)
+
+
+@patch("core.llm.prompt.get_config")
+def test_get_bytecode_cache(mock_get_config, tmp_path):
+    config = Config()
+    mock_get_config.return_value = config
+
+    config.prompt.cache_dir = str(tmp_path / "cache")
+    cache = get_bytecode_cache()
+    assert isinstance(cache, FileSystemBytecodeCache)
+    assert cache.directory == config.prompt.cache_dir
+    assert get_bytecode_cache() is cache
+
+    config.prompt.bytecode_cache = False
+    assert get_bytecode_cache() is None
+
+
+def test_partial_cache_reuses_rendered_partial(tmp_path):
+    (tmp_path / "partial.txt").write_text("{% for item in items %}{{ item }},{% endfor %}")
+    (tmp_path / "a.txt").write_text("A: {% include 'partial.txt' %}")
+    (tmp_path / "b.txt").write_text("B: {% include 'partial.txt' %}")
+
+    cache = PartialCache()
+    cache.register("partial.txt", lambda context: tuple(context.get("items")))
+    template = JinjaFileTemplate([str(tmp_path)], partial_cache=cache)
+
+    assert template("a.txt", items=[1, 2]) == "A: 1,2,"
+    assert template("b.txt", items=[1, 2]) == "B: 1,2,"
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    # A different fingerprint renders the partial again
+    assert template("a.txt", items=[3]) == "A: 3,"
+    assert (cache.misses, cache.hits) == (2, 1)
+
+
+def test_partial_cache_is_bounded():
+    cache = PartialCache(max_size=2)
+    cache.register("partial", lambda context: context["n"])
+
+    for n in range(3):
+        assert "".join(cache.render("partial", lambda context: iter([str(context["n"])]), {"n": n})) == str(n)
+
+    assert list(cache.rendered) == [("partial", 1), ("partial", 2)]
+
+
+def test_partial_cache_renders_uncached_without_fingerprint():
+    cache = PartialCache()
+    cache.register("partial", lambda context: context["missing"])
+
+    assert "".join(cache.render("partial", lambda context: iter(["a", "b"]), {})) == "ab"
+    assert cache.rendered == {}
@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from core.config import LLMConfig
+from core.llm.convo import Convo
+from core.llm.openai_client import OpenAIClient
+from core.llm.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket()
+    bucket.consume(1000)
+    assert bucket.wait_time(1000) == 0
+
+
+@patch("core.llm.rate_limiter.monotonic")
+def test_token_bucket_refill(mock_monotonic):
+    mock_monotonic.return_value = 0
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1)
+
+    mock_monotonic.return_value = 30
+    assert bucket.wait_time(30) == 0
+    assert bucket.wait_time(40) == pytest.approx(10)
+    # Requests bigger than the bucket wait only until it's full
+    assert bucket.wait_time(1000) == pytest.approx(30)
+
+
+@patch("core.llm.rate_limiter.monotonic")
+def test_update_from_openai_headers(mock_monotonic):
+    mock_monotonic.return_value = 0
+    limiter = RateLimiter()
+    limiter.update_from_headers(
+        {
+            "x-ratelimit-limit-requests": "60",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-limit-tokens": "1000",
+            "x-ratelimit-remaining-tokens": "500",
+        }
+    )
+    assert limiter.requests.capacity == 60
+    assert limiter.requests.wait_time(1) == pytest.approx(1)
+    assert limiter.tokens.capacity == 1000
+    assert limiter.tokens.level == 500
+
+
+def test_update_from_anthropic_headers():
+    limiter = RateLimiter()
+    limiter.update_from_headers(
+        {
+            "anthropic-ratelimit-requests-limit": "50",
+            "anthropic-ratelimit-requests-remaining": "49",
+            "anthropic-ratelimit-tokens-limit": "40000",
+            "anthropic-ratelimit-tokens-remaining": "39000",
+        }
+    )
+    assert limiter.requests.capacity == 50
+    assert limiter.tokens.capacity == 40000
+
+
+@pytest.mark.asyncio
+async def test_max_concurrent_requests():
+    limiter = RateLimiter(max_concurrent=2)
+    running = 0
+    max_running = 0
+
+    async def request():
+        nonlocal running, max_running
+        async with limiter.limit(10):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[request() for _ in range(6)])
+    assert max_running == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_pause_delays_requests():
+    limiter = RateLimiter()
+    limiter.pause(datetime.timedelta(seconds=0.05))
+    waited = await limiter.acquire(1)
+    limiter.release()
+    assert waited >= 0.04
+
+
+def test_get_rate_limiter_shared_per_model():
+    a = get_rate_limiter(LLMConfig(model="gpt-4"))
+    b = get_rate_limiter(LLMConfig(model="gpt-4"))
+    c = get_rate_limiter(LLMConfig(model="gpt-4o"))
+    assert a is b
+    assert a is not c
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_retries_after_rate_limit(mock_AsyncOpenAI):
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    rate_limit_error = Exception("Too many requests")
+    rate_limit_error.response = MagicMock(status_code=429, headers={})
+
+    llm._make_request = AsyncMock(side_effect=[rate_limit_error, ("hello", 1, 1)])
+    llm.rate_limit_sleep = MagicMock(return_value=datetime.timedelta(seconds=0.01))
+
+    response, _ = await llm(Convo().user("hi"))
+    assert response == "hello"
+    assert llm._make_request.await_count == 2
+    llm.rate_limit_sleep.assert_called_once_with(rate_limit_error)
@@ -0,0 +1,185 @@
+import json
+from unittest.mock import AsyncMock, call, patch
+
+import pytest
+from pydantic import BaseModel
+
+from core.config import LLMConfig, LLMReplayConfig
+from core.db.models import Branch, LLMRequest, Project, ProjectState
+from core.llm.base import BaseLLMClient
+from core.llm.convo import Convo
+from core.llm.parser import JSONParser
+from core.llm.replay import RecordedResponse, ReplayClient, ReplayMissError, ReplayStore, get_replay_store
+
+
+def write_jsonl(path, rows):
+    path.write_text("\n".join(json.dumps(row) for row in rows), encoding="utf-8")
+
+
+def test_store_serves_recorded_responses_in_order():
+    store = ReplayStore()
+    messages = [{"role": "system", "content": "system"}, {"role": "user", "content": "user"}]
+    store.add(messages, RecordedResponse("first"))
+    store.add(messages, RecordedResponse("second"))
+
+    convo = Convo("system").user("user")
+    assert store.lookup(convo).response == "first"
+    assert store.lookup(convo).response == "second"
+    assert store.lookup(convo).response == "second"
+    assert store.lookup(Convo("system").user("other")) is None
+    assert (store.hits, store.misses) == (3, 1)
+
+
+def test_store_loads_jsonl(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    write_jsonl(
+        path,
+        [
+            {
+                "messages": [{"role": "user", "content": "hi"}],
+                "response": "hello",
+                "prompt_tokens": 3,
+                "completion_tokens": 1,
+                "duration": 0.5,
+                "status": "success",
+            },
+            {"messages": [{"role": "user", "content": "bye"}], "response": None, "status": "error"},
+        ],
+    )
+    store = ReplayStore()
+    store.load_jsonl(str(path))
+
+    recorded = store.lookup(Convo().user("hi"))
+    assert recorded == RecordedResponse("hello", 3, 1, 0.5)
+    assert store.lookup(Convo().user("bye")) is None
+
+
+@pytest.mark.asyncio
+async def test_store_loads_db(tmp_path):
+    from core.config import DBConfig
+    from core.db.models import Base
+    from core.db.session import SessionManager
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'recorded.db'}"
+    manager = SessionManager(DBConfig(url=url))
+    async with manager.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with manager as db:
+        project = Project(name="test")
+        branch = Branch(project=project)
+        state = ProjectState.create_initial_state(branch)
+        db.add_all([project, branch, state])
+        db.add(
+            LLMRequest(
+                branch=branch,
+                project_state=state,
+                provider="openai",
+                model="gpt-4",
+                temperature=0.5,
+                messages=[{"role": "user", "content": "hi"}],
+                response="hello",
+                prompt_tokens=3,
+                completion_tokens=1,
+                duration=0.5,
+                status="success",
+                parse_failures=[{"messages": [{"role": "user", "content": "hey"}], "response": "invalid"}],
+            )
+        )
+        await db.commit()
+    await manager.engine.dispose()
+
+    store = ReplayStore(url)
+    await store.load()
+    assert store.lookup(Convo().user("hi")).response == "hello"
+    assert store.lookup(Convo().user("hey")).response == "invalid"
+
+
+@pytest.mark.asyncio
+async def test_replay_client(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    write_jsonl(path, [{"messages": [{"role": "user", "content": "hi"}], "response": "hello", "duration": 2}])
+
+    stream_handler = AsyncMock()
+    llm = ReplayClient(
+        LLMConfig(model="gpt-4"),
+        store=ReplayStore(str(path)),
+        simulate_latency=True,
+        stream_handler=stream_handler,
+    )
+    with patch("core.llm.replay.asyncio.sleep") as mock_sleep:
+        response, req_log = await llm(Convo().user("hi"))
+
+    assert response == "hello"
+    assert req_log.response == "hello"
+    mock_sleep.assert_awaited_once_with(2)
+    stream_handler.assert_has_awaits([call("hello"), call(None)])
+
+
+@pytest.mark.asyncio
+async def test_replay_client_no_match():
+    store = ReplayStore()
+    error_handler = AsyncMock(return_value=True)
+    llm = ReplayClient(LLMConfig(model="gpt-4"), store=store, error_handler=error_handler)
+
+    with pytest.raises(ReplayMissError, match="No recorded LLM response"):
+        await llm(Convo().user("hi"), max_retries=1)
+    # Not retried, and the user isn't asked to retry
+    assert store.misses == 1
+    error_handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_replays_parse_retries(tmp_path):
+    class Answer(BaseModel):
+        answer: str
+
+    class ScriptedClient(BaseLLMClient):
+        responses = ["not json", '{"answer": "42"}']
+
+        async def _make_request(self, convo, temperature=None, json_mode=False):
+            return self.responses.pop(0), 10, 1
+
+    _, request_log = await ScriptedClient(LLMConfig(model="gpt-4"))(Convo().user("hi"), parser=JSONParser(Answer))
+    assert request_log.parse_retries == 1
+
+    path = tmp_path / "requests.jsonl"
+    row = {"messages": request_log.messages, "response": request_log.response}
+    write_jsonl(path, [{**row, "parse_failures": request_log.parse_failures}])
+    store = ReplayStore(str(path))
+    llm = ReplayClient(LLMConfig(model="gpt-4"), store=store)
+
+    response, _ = await llm(Convo().user("hi"), parser=JSONParser(Answer))
+    assert response.answer == "42"
+    assert (store.hits, store.misses) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_replays_native_schema_recording(tmp_path):
+    class Answer(BaseModel):
+        answer: str
+
+    class NativeSchemaClient(BaseLLMClient):
+        native_schema = True
+
+        async def _make_request(self, convo, temperature=None, json_mode=False):
+            return '{"answer": "42"}', 10, 1
+
+    convo = Convo().user("hi").user("Respond with JSON").mark_schema_hint()
+    _, request_log = await NativeSchemaClient(LLMConfig(model="gpt-4o"))(convo, parser=JSONParser(Answer))
+    assert request_log.messages == [{"role": "user", "content": "hi"}]
+
+    path = tmp_path / "requests.jsonl"
+    write_jsonl(path, [{"messages": request_log.messages, "response": request_log.response}])
+    store = ReplayStore(str(path))
+    llm = ReplayClient(LLMConfig(model="gpt-4o"), store=store)
+
+    response, _ = await llm(convo, parser=JSONParser(Answer))
+    assert response.answer == "42"
+    assert (store.hits, store.misses) == (1, 0)
+
+
+def test_get_replay_store():
+    assert get_replay_store(LLMReplayConfig()) is None
+    store = get_replay_store(LLMReplayConfig(source="requests.jsonl"))
+    assert store is get_replay_store(LLMReplayConfig(source="requests.jsonl"))
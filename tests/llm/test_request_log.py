@@ -0,0 +1,50 @@
+from hashlib import sha1
+from unittest.mock import patch
+
+from core.config import LLMProvider
+from core.llm.request_log import LLMRequestLog, PromptLogEntry
+
+
+class Unserializable:
+    def __str__(self):
+        return "<unserializable>"
+
+
+def test_prompt_log_entry_serializes_context():
+    entry = PromptLogEntry("dev/breakdown", {"task": {"description": "do it"}, "obj": Unserializable()})
+
+    assert entry.to_dict() == {
+        "template": "dev/breakdown",
+        "context": {"task": {"description": "do it"}, "obj": "<unserializable>"},
+    }
+    # Serialized only once
+    assert entry.to_dict() is entry.to_dict()
+
+
+def test_prompt_log_entry_references_large_values():
+    content = "x" * 5000
+    entry = PromptLogEntry("dev/breakdown", {"content": content, "lines": ["y" * 100] * 50})
+
+    context = entry.to_dict()["context"]
+    assert context["content"] == {"sha1": sha1(content.encode("utf-8")).hexdigest(), "size": 5000}
+    assert context["lines"]["size"] > 5000
+
+
+@patch("core.llm.request_log.MAX_PROMPT_CONTEXT_SIZE", 100)
+def test_prompt_log_entry_context_size_is_capped():
+    entry = PromptLogEntry("dev/breakdown", {"first": "a" * 60, "second": "b" * 60, "third": "c"})
+
+    context = entry.to_dict()["context"]
+    assert context["first"] == "a" * 60
+    assert context["second"]["size"] == 62
+    assert context["third"] == "c"
+
+
+def test_serialized_prompts():
+    request_log = LLMRequestLog(
+        provider=LLMProvider.OPENAI,
+        model="gpt-4o",
+        temperature=0,
+        prompts=[PromptLogEntry("dev/breakdown", {"a": 1})],
+    )
+    assert request_log.serialized_prompts() == [{"template": "dev/breakdown", "context": {"a": 1}}]
@@ -0,0 +1,206 @@
+import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from pydantic import BaseModel
+
+from core.config import LLMConfig
+from core.llm.base import APIError, ParseError
+from core.llm.convo import Convo
+from core.llm.openai_client import OpenAIClient
+from core.llm.parser import JSONParser
+from core.llm.request_log import LLMRequestStatus
+from core.llm.retry import CircuitBreaker, RetryBudget, RetryPolicy, retry_after
+
+
+def test_retry_policy_full_jitter():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    with patch("core.llm.retry.random.uniform", side_effect=lambda a, b: b) as mock_uniform:
+        assert policy.delay(0) == 1
+        assert policy.delay(2) == 4
+        assert policy.delay(10) == 5
+        assert policy.delay(0, datetime.timedelta(seconds=3)) == 3
+    assert mock_uniform.call_count == 4
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected"),
+    [
+        ({}, None),
+        ({"retry-after": "3"}, 3),
+        ({"retry-after-ms": "1500"}, 1.5),
+        ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0),
+        ({"retry-after": "soon"}, None),
+    ],
+)
+def test_retry_after(headers, expected):
+    err = MagicMock(response=MagicMock(headers=headers))
+    delay = retry_after(err)
+    if expected is None:
+        assert delay is None
+    else:
+        assert delay.total_seconds() == expected
+
+
+def test_retry_budget():
+    budget = RetryBudget(2)
+    assert budget.spend()
+    assert budget.spend()
+    assert not budget.spend()
+    assert RetryBudget().spend()
+
+
+@patch("core.llm.retry.monotonic")
+def test_circuit_breaker(mock_monotonic):
+    mock_monotonic.return_value = 0
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+
+    mock_monotonic.return_value = 11
+    assert not breaker.is_open  # half-open, one trial request allowed
+    breaker.record_failure()
+    assert breaker.is_open
+
+    breaker.record_success()
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+@patch("core.llm.base.asyncio.sleep")
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_backs_off_between_retries(mock_AsyncOpenAI, mock_sleep):
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    error = httpx.ConnectError("connection refused")
+    llm._make_request = AsyncMock(side_effect=[error, error, ("hello", 1, 1)])
+    llm.retry_policy = MagicMock(delay=MagicMock(side_effect=[0.1, 0.2]))
+
+    response, _ = await llm(Convo().user("hi"))
+
+    assert response == "hello"
+    assert llm.retry_policy.delay.call_args_list[0].args == (0, None)
+    assert llm.retry_policy.delay.call_args_list[1].args == (1, None)
+    assert [c.args[0] for c in mock_sleep.await_args_list] == [0.1, 0.2]
+
+
+@pytest.mark.asyncio
+@patch("core.llm.base.asyncio.sleep")
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_max_retries_counts_retries_after_first_attempt(mock_AsyncOpenAI, mock_sleep):
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    error = httpx.ConnectError("connection refused")
+    llm._make_request = AsyncMock(side_effect=error)
+    llm.error_handler = AsyncMock(return_value=False)
+    # Don't open the provider's shared circuit breaker for other tests
+    llm.circuit_breaker = CircuitBreaker(failure_threshold=10)
+
+    with pytest.raises(APIError, match="connection refused"):
+        await llm(Convo().user("hi"), max_retries=0)
+    assert llm._make_request.await_count == 1
+    llm.error_handler.assert_awaited_once()
+    mock_sleep.assert_not_awaited()
+
+    llm._make_request.reset_mock()
+    with pytest.raises(APIError):
+        await llm(Convo().user("hi"))
+    assert llm._make_request.await_count == 4
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_does_not_retry_client_errors(mock_AsyncOpenAI):
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    request = httpx.Request("POST", "https://example.com")
+    error = httpx.HTTPStatusError("bad request", request=request, response=httpx.Response(400, request=request))
+    llm._make_request = AsyncMock(side_effect=[error])
+
+    with pytest.raises(APIError, match="bad request"):
+        await llm(Convo().user("hi"))
+    assert llm._make_request.await_count == 1
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_fails_fast_with_open_circuit(mock_AsyncOpenAI):
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    llm.circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    llm.circuit_breaker.record_failure()
+    llm._make_request = AsyncMock()
+
+    error_handler = AsyncMock(return_value=False)
+    llm.error_handler = error_handler
+    with pytest.raises(APIError):
+        await llm(Convo().user("hi"))
+
+    llm._make_request.assert_not_awaited()
+    error_handler.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_aborts_invalid_streamed_response(mock_AsyncOpenAI):
+    class Steps(BaseModel):
+        steps: list[int]
+
+    def make_stream(*chunks):
+        async def stream():
+            for content in chunks:
+                yield MagicMock(
+                    choices=[MagicMock(delta=MagicMock(content=content))],
+                    usage=MagicMock(prompt_tokens=1, completion_tokens=1),
+                )
+
+        return stream()
+
+    streamed = []
+    invalid = make_stream('{"steps": [1, ', '"two", ', "3]}")
+    valid = make_stream('{"steps": [1, 2]}')
+    llm = OpenAIClient(LLMConfig(model="gpt-4"), stream_handler=AsyncMock(side_effect=streamed.append))
+    llm.client.chat.completions.create = AsyncMock(side_effect=[invalid, valid])
+
+    response, req_log = await llm(Convo().user("hi"), parser=JSONParser(Steps))
+
+    assert response.steps == [1, 2]
+    # The invalid chunk isn't shown and the rest of the response is never read
+    assert streamed == ['{"steps": [1, ', '{"steps": [1, 2]}']
+    assert req_log.messages[-2] == {"role": "assistant", "content": '{"steps": [1, "two",'}
+    assert "Invalid element in `steps`" in req_log.messages[-1]["content"]
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_repairs_response_before_retrying(mock_AsyncOpenAI):
+    class Steps(BaseModel):
+        steps: list[int]
+
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    llm._make_request = AsyncMock(side_effect=[('Here are the steps:\n{"steps": [1, 2,]}', 1, 1)])
+
+    response, req_log = await llm(Convo().user("hi"), parser=JSONParser(Steps))
+
+    assert response.steps == [1, 2]
+    assert llm._make_request.await_count == 1
+    assert req_log.repairs == 1
+    assert req_log.parse_retries == 0
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_client_gives_up_after_max_parse_retries(mock_AsyncOpenAI):
+    class Steps(BaseModel):
+        steps: list[int]
+
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    llm._make_request = AsyncMock(side_effect=[("no steps", 1, 1), ("still none", 1, 1)])
+
+    with pytest.raises(ParseError) as exc_info:
+        await llm(Convo().user("hi"), parser=JSONParser(Steps), max_parse_retries=1)
+
+    req_log = exc_info.value.request_log
+    assert llm._make_request.await_count == 2
+    assert req_log.parse_retries == 1
+    assert req_log.status == LLMRequestStatus.ERROR
+    assert req_log.response == "still none"
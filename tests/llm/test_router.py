@@ -0,0 +1,86 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from core.config import LLMConfig, LLMProvider, LLMRouteConfig
+from core.llm.base import ParseError
+from core.llm.convo import Convo
+from core.llm.request_log import LLMRequestLog, LLMRequestStatus
+from core.llm.router import RoutedClient
+
+
+def make_client(model, response=None, error=None):
+    """Create a fake LLM client answering with `response` (or raising `error`)."""
+
+    async def call(convo, **kwargs):
+        if error:
+            raise error
+        return response, LLMRequestLog(provider=LLMProvider.OPENAI, model=model, temperature=0)
+
+    return AsyncMock(side_effect=call, config=LLMConfig(model=model))
+
+
+def route(model, **kwargs):
+    return LLMRouteConfig(provider="openai", model=model, **kwargs)
+
+
+def test_candidates_match_prompt_and_output_size():
+    tiny = route("tiny", max_prompt_tokens=100, max_output_tokens=10)
+    small = route("small", max_prompt_tokens=1000)
+    client = RoutedClient(MagicMock(), [(tiny, MagicMock()), (small, MagicMock())])
+
+    assert [r.model for r, _ in client.candidates(50, 5)] == ["tiny", "small"]
+    # Routes with an output limit need to know the expected response size
+    assert [r.model for r, _ in client.candidates(50, None)] == ["small"]
+    assert [r.model for r, _ in client.candidates(50, 50)] == ["small"]
+    assert [r.model for r, _ in client.candidates(500, 5)] == ["small"]
+    assert client.candidates(5000, 5) == []
+
+
+@pytest.mark.asyncio
+async def test_small_request_is_routed():
+    default = make_client("large", "large answer")
+    small = make_client("small", "small answer")
+    client = RoutedClient(default, [(route("small", max_prompt_tokens=1000), small)])
+
+    response, req_log = await client(Convo("system").user("hi"), temperature=0)
+
+    assert response == "small answer"
+    assert req_log.model == "small"
+    assert req_log.route == "routed"
+    small.assert_awaited_once()
+    assert small.await_args.kwargs == {"temperature": 0, "max_parse_retries": 0}
+    default.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_large_request_goes_to_default_model():
+    default = make_client("large", "large answer")
+    small = make_client("small", "small answer")
+    client = RoutedClient(default, [(route("small", max_prompt_tokens=10), small)])
+
+    response, req_log = await client(Convo("system").user("hello " * 100))
+
+    assert response == "large answer"
+    assert req_log.route == "default"
+    small.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_parse_failure_escalates_to_larger_model():
+    failed_log = LLMRequestLog(
+        provider=LLMProvider.OPENAI, model="small", temperature=0, status=LLMRequestStatus.ERROR
+    )
+    default = make_client("large", "large answer")
+    small = make_client("small", error=ParseError("Error parsing response", failed_log))
+    client = RoutedClient(default, [(route("small", max_prompt_tokens=1000, max_parse_retries=1), small)])
+
+    response, req_log = await client(Convo("system").user("hi"), expected_output_tokens=10)
+
+    assert response == "large answer"
+    assert req_log.model == "large"
+    assert req_log.route == "escalated"
+    assert req_log.escalated == [failed_log]
+    assert small.await_args.kwargs == {"max_parse_retries": 1}
+    # The agent's own model gets the usual parse retries
+    assert default.await_args.kwargs == {}
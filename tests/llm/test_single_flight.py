@@ -0,0 +1,225 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pydantic import BaseModel
+
+from core.config import LLMConfig
+from core.llm.convo import Convo
+from core.llm.openai_client import OpenAIClient
+from core.llm.parser import JSONParser, StreamValidationError
+from core.llm.single_flight import SingleFlight, get_single_flight, publish_chunk
+
+
+@pytest.mark.asyncio
+async def test_coalesces_concurrent_calls():
+    group = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    tasks = [asyncio.create_task(group.do("key", fn)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [("result", False), ("result", True), ("result", True)]
+    assert calls == 1
+    assert group.stats() == {"calls": 1, "coalesced": 2, "coalesced_rate": 2 / 3}
+    assert group.flights == {}
+
+
+@pytest.mark.asyncio
+async def test_fans_out_stream_to_followers():
+    group = SingleFlight()
+    release = asyncio.Event()
+    follower_handler = AsyncMock()
+
+    async def fn():
+        publish_chunk("hello ")
+        await release.wait()
+        publish_chunk("world")
+        return "hello world"
+
+    leader = asyncio.create_task(group.do("key", fn))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(group.do("key", fn, follower_handler))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(leader, follower)
+
+    # Chunks go through a stream buffer, so they may be merged
+    assert "".join(c.args[0] for c in follower_handler.await_args_list) == "hello world"
+
+
+@pytest.mark.asyncio
+async def test_slow_follower_does_not_block_leader():
+    group = SingleFlight()
+    release_follower = asyncio.Event()
+    follower_chunks = []
+
+    async def slow_handler(content):
+        await release_follower.wait()
+        follower_chunks.append(content)
+
+    async def fn():
+        for chunk in ["a", "b", "c"]:
+            publish_chunk(chunk)
+            await asyncio.sleep(0)
+        return "abc"
+
+    async def lead():
+        # Give the follower time to join before the call starts streaming
+        await asyncio.sleep(0.01)
+        return await fn()
+
+    leader = asyncio.create_task(group.do("key", lead))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(group.do("key", fn, slow_handler))
+    assert await asyncio.wait_for(leader, 1) == ("abc", False)
+    assert not follower.done()
+
+    release_follower.set()
+    assert await follower == ("abc", True)
+    assert "".join(follower_chunks) == "abc"
+
+
+@pytest.mark.asyncio
+async def test_shares_errors():
+    group = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(group.do("key", fn), group.do("key", fn), return_exceptions=True)
+    assert [str(r) for r in results] == ["boom", "boom"]
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_cancelled_call():
+    group = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "result"
+
+    leader = asyncio.create_task(group.do("key", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(group.do("key", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == ("result", False)
+    assert group.stats()["calls"] == 2
+    assert group.stats()["coalesced"] == 0
+
+
+@pytest.mark.asyncio
+async def test_follower_ends_partial_response_before_retrying():
+    group = SingleFlight()
+    follower_chunks = []
+
+    async def handler(content):
+        follower_chunks.append(content)
+
+    async def aborted():
+        publish_chunk("partial")
+        await asyncio.sleep(0.01)
+        raise StreamValidationError("invalid")
+
+    async def retried():
+        publish_chunk("full")
+        publish_chunk(None)
+        return "full"
+
+    leader = asyncio.create_task(group.do("key", aborted))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(group.do("key", retried, handler))
+
+    with pytest.raises(StreamValidationError):
+        await leader
+    assert await follower == ("full", False)
+    # The follower's own retry streams through its leader path, not the flight
+    assert follower_chunks == ["partial", None]
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_clients_share_identical_requests(mock_AsyncOpenAI):
+    release = asyncio.Event()
+
+    async def response_generator():
+        yield MagicMock(choices=[MagicMock(delta=MagicMock(content="hello"))])
+        await release.wait()
+        yield MagicMock(choices=[], usage=MagicMock(prompt_tokens=10, completion_tokens=1))
+
+    create = AsyncMock(side_effect=lambda **kwargs: response_generator())
+    mock_AsyncOpenAI.return_value.chat.completions.create = create
+
+    handlers = [AsyncMock(), AsyncMock()]
+    clients = [OpenAIClient(LLMConfig(model="gpt-4"), stream_handler=handler) for handler in handlers]
+    tasks = [asyncio.create_task(llm(Convo("system").user("describe file"), temperature=0)) for llm in clients]
+    await asyncio.sleep(0.01)
+    release.set()
+    (response1, log1), (response2, log2) = await asyncio.gather(*tasks)
+
+    assert create.await_count == 1
+    assert response1 == response2 == "hello"
+    assert (log1.coalesced, log1.prompt_tokens) == (False, 10)
+    assert (log2.coalesced, log2.prompt_tokens) == (True, 0)
+    for handler in handlers:
+        handler.assert_awaited_with("hello")
+    assert get_single_flight().stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+@patch("core.llm.openai_client.AsyncOpenAI")
+async def test_clients_dont_share_sampled_requests(mock_AsyncOpenAI):
+    release = asyncio.Event()
+
+    async def response_generator():
+        yield MagicMock(choices=[MagicMock(delta=MagicMock(content="hello"))])
+        await release.wait()
+        yield MagicMock(choices=[], usage=MagicMock(prompt_tokens=10, completion_tokens=1))
+
+    create = AsyncMock(side_effect=lambda **kwargs: response_generator())
+    mock_AsyncOpenAI.return_value.chat.completions.create = create
+
+    clients = [OpenAIClient(LLMConfig(model="gpt-4", temperature=0.7)) for _ in range(2)]
+    tasks = [asyncio.create_task(llm(Convo("system").user("describe file"))) for llm in clients]
+    await asyncio.sleep(0.01)
+    release.set()
+    (_, log1), (_, log2) = await asyncio.gather(*tasks)
+
+    assert create.await_count == 2
+    assert not log1.coalesced and not log2.coalesced
+    assert get_single_flight().stats()["coalesced"] == 0
+
+
+@patch("core.llm.openai_client.AsyncOpenAI")
+def test_flight_key_includes_parser(mock_AsyncOpenAI):
+    class Answer(BaseModel):
+        answer: str
+
+    llm = OpenAIClient(LLMConfig(model="gpt-4"))
+    convo = Convo("system").user("question")
+
+    def key(parser=None, response_model=None):
+        return llm._flight_key(convo, 0, True, parser, response_model)
+
+    assert key() == key(MagicMock())
+    assert key(JSONParser(Answer)) == key(JSONParser(Answer))
+    assert key(JSONParser(Answer)) != key()
+    assert key(JSONParser(Answer)) != key(JSONParser())
+    assert key(JSONParser(Answer)) != key(JSONParser(Answer), Answer)
+    assert key(None, Answer) != key(None, Convo)
+    # Parsers reporting streamed items don't share their stream
+    on_item = MagicMock()
+    assert key(JSONParser(Answer, on_item=on_item)) != key(JSONParser(Answer, on_item=on_item))
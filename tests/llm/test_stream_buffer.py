@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from core.llm.stream_buffer import StreamBuffer
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_delivers_in_order():
+    received = []
+
+    async def handler(content):
+        received.append(content)
+
+    buffer = StreamBuffer(handler, flush_interval=0)
+    buffer.put("hello")
+    await asyncio.sleep(0.01)
+    buffer.put(" world")
+    buffer.put(None)
+    await buffer.close()
+
+    assert received == ["hello", " world", None]
+    assert buffer.chunks == 2
+    assert buffer.deliveries == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_merges_chunks_while_handler_is_busy():
+    received = []
+    release = asyncio.Event()
+
+    async def handler(content):
+        received.append(content)
+        await release.wait()
+
+    buffer = StreamBuffer(handler, flush_interval=0)
+    buffer.put("a")
+    await asyncio.sleep(0.01)
+    # The handler is stuck on the first chunk, the rest should be merged
+    for content in ["b", "c", "d"]:
+        buffer.put(content)
+    buffer.put(None)
+    buffer.put("e")
+    release.set()
+    await buffer.close()
+
+    assert received == ["a", "bcd", None, "e"]
+    assert buffer.chunks == 5
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_flushes_large_batch_early():
+    received = []
+
+    async def handler(content):
+        received.append(content)
+
+    buffer = StreamBuffer(handler, flush_interval=10, max_batch=4)
+    buffer.put("hello")
+    await asyncio.wait_for(_wait_for(lambda: received), 1)
+
+    assert received == ["hello"]
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_close_flushes_pending():
+    received = []
+
+    async def handler(content):
+        received.append(content)
+
+    buffer = StreamBuffer(handler, flush_interval=10)
+    buffer.put("hello")
+    await asyncio.wait_for(buffer.close(), 1)
+
+    assert received == ["hello"]
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_propagates_handler_error():
+    async def handler(content):
+        raise ValueError("UI is gone")
+
+    buffer = StreamBuffer(handler, flush_interval=0)
+    buffer.put("hello")
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(ValueError, match="UI is gone"):
+        buffer.put("world")
+    with pytest.raises(ValueError, match="UI is gone"):
+        await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_buffer_cancel_drops_pending():
+    received = []
+
+    async def handler(content):
+        received.append(content)
+
+    buffer = StreamBuffer(handler, flush_interval=10)
+    buffer.put("hello")
+    buffer.cancel()
+    await asyncio.sleep(0.01)
+
+    assert received == []
+    assert buffer.task.cancelled()
+
+
+async def _wait_for(predicate):
+    while not predicate():
+        await asyncio.sleep(0.001)
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, patch
+
+from core.llm import tokens
+from core.llm.tokens import context_window, count_tokens, prompt_budget
+
+
+def test_context_window():
+    assert context_window("gpt-4") == 8_192
+    assert context_window("gpt-4o-mini") == 128_000
+    assert context_window("gpt-4-turbo-preview") == 128_000
+    assert context_window("claude-3-5-sonnet-20240620") == 200_000
+    assert context_window("gpt-4-0613") == 8_192
+    assert context_window("gpt-4o-2024-08-06") == 128_000
+    assert context_window("gpt-4.1") == 1_047_576
+    assert context_window("gpt-4.1-mini") == 1_047_576
+    assert context_window("gpt-4.5-preview") == 128_000
+    assert context_window("o1") == 200_000
+    assert context_window("o1-mini") == 128_000
+    assert context_window("o3-mini") == 200_000
+    assert context_window("o4-mini") == 200_000
+    # An unknown model in a known family isn't mistaken for an older model
+    assert context_window("gpt-4.7") is None
+    assert context_window("my-local-model") is None
+
+
+def test_prompt_budget():
+    assert prompt_budget("gpt-4o") == 128_000 - 4096
+    assert prompt_budget("gpt-4") == 8_192 - 4096
+    assert prompt_budget("gpt-4", 1000) == 1000
+    assert prompt_budget("gpt-4.1-mini") == 1_047_576 - 4096
+    assert prompt_budget("my-local-model") is None
+
+
+@patch.object(tokens, "_encoder_loaded", False)
+@patch.object(tokens, "_encoder", None)
+def test_encoder_loaded_lazily():
+    encoder = MagicMock(encode=MagicMock(return_value=[1, 2]))
+    with patch("tiktoken.get_encoding", return_value=encoder) as mock_get_encoding:
+        assert count_tokens("hello world") == 2
+        assert count_tokens("hello again") == 2
+    mock_get_encoding.assert_called_once_with("cl100k_base")
+
+
+@patch.object(tokens, "_encoder_loaded", False)
+@patch.object(tokens, "_encoder", None)
+def test_count_tokens_without_encoder():
+    with patch("tiktoken.get_encoding", side_effect=OSError("offline")):
+        assert count_tokens("x" * 10) == 3
@@ -128,6 +128,25 @@ async def test_commit(mock_get_config, testmanager):
     assert next_state.steps == [{"id": "step-012"}]
 
 
+@pytest.mark.asyncio
+@patch("core.state.state_manager.get_config")
+async def test_commit_does_not_accumulate_states(mock_get_config, testmanager):
+    mock_get_config.return_value.fs.type = "memory"
+    sm = StateManager(testmanager)
+    await sm.create_project("test")
+    await sm.commit()
+    await sm.save_file("test.txt", "Hello, world!")
+
+    session_sizes = []
+    for _ in range(4):
+        await sm.commit()
+        session_sizes.append(len(sm.current_session.sync_session.identity_map))
+
+    # Earlier states (and their files) are not added back to each new session
+    assert len(set(session_sizes)) == 1
+    assert sm.current_state.files[0].content.content == "Hello, world!"
+
+
 @pytest.mark.asyncio
 @patch("core.state.state_manager.get_config")
 async def test_save_file(mock_get_config, testmanager):
@@ -276,3 +276,38 @@ def test_calculate_statistics(mock_settings):
         "avg_time": 36,
         "median_time": 20,
     }
+
+
+@patch("core.telemetry.settings")
+def test_llm_timings_per_agent(mock_settings):
+    mock_settings.telemetry = MagicMock(id="test-id", endpoint="test-endpoint", enabled=True)
+
+    telemetry = Telemetry()
+    telemetry.record_llm_request(10, 1, False, agent="code-monkey", timings={"time_to_first_token": 1.0, "queue_time": 0})
+    telemetry.record_llm_request(10, 1, False, agent="code-monkey", timings={"time_to_first_token": 3.0, "queue_time": 2})
+    telemetry.record_llm_request(10, 1, False, agent="tech-lead", timings={"time_to_first_token": None})
+    telemetry.record_llm_request(10, 1, False)
+
+    telemetry.calculate_statistics()
+    assert telemetry.data["llm_timings"] == {
+        "code-monkey": {
+            "num_requests": 2,
+            "time_to_first_token": {"total": 4.0, "avg": 2.0, "median": 3.0, "max": 3.0},
+            "queue_time": {"total": 2, "avg": 1.0, "median": 2, "max": 2},
+        },
+        "tech-lead": {"num_requests": 1},
+    }
+
+
+@patch("core.telemetry.settings")
+def test_llm_parse_retries_per_agent(mock_settings):
+    mock_settings.telemetry = MagicMock(id="test-id", endpoint="test-endpoint", enabled=True)
+
+    telemetry = Telemetry()
+    telemetry.record_llm_request(10, 1, False, agent="code-monkey", parse_retries=2)
+    telemetry.record_llm_request(10, 1, False, agent="code-monkey")
+    telemetry.record_llm_request(10, 1, False, agent="tech-lead", parse_retries=1)
+
+    telemetry.calculate_statistics()
+    assert telemetry.data["num_llm_parse_retries"] == 3
+    assert telemetry.data["llm_parse_retries"] == {"code-monkey": 2, "tech-lead": 1}